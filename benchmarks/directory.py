@@ -0,0 +1,103 @@
+"""
+Participant directory benchmark
+
+Compares the participant storage in the state file with the memory-mapped participant directory: resident memory taken
+by the loaded participants, and the latency of looking up a participant.  Each variant runs in a fresh process.  The
+bot must be configured (see README.md) before running this script.
+
+Usage: python benchmarks/directory.py [number of participants]
+"""
+
+import json
+import pathlib
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent / "src"))
+
+_LOOKUP_COUNT = 100000
+
+
+def _resident_bytes() -> int:
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * 4096
+
+
+def _use_directory(directory: pathlib.Path, participant_directory: bool) -> None:
+    """Point the storage of the bot to `directory`"""
+
+    from common import directory as participant_directory_module, history, settings, state
+
+    settings.PARTICIPANT_DIRECTORY = participant_directory
+    state._STATE_FILENAME = directory / "state.json"
+    state._SNAPSHOT_FILENAME = directory / "state.pickle"
+    history._HISTORY_FILENAME = directory / "history.bin"
+    participant_directory_module._DIRECTORY_FILENAME = directory / "directory.bin"
+
+
+def _prepare(directory: pathlib.Path, participant_directory: bool, participant_count: int) -> None:
+    from common import state
+
+    _use_directory(directory, participant_directory)
+    state._maybe_load()
+    state.set_participants({str(n): f"Participant Number {n}" for n in range(1, participant_count + 1)})
+
+    # Saving the state after every check-in would take most of the time of the benchmark, so it is saved once.
+    save = state._save
+    state._save = lambda: None
+    for n in range(1, participant_count + 1, 2):
+        state.maybe_set_participant_last_known_status(str(n), "1", "2025-07-04T02:00:00+00:00")
+    state._save = save
+    state._save()
+    state.save_snapshot()
+
+
+def _child(directory: pathlib.Path, participant_directory: bool, participant_count: int) -> None:
+    from common import state
+
+    _use_directory(directory, participant_directory)
+
+    before = _resident_bytes()
+    state._maybe_load()
+    state.participant_count()
+    after = _resident_bytes()
+
+    plates = [str(random.randint(1, participant_count)) for _ in range(_LOOKUP_COUNT)]
+    started = time.perf_counter()
+    for frame_plate_number in plates:
+        if state.has_participant(frame_plate_number):
+            state.Participant(frame_plate_number)
+    elapsed = time.perf_counter() - started
+
+    print(json.dumps({"resident_mb": (after - before) / 1024 / 1024, "lookup_us": elapsed / _LOOKUP_COUNT * 1e6}))
+
+
+def _run(*args) -> str:
+    return subprocess.run([sys.executable, __file__, *map(str, args)], check=True, capture_output=True,
+                          text=True).stdout
+
+
+def main() -> None:
+    if sys.argv[1:2] in (["--prepare"], ["--child"]):
+        import logging
+        logging.disable(logging.CRITICAL)
+
+        function = _prepare if sys.argv[1] == "--prepare" else _child
+        function(pathlib.Path(sys.argv[2]), sys.argv[3] == "1", int(sys.argv[4]))
+        return
+
+    participant_count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    print(f"{participant_count} participants, {_LOOKUP_COUNT} lookups:")
+
+    for participant_directory, label in ((False, "state file"), (True, "participant directory")):
+        directory = tempfile.mkdtemp()
+        _run("--prepare", directory, int(participant_directory), participant_count)
+        result = json.loads(_run("--child", directory, int(participant_directory), participant_count))
+        print(f"  {label:>21}: {result['resident_mb']:7.1f} MB resident, {result['lookup_us']:6.2f} us per lookup")
+
+
+if __name__ == "__main__":
+    main()
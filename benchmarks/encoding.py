@@ -0,0 +1,93 @@
+"""
+Tracking update encoding benchmark
+
+Builds the response of the remote endpoint to a catch-up of many tracking updates (e.g., after the bot was stopped for
+a while) in the default encoding and in the columnar one, both serialised as compact JSON, then compares their size, raw
+and gzip-compressed as it is sent over HTTP, and the time it takes to parse each response and decode it into the tuples
+that the fetch cycle applies to the state.  The bot must be configured (see README.md) before running this script.
+
+Usage: python benchmarks/encoding.py [number of updates]
+"""
+
+import datetime
+import gzip
+import json
+import pathlib
+import random
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent / "src"))
+
+_REPEAT_COUNT = 5
+_PARTICIPANT_COUNT = 10000
+_CONTROL_COUNT = 12
+_ABANDON_RATE = 0.01
+
+
+def _updates(update_count: int) -> list:
+    """Return updates sorted by check-in time, as tuples of the frame plate number, the control, and the epoch time"""
+
+    generator = random.Random(1)
+    start = datetime.datetime(2025, 7, 4, 2, tzinfo=datetime.timezone.utc).timestamp()
+    updates = []
+    for _ in range(update_count):
+        control = generator.randint(1, _CONTROL_COUNT)
+        checkin_time = None if generator.random() < _ABANDON_RATE else int(
+            start + control * 3600 * 6 + generator.randint(0, 3600 * 4)) // 60 * 60
+        updates.append((str(generator.randint(1, _PARTICIPANT_COUNT)), control, checkin_time))
+    updates.sort(key=lambda u: u[2] or 0)
+    return updates
+
+
+def _default_response(updates: list) -> bytes:
+    return json.dumps({"success": True, "next_since": "x", "updates": [
+        {"checkin_time": datetime.datetime.fromtimestamp(t, datetime.timezone.utc).isoformat() if t else None,
+         "frame_plate_number": n, "control": c} for n, c, t in updates]}, separators=(",", ":")).encode("utf-8")
+
+
+def _columnar_response(updates: list) -> bytes:
+    deltas = []
+    previous = 0
+    for _, _, checkin_time in updates:
+        if checkin_time is None:
+            deltas.append(None)
+        else:
+            deltas.append(checkin_time - previous)
+            previous = checkin_time
+    return json.dumps({"success": True, "next_since": "x", "encoding": "columnar", "columns": {
+        "frame_plate_numbers": [n for n, _, _ in updates], "controls": [c for _, c, _ in updates],
+        "checkin_times": deltas}}, separators=(",", ":")).encode("utf-8")
+
+
+def main() -> None:
+    import logging
+    logging.disable(logging.CRITICAL)
+
+    from common import remote
+
+    update_count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    updates = _updates(update_count)
+
+    print(f"{update_count} updates")
+    print(f"{'encoding':>10} {'bytes':>10} {'gzip':>10} {'parse':>10} {'decode':>10} {'total':>10}")
+    decoded = {}
+    for label, body in (("default", _default_response(updates)), ("columnar", _columnar_response(updates))):
+        parse_times, decode_times = [], []
+        for _ in range(_REPEAT_COUNT):
+            started = time.perf_counter()
+            response = json.loads(body)
+            parsed = time.perf_counter()
+            decoded[label] = list(remote._decode_updates(response))
+            decode_times.append(time.perf_counter() - parsed)
+            parse_times.append(parsed - started)
+        parse_time, decode_time = min(parse_times), min(decode_times)
+        print(f"{label:>10} {len(body):10d} {len(gzip.compress(body)):10d} {parse_time * 1000:8.1f}ms "
+              f"{decode_time * 1000:8.1f}ms {(parse_time + decode_time) * 1000:8.1f}ms")
+
+    # Both encodings must decode to the same check-ins
+    assert decoded["default"] == decoded["columnar"]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Inline query load test
+
+Simulates many users typing inline queries keystroke by keystroke (frame plate numbers and names of participants) while
+participants keep checking in, and measures how long the bot takes to answer, with and without the answer cache.
+Answers are not sent anywhere.  The bot must be configured (see README.md) before running this script.
+
+Usage: python benchmarks/inline.py [number of queries] [number of participants]
+"""
+
+import asyncio
+import datetime
+import pathlib
+import random
+import statistics
+import sys
+import tempfile
+import time
+import types
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent / "src"))
+
+# One participant checks in every this many queries
+_QUERIES_PER_CHECKIN = 10
+
+# Participants that most users look up
+_POPULAR_PARTICIPANT_COUNT = 200
+
+_START = datetime.datetime(2025, 7, 4, 2, tzinfo=datetime.timezone.utc)
+
+_FIRST_NAMES = ["Alexey", "Anna", "Dmitry", "Elena", "Ivan", "Maria", "Nikolay", "Olga", "Pavel", "Sergey", "Алексей",
+                "Анна", "Дмитрий", "Елена", "Иван", "Мария"]
+_LAST_NAMES = ["Kozlov", "Kuznetsov", "Lebedev", "Morozov", "Novikov", "Petrov", "Popov", "Smirnov", "Sokolov",
+               "Volkov", "Иванов", "Козлов", "Петров", "Смирнов", "Соколов"]
+
+
+class FakeUser:
+    def __init__(self, user_id: int, language_code: str):
+        self.id = user_id
+        self.language_code = language_code
+        self.username = f"user{user_id}"
+
+
+async def _discard(results, cache_time: int) -> None:
+    pass
+
+
+def _keystrokes(generator: random.Random, names: dict, participant_count: int) -> list:
+    """Return queries typed by users, as tuples of user and query, in the order they arrive"""
+
+    users = [FakeUser(n, generator.choice(("en", "ru"))) for n in range(1000)]
+
+    typing = []
+    for user in users:
+        popular = generator.random() < 0.8
+        frame_plate_number = str(generator.randint(1, _POPULAR_PARTICIPANT_COUNT if popular else participant_count))
+        text = frame_plate_number if generator.random() < 0.5 else names[frame_plate_number]
+        typing.append([user, text, 1])
+
+    queries = []
+    while typing:
+        entry = generator.choice(typing)
+        user, text, length = entry
+        queries.append((user, text[:length]))
+        entry[2] += 1
+        if entry[2] > len(text):
+            typing.remove(entry)
+
+    return queries
+
+
+async def _run(queries: list, checkins: list) -> list:
+    from common import state
+    from users import inline
+
+    latencies = []
+    for index, (user, text) in enumerate(queries):
+        if index % _QUERIES_PER_CHECKIN == 0 and checkins:
+            state.maybe_set_participant_last_known_status(*checkins.pop())
+
+        update = types.SimpleNamespace(inline_query=types.SimpleNamespace(query=text, from_user=user, answer=_discard))
+        started = time.perf_counter()
+        await inline.handle_inline_query(update, None)
+        latencies.append(time.perf_counter() - started)
+
+    return latencies
+
+
+def main() -> None:
+    import logging
+    logging.disable(logging.CRITICAL)
+
+    from common import history, settings, state
+    from users import inline
+
+    query_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    participant_count = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+
+    directory = pathlib.Path(tempfile.mkdtemp())
+    state._STATE_FILENAME = directory / "state.json"
+    state._SNAPSHOT_FILENAME = directory / "state.pickle"
+    history._HISTORY_FILENAME = directory / "history.bin"
+    state._save = lambda: None
+
+    generator = random.Random(1)
+    names = {str(n): f"{generator.choice(_FIRST_NAMES)} {generator.choice(_LAST_NAMES)}"
+             for n in range(1, participant_count + 1)}
+
+    state._maybe_load()
+    state.set_event({"name": {"en": "Benchmark 600", "ru": "Бенчмарк 600"}, "start": _START.isoformat(),
+                     "finish": (_START + datetime.timedelta(hours=40)).isoformat(), "participant_list_url": ""})
+    state.set_controls({str(n): {"name": {"en": f"Control {n}", "ru": f"КП {n}"}, "distance": (n - 1) * 100,
+                                 "finish": n == 7} for n in range(1, 8)})
+    state.set_participants(names)
+
+    from common import analytics, search
+    analytics.init()
+    search.init()
+    inline.init(types.SimpleNamespace(add_handler=lambda handler: None))
+
+    queries = []
+    while len(queries) < query_count:
+        queries.extend(_keystrokes(generator, names, participant_count))
+    queries = queries[:query_count]
+
+    print(f"{query_count} inline queries, {participant_count} participants, "
+          f"a check-in every {_QUERIES_PER_CHECKIN} queries:")
+
+    for cache_seconds, label in ((0, "without cache"), (60, "with cache")):
+        settings.INLINE_QUERY_CACHE_SECONDS = cache_seconds
+        inline.clear_cache()
+        state.set_participants({})
+        state.set_participants(names)
+
+        checkins = [(str(generator.randint(1, participant_count)), "2",
+                     (_START + datetime.timedelta(hours=4, seconds=n)).isoformat())
+                    for n in range(query_count // _QUERIES_PER_CHECKIN + 1)][::-1]
+        _, hits_before, misses_before = inline.cache_stats()
+
+        started = time.perf_counter()
+        latencies = asyncio.run(_run(queries, checkins))
+        elapsed = time.perf_counter() - started
+
+        _, hits, misses = inline.cache_stats()
+        hits, misses = hits - hits_before, misses - misses_before
+        latencies.sort()
+        print(f"  {label:>13}: {query_count / elapsed * 60:9.0f} queries per minute, "
+              f"median {statistics.median(latencies) * 1e6:6.1f} us, "
+              f"99th percentile {latencies[len(latencies) * 99 // 100] * 1e6:7.1f} us, "
+              f"cache hits {hits / max(hits + misses, 1):.0%}")
+
+
+if __name__ == "__main__":
+    main()
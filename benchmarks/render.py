@@ -0,0 +1,81 @@
+"""
+Status rendering benchmark
+
+Renders status lines of participants (on the route, finished, abandoned, not started) in each supported language, and
+reports how many lines are rendered per second.  The bot must be configured (see README.md) before running this script.
+
+Usage: python benchmarks/render.py [number of participants] [number of rounds]
+"""
+
+import datetime
+import pathlib
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent / "src"))
+
+_START = datetime.datetime(2025, 7, 4, 2, tzinfo=datetime.timezone.utc)
+_CONTROL_COUNT = 12
+
+
+def _prepare(participant_count: int) -> None:
+    from common import analytics, history, state
+
+    directory = pathlib.Path(tempfile.mkdtemp())
+    state._STATE_FILENAME = directory / "state.json"
+    state._SNAPSHOT_FILENAME = directory / "state.pickle"
+    history._HISTORY_FILENAME = directory / "history.bin"
+    state._save = lambda: None
+
+    state._maybe_load()
+    state.set_event({"name": {"en": "Benchmark 1200", "ru": "Бенчмарк 1200"}, "start": _START.isoformat(),
+                     "finish": (_START + datetime.timedelta(hours=90)).isoformat(), "participant_list_url": ""})
+    state.set_controls({str(n): {"name": {"en": f"Control {n}", "ru": f"КП {n}"}, "distance": (n - 1) * 100,
+                                 "finish": n == _CONTROL_COUNT} for n in range(1, _CONTROL_COUNT + 1)})
+    state.set_participants({str(n): f"Participant {n}" for n in range(1, participant_count + 1)})
+    analytics.init()
+
+    generator = random.Random(1)
+    for n in range(1, participant_count + 1):
+        if n % 10 == 0:
+            continue
+        checkin_time = _START
+        for control in range(1, generator.randint(2, _CONTROL_COUNT) + 1):
+            checkin_time += datetime.timedelta(minutes=generator.randint(200, 400))
+            state.maybe_set_participant_last_known_status(str(n), str(control), checkin_time.isoformat())
+        if n % 10 == 5 and control < _CONTROL_COUNT:
+            state.maybe_set_participant_last_known_status(str(n), str(control), None)
+
+
+def main() -> None:
+    import logging
+    logging.disable(logging.CRITICAL)
+
+    from common import format, i18n, settings, state
+
+    participant_count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    round_count = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    _prepare(participant_count)
+    participants = list(state.participants())
+
+    print(f"{participant_count} participants, {round_count} rounds:")
+    for lang in settings.SUPPORTED_LANGUAGES:
+        trans = i18n.for_lang(lang)
+        format.participant_status(trans, participants[0])
+
+        started = time.perf_counter()
+        for _ in range(round_count):
+            for participant in participants:
+                format.participant_status(trans, participant)
+        elapsed = time.perf_counter() - started
+
+        line_count = participant_count * round_count
+        print(f"  {lang}: {line_count / elapsed:9.0f} status lines per second, "
+              f"{elapsed / line_count * 1e6:6.2f} us each")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Participant search benchmark
+
+Builds the search index for a roster of generated names, then measures the latency of typical queries: frame plate
+numbers with stray characters, prefixes of names, full names, and names with typos.  The bot must be configured (see
+README.md) before running this script.
+
+Usage: python benchmarks/search.py [number of participants]
+"""
+
+import pathlib
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent / "src"))
+
+_QUERY_COUNT = 2000
+_CANDIDATE_COUNT = 5
+
+_SYLLABLES = ["an", "ar", "ba", "da", "el", "ev", "ga", "ia", "il", "in", "ka", "ko", "la", "li", "ma", "mi", "na",
+              "ni", "ov", "pe", "ra", "ro", "sa", "se", "ta", "to", "va", "vi", "za", "zh"]
+
+
+def _name(generator: random.Random) -> str:
+    def word() -> str:
+        return "".join(generator.choice(_SYLLABLES) for _ in range(generator.randint(2, 4))).capitalize()
+
+    return f"{word()} {word()}"
+
+
+def _typo(generator: random.Random, text: str) -> str:
+    position = generator.randrange(1, len(text) - 1)
+    return text[:position] + text[position + 1] + text[position] + text[position + 2:]
+
+
+def main() -> None:
+    import logging
+    logging.disable(logging.CRITICAL)
+
+    from common import history, search, state
+
+    participant_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    directory = pathlib.Path(tempfile.mkdtemp())
+    state._STATE_FILENAME = directory / "state.json"
+    state._SNAPSHOT_FILENAME = directory / "state.pickle"
+    history._HISTORY_FILENAME = directory / "history.bin"
+
+    generator = random.Random(1)
+    names = {str(n): _name(generator) for n in range(1, participant_count + 1)}
+
+    state._maybe_load()
+    state.set_participants(names)
+    search.init()
+
+    started = time.perf_counter()
+    search.find("", _CANDIDATE_COUNT)
+    print(f"{participant_count} participants, index built in {time.perf_counter() - started:.3f} seconds")
+
+    plates = [str(generator.randint(1, participant_count)) for _ in range(_QUERY_COUNT)]
+    queries = {
+        "frame plate number": [f"#{n:0>5}" for n in plates],
+        "prefix of a name": [names[n].split()[generator.randint(0, 1)][:4] for n in plates],
+        "full name": [names[n] for n in plates],
+        "name with a typo": [_typo(generator, names[n]) for n in plates],
+    }
+
+    for label, texts in queries.items():
+        latencies, found = [], 0
+        for text, frame_plate_number in zip(texts, plates):
+            started = time.perf_counter()
+            candidates = search.find(text, _CANDIDATE_COUNT)
+            latencies.append((time.perf_counter() - started) * 1e6)
+            found += frame_plate_number in candidates
+        latencies.sort()
+        print(f"  {label:>18}: median {statistics.median(latencies):7.1f} us, "
+              f"99th percentile {latencies[len(latencies) * 99 // 100]:7.1f} us, "
+              f"target among candidates {found / len(texts):.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Sender worker throughput benchmark
+
+Renders notifications about an event in progress into a temporary outbox, the way the bot does in a fetch cycle, and
+measures how fast they are sent by different numbers of sender worker processes.  The Bot API is replaced by a fake
+that spends some time on encoding the request and waiting for the network, so the numbers show how sending scales with
+the number of workers rather than how fast Telegram is.  Rendering stays in the bot process, so the throughput including
+rendering grows less than the throughput of sending alone.  The bot must be configured (see README.md) before running
+this script.
+
+Usage: python benchmarks/senders.py [number of messages] [simulated network latency in milliseconds]
+"""
+
+import asyncio
+import json
+import multiprocessing
+import pathlib
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent / "src"))
+
+import render  # noqa: E402
+import sender  # noqa: E402
+from common import outbox, remote, settings, state  # noqa: E402
+
+_WORKER_COUNTS = (1, 2, 4, 8)
+
+# Number of participants in the event, each subscriber follows one of them
+_PARTICIPANT_COUNT = 5000
+
+
+class FakeBot:
+    """Spends as much time on sending a message as the real bot would, without sending anything"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def send_message(self, chat_id: str, text: str, disable_notification: bool = False) -> None:
+        json.dumps({"chat_id": chat_id, "text": text, "parse_mode": "HTML",
+                    "disable_notification": disable_notification})
+        await asyncio.sleep(self.latency)
+
+
+def _worker(partition_index: int, latency: float) -> None:
+    async def send_until_empty() -> None:
+        task = asyncio.create_task(sender.run(partition_index, FakeBot(latency)))
+        while outbox.take(partition_index, 1):
+            await asyncio.sleep(0.05)
+        task.cancel()
+
+    asyncio.run(send_until_empty())
+
+
+def measure(worker_count: int, message_count: int, latency: float) -> tuple:
+    """Return the number of seconds it took the bot to render the messages, and to `worker_count` workers to send them"""
+
+    settings.SENDER_WORKER_COUNT = worker_count
+    outbox._OUTBOX_FILENAME = pathlib.Path(tempfile.mkdtemp()) / "outbox.sqlite3"
+    outbox._connection = None
+
+    started = time.perf_counter()
+    participants = list(state.participants())
+    packages = {str(100000 + i): [participants[i % len(participants)]] for i in range(message_count)}
+    outbox.enqueue([(tg_id, text, False) for tg_id, text in remote._render_messages(packages, set())])
+    rendering = time.perf_counter() - started
+    outbox._connection.close()
+    outbox._connection = None
+
+    started = time.perf_counter()
+    workers = [multiprocessing.Process(target=_worker, args=(i, latency)) for i in range(worker_count)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    return rendering, time.perf_counter() - started
+
+
+def main() -> None:
+    message_count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    latency = (float(sys.argv[2]) if len(sys.argv) > 2 else 20) / 1000
+
+    multiprocessing.set_start_method("fork")
+
+    import logging
+    logging.disable(logging.CRITICAL)
+    render._prepare(_PARTICIPANT_COUNT)
+
+    baselines = None
+    print(f"Rendering and sending {message_count} messages with simulated latency of {latency * 1000:.0f} ms:")
+    for worker_count in _WORKER_COUNTS:
+        rendering, sending = measure(worker_count, message_count, latency)
+        throughputs = message_count / sending, message_count / (rendering + sending)
+        baselines = baselines or throughputs
+        print(f"  {worker_count} workers: rendering {rendering:5.2f} s, sending {sending:5.2f} s, "
+              f"{throughputs[0]:7.1f} messages per second sent ({throughputs[0] / baselines[0]:.2f}x), "
+              f"{throughputs[1]:7.1f} rendered and sent ({throughputs[1] / baselines[1]:.2f}x)")
+
+if __name__ == "__main__":
+    main()
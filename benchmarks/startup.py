@@ -0,0 +1,145 @@
+"""
+Startup time benchmark
+
+Prints the import-time profile of the bot, and the time it takes a freshly started process to get to the first handled
+update.  Network calls to Telegram are replaced with canned responses, so the numbers only include the work done by the
+bot itself.  The bot must be configured (see README.md) before running this script.
+
+Usage: python benchmarks/startup.py [number of runs]
+"""
+
+import json
+import pathlib
+import subprocess
+import sys
+import time
+
+_SRC_DIRECTORY = pathlib.Path(__file__).parent.parent / "src"
+
+
+def profile_imports(top: int = 20) -> None:
+    """Run `import bot` with `-X importtime` and print the slowest modules imported directly by the bot"""
+
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import bot"], cwd=_SRC_DIRECTORY,
+                            capture_output=True, text=True)
+
+    entries = []
+    imported_modules = set()
+    total_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        total_us += int(self_us)
+        imported_modules.add(name.strip())
+        # Nesting level of the import is encoded by indentation: two spaces per level after a single leading space.
+        if (len(name) - len(name.lstrip())) // 2 == 1:
+            entries.append((int(cumulative_us), name.strip()))
+
+    print(f"Importing the bot takes {total_us / 1000:.1f} ms, slowest direct imports of the bot:")
+    for cumulative_us, name in sorted(entries, reverse=True)[:top]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+    print(f"`requests` is imported at startup: {'requests' in imported_modules}")
+
+
+def measure_first_update() -> dict:
+    """Measure the time to the first handled update in a fresh process"""
+
+    result = subprocess.run([sys.executable, __file__, "--child"], cwd=_SRC_DIRECTORY, capture_output=True, text=True,
+                            check=True)
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def _child() -> None:
+    """Start the bot with a fake network layer, feed it a /status command, and print timings as JSON"""
+
+    started = time.perf_counter()
+
+    sys.path.insert(0, str(_SRC_DIRECTORY))
+
+    import asyncio
+    import logging
+
+    import bot
+    from common import state
+    from telegram import Update
+    from telegram.ext import Application
+    from telegram.request import BaseRequest
+
+    logging.disable(logging.CRITICAL)
+
+    imported = time.perf_counter()
+
+    class FakeRequest(BaseRequest):
+        """Answers to all requests to the Bot API without touching the network"""
+
+        async def initialize(self) -> None:
+            pass
+
+        async def shutdown(self) -> None:
+            pass
+
+        @property
+        def read_timeout(self):
+            return None
+
+        async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                             connect_timeout=None, pool_timeout=None):
+            parameters = request_data.parameters if request_data else {}
+            method_name = url.rsplit("/", 1)[-1]
+            if method_name == "getMe":
+                result = {"id": 1, "is_bot": True, "first_name": "Bot", "username": "audax_tracker_bot"}
+            elif method_name == "sendMessage":
+                result = {"message_id": 1, "date": int(time.time()), "text": parameters.get("text", ""),
+                          "chat": {"id": int(parameters["chat_id"]), "type": "private"}}
+            else:
+                result = True
+            return 200, json.dumps({"ok": True, "result": result}).encode("utf-8")
+
+    fake_request = FakeRequest()
+    application = bot.create_application(Application.builder().request(fake_request).get_updates_request(fake_request))
+
+    built = time.perf_counter()
+
+    state.is_fetching()
+
+    loaded = time.perf_counter()
+
+    update = Update.de_json({"update_id": 1, "message": {
+        "message_id": 1, "date": int(time.time()), "text": "/status",
+        "entities": [{"type": "bot_command", "offset": 0, "length": 7}],
+        "chat": {"id": 2, "type": "private"},
+        "from": {"id": 2, "is_bot": False, "first_name": "User", "language_code": "en"}}}, application.bot)
+
+    async def handle_first_update() -> None:
+        await application.initialize()
+        await application.process_update(update)
+        await application.shutdown()
+
+    asyncio.run(handle_first_update())
+
+    handled = time.perf_counter()
+
+    print(json.dumps({"import": imported - started, "build": built - imported, "load_state": loaded - built,
+                      "first_update": handled - loaded, "total": handled - started}))
+
+
+def main() -> None:
+    if "--child" in sys.argv:
+        _child()
+        return
+
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    profile_imports()
+
+    print()
+    print(f"Time to the first handled update, median of {runs} runs:")
+    results = [measure_first_update() for _ in range(runs)]
+    for key in results[0]:
+        values = sorted(r[key] for r in results)
+        print(f"  {key:>12}: {values[len(values) // 2] * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,19 +4,24 @@ This is the main script that contains the entry point of the bot.  Execute this
 See README.md for details.
 """
 
+import argparse
+import asyncio
 import io
 import json
 import logging
+import signal
+import time
 import traceback
 import uuid
 
 import httpx
 from telegram import Update
 from telegram.constants import ParseMode
-from telegram.ext import Application, ContextTypes, Defaults
+from telegram.ext import Application, ContextTypes, Defaults, TypeHandler
 
-from common import i18n, remote, settings, state
-from users import admin, public
+from common import analytics, bulk, i18n, leaderboard, livecards, outbox, overdue, recording, remote, retry, \
+    search, settings, snapshots, state
+from users import admin, inline, public
 
 
 # Configure logging
@@ -26,6 +31,10 @@ logging.basicConfig(format="[%(asctime)s %(levelname)s %(name)s %(filename)s:%(l
                     level=logging.INFO)
 logging.getLogger("httpx").setLevel(logging.WARNING)
 
+# Moment when the imports are done, used to measure how long it takes to get to the first update
+_start_time = time.monotonic()
+_first_update_handled = False
+
 
 async def handle_error(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Log the error and send a telegram message to notify the developer"""
@@ -64,29 +73,127 @@ async def handle_error(update: object, context: ContextTypes.DEFAULT_TYPE) -> No
                 error_uuid=error_uuid))
 
 
+async def log_first_update(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Log how long it took from the start of the bot to the first incoming update"""
+
+    global _first_update_handled
+
+    if _first_update_handled:
+        return
+    _first_update_handled = True
+
+    logging.info(f"Got the first update {time.monotonic() - _start_time:.3f} seconds after start")
+
+
+async def record_update(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Append the incoming update to the traffic recording"""
+
+    recording.record(recording.TELEGRAM_UPDATE, update.to_dict())
+
+
+async def save_versioned_snapshot(context: ContextTypes.DEFAULT_TYPE) -> None:
+    state.save_versioned_snapshot()
+
+
+async def reload_settings(application: Application) -> None:
+    """Reload the settings on SIGHUP, e.g., from `systemctl reload`, and tell the administrator the result"""
+
+    logging.info("Got SIGHUP, reloading settings")
+    result_message = await admin.reload_settings(application)
+    await retry.send_message(application.bot, application.job_queue, settings.DEVELOPER_CHAT_ID, result_message)
+
+
 async def post_init(application: Application) -> None:
     await public.post_init(application)
 
+    if settings.SENDER_WORKER_COUNT and outbox.exists():
+        moved_count = outbox.repartition(settings.SENDER_WORKER_COUNT)
+        if moved_count:
+            logging.warning(f"Moved {moved_count} pending messages to the partitions of "
+                            f"{settings.SENDER_WORKER_COUNT} sender workers")
 
-def main() -> None:
-    """Entry point"""
+    asyncio.get_running_loop().add_signal_handler(
+        signal.SIGHUP, lambda: application.create_task(reload_settings(application)))
 
-    logging.info("The bot starts in {m} mode".format(m="service" if settings.SERVICE_MODE else "direct"))
-    logging.info(f"Settings are loaded from {settings.source_path()}")
-    logging.info(f"Remote endpoint URL: {settings.REMOTE_ENDPOINT_URL}, "
-                 f"data is queried every {settings.FETCHING_INTERVAL_MINUTES} minutes")
 
-    application = (Application.builder()
+async def post_shutdown(application: Application) -> None:
+    state.save_snapshot()
+    state.save_versioned_snapshot()
+    recording.close()
+
+
+def create_application(builder=None) -> Application:
+    """Build the application and register all handlers
+
+    `builder` may be provided to customise the application, e.g., to replace the network layer.
+    """
+
+    if builder is None:
+        builder = Application.builder()
+
+    application = (builder
                    .token(settings.BOT_TOKEN)
                    .defaults(Defaults(parse_mode=ParseMode.HTML))
                    .post_init(post_init)
+                   .post_shutdown(post_shutdown)
                    .build())
 
+    # Only the first matching handler of a group runs, so each of these handlers that see every update has its own group
+    application.add_handler(TypeHandler(Update, log_first_update), group=-1)
+    if settings.RECORD_TRAFFIC:
+        application.add_handler(TypeHandler(Update, record_update), group=-2)
+
+    analytics.init()
+    search.init()
+
     admin.init(application)
     public.init(application)
+    inline.init(application)
+    leaderboard.init(application)
+    livecards.init(application)
+    bulk.init(application)
+    overdue.init(application)
+
+    application.job_queue.run_repeating(save_versioned_snapshot, interval=settings.SNAPSHOT_INTERVAL_MINUTES * 60,
+                                        first=settings.SNAPSHOT_INTERVAL_MINUTES * 60)
 
     application.add_error_handler(handle_error)
 
+    return application
+
+
+def main() -> None:
+    """Entry point"""
+
+    parser = argparse.ArgumentParser(description="Telegram bot that tracks participants of audax events")
+    parser.add_argument("--replay", metavar="RECORDING",
+                        help="replay a traffic recording against a fake Telegram bot instead of running the bot")
+    parser.add_argument("--speed", type=float, default=1,
+                        help="how many times faster than recorded the traffic is replayed, 0 for as fast as possible")
+    parser.add_argument("--restore", metavar="VERSION",
+                        help="replace the state with a versioned snapshot while the bot is stopped, then exit")
+    arguments = parser.parse_args()
+
+    if arguments.restore:
+        try:
+            state.restore_versioned_snapshot(arguments.restore)
+        except (FileNotFoundError, ValueError):
+            parser.error(f"cannot restore the snapshot {arguments.restore}, available versions from the newest: "
+                         f"{', '.join(snapshots.versions()) or 'none'}")
+        return
+
+    if arguments.replay:
+        import replay
+        replay.run(create_application, arguments.replay, arguments.speed)
+        return
+
+    logging.info("The bot starts in {m} mode".format(m="service" if settings.SERVICE_MODE else "direct"))
+    logging.info(f"Settings are loaded from {settings.source_path()}")
+    logging.info(f"Remote endpoint URL: {settings.REMOTE_ENDPOINT_URL}, "
+                 f"data is queried every {settings.FETCHING_INTERVAL_MINUTES} minutes")
+
+    application = create_application()
+
     if state.is_fetching():
         logging.info("Last state is: fetching, starting")
         remote.start_fetching(application)
@@ -0,0 +1,261 @@
+"""
+Live analytics of the event
+
+Check-in times are kept in columnar arrays: one column per control (ordered by distance), one row per participant.  The
+arrays are built from the state and the check-in history once, then updated incrementally as check-ins are accepted, so
+the aggregates never require querying the remote endpoint.  Uses NumPy if it is installed, otherwise falls back to the
+standard `array` module and plain loops.
+"""
+
+import array
+import datetime
+import logging
+import math
+import statistics
+import time
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from . import history, state
+
+# Median split times are not recalculated more often than this, so that rendering many statuses in a row stays cheap.
+_SPLITS_REFRESH_SECONDS = 60
+
+# Whether the arrays reflect the current configuration of the event
+_built = False
+
+# Rows and columns of the arrays
+_rows = {}
+_columns = {}
+_control_ids = []
+
+# Attributes of the controls, by column
+_distances = []
+_closing_times = []
+
+# Check-in times as epoch seconds by column then by row, NaN where the participant did not check in
+_checkin_times = []
+
+# By row: the column of the furthest control where the participant checked in (-1 if none), and whether they abandoned
+_furthest = None
+_abandoned = None
+
+# Cached median split times by column, and the moment when they were calculated
+_median_splits = []
+_median_splits_time = None
+
+
+def _epoch(timestamp: str) -> float:
+    return datetime.datetime.fromisoformat(timestamp).timestamp()
+
+
+def invalidate() -> None:
+    """Make the arrays be rebuilt from the state next time they are used, e.g., after the configuration changed"""
+
+    global _built
+
+    _built = False
+
+
+def _maybe_build() -> None:
+    global _abandoned, _built, _checkin_times, _closing_times, _columns, _control_ids, _distances, _furthest, \
+        _median_splits_time, _rows
+
+    if _built:
+        return
+
+    started = time.perf_counter()
+
+    controls = {control_id: state.Control(control_id) for control_id in state.control_ids()}
+    _control_ids = sorted(controls, key=lambda c: (controls[c].finish, controls[c].distance))
+    _columns = {control_id: column for column, control_id in enumerate(_control_ids)}
+    _distances = [controls[control_id].distance for control_id in _control_ids]
+
+    # Closing times of the controls that the remote endpoint does not provide are estimated by spreading the time limit
+    # of the event evenly along the distance.
+    event = state.Event()
+    full_distance = max(_distances, default=0)
+    if event.valid and full_distance:
+        start, finish = event.start.timestamp(), event.finish.timestamp()
+        _closing_times = [start + (finish - start) * distance / full_distance for distance in _distances]
+    else:
+        _closing_times = [math.nan] * len(_distances)
+    for column, control_id in enumerate(_control_ids):
+        if controls[control_id].close is not None:
+            _closing_times[column] = controls[control_id].close.timestamp()
+
+    participants = list(state.participants())
+    _rows = {participant.frame_plate_number: row for row, participant in enumerate(participants)}
+
+    if numpy is not None:
+        _checkin_times = numpy.full((len(_control_ids), len(_rows)), numpy.nan)
+        _furthest = numpy.full(len(_rows), -1, dtype=numpy.int32)
+        _abandoned = numpy.zeros(len(_rows), dtype=numpy.bool_)
+    else:
+        _checkin_times = [array.array("d", [math.nan]) * len(_rows) for _ in _control_ids]
+        _furthest = array.array("i", [-1]) * len(_rows)
+        _abandoned = array.array("b", [0]) * len(_rows)
+
+    _built = True
+    _median_splits_time = None
+
+    # The history has all check-ins except those that happened before it was introduced, which are only known from the
+    # last known statuses.
+    for participant in participants:
+        if participant.last_known_control_id:
+            record_checkin(participant.frame_plate_number, participant.last_known_control_id,
+                           participant.last_known_checkin_time)
+    for frame_plate_number, control_id, checkin_time in history.all_checkins():
+        _record_epoch(frame_plate_number, control_id, checkin_time)
+
+    logging.info(f"Built analytics arrays for {len(_rows)} participants and {len(_control_ids)} controls "
+                 f"in {time.perf_counter() - started:.3f} seconds")
+
+
+def record_checkin(frame_plate_number: str, control_id: str, checkin_time: str) -> None:
+    """Add a check-in to the arrays
+
+    `checkin_time` is None if the participant abandoned at that control.
+    """
+
+    _maybe_build()
+
+    _record_epoch(frame_plate_number, control_id, _epoch(checkin_time) if checkin_time is not None else None)
+
+
+def _record_epoch(frame_plate_number: str, control_id: str, checkin_time) -> None:
+    if frame_plate_number not in _rows or control_id not in _columns:
+        return
+
+    row, column = _rows[frame_plate_number], _columns[control_id]
+
+    if checkin_time is None:
+        _abandoned[row] = True
+        return
+
+    _checkin_times[column][row] = checkin_time
+    if column > _furthest[row]:
+        _furthest[row] = column
+
+
+def _refresh_median_splits() -> None:
+    """Recalculate the median time between consecutive controls, if it is time to do that"""
+
+    global _median_splits, _median_splits_time
+
+    now = time.monotonic()
+    if _median_splits_time is not None and now - _median_splits_time < _SPLITS_REFRESH_SECONDS:
+        return
+    _median_splits_time = now
+
+    _median_splits = [None]
+    for column in range(1, len(_control_ids)):
+        if numpy is not None:
+            splits = _checkin_times[column] - _checkin_times[column - 1]
+            splits = splits[~numpy.isnan(splits)]
+            _median_splits.append(float(numpy.median(splits)) if splits.size else None)
+        else:
+            splits = [b - a for a, b in zip(_checkin_times[column - 1], _checkin_times[column])
+                      if not math.isnan(a) and not math.isnan(b)]
+            _median_splits.append(statistics.median(splits) if splits else None)
+
+
+def passed_counts() -> dict:
+    """Return the number of participants who passed each control, by control ID in the order of the distance"""
+
+    _maybe_build()
+
+    if numpy is not None:
+        counts = numpy.bincount(_furthest[_furthest >= 0], minlength=len(_control_ids))
+        passed = numpy.cumsum(counts[::-1])[::-1].tolist()
+    else:
+        counts = [0] * len(_control_ids)
+        for column in _furthest:
+            if column >= 0:
+                counts[column] += 1
+        passed = [sum(counts[column:]) for column in range(len(counts))]
+
+    return dict(zip(_control_ids, passed))
+
+
+def median_splits() -> dict:
+    """Return the median time in seconds that it takes to ride to each control from the previous one
+
+    The values are keyed by control ID in the order of the distance.  The value is None if the median is not known,
+    which is always the case for the first control.
+    """
+
+    _maybe_build()
+    _refresh_median_splits()
+
+    return dict(zip(_control_ids, _median_splits))
+
+
+def overdue_participants(now: float = None) -> list:
+    """Return frame plate numbers of participants who did not check in at their next control before it closed
+
+    Participants who never checked in anywhere, finished, or abandoned are not considered overdue.
+    """
+
+    _maybe_build()
+
+    if now is None:
+        now = time.time()
+    last_column = len(_control_ids) - 1
+    plates = list(_rows)
+
+    if numpy is not None:
+        if not _control_ids:
+            return []
+        closing_times = numpy.append(numpy.array(_closing_times), numpy.inf)
+        overdue = ((_furthest >= 0) & (_furthest < last_column) & ~_abandoned &
+                   (closing_times[_furthest + 1] < now))
+        return [plates[row] for row in numpy.flatnonzero(overdue)]
+
+    return [plates[row] for row, column in enumerate(_furthest)
+            if 0 <= column < last_column and not _abandoned[row] and _closing_times[column + 1] < now]
+
+
+def eta(frame_plate_number: str):
+    """Return the ID of the next control of the participant and the expected check-in time there as epoch seconds
+
+    The expected time is based on the median split time of the next leg, or, if that is not known yet, on the average
+    speed of the participant so far.  Returns None if the participant is not on the route or the estimate is not
+    possible.
+    """
+
+    _maybe_build()
+
+    if frame_plate_number not in _rows:
+        return None
+
+    row = _rows[frame_plate_number]
+    column = int(_furthest[row])
+    if column < 0 or column >= len(_control_ids) - 1 or _abandoned[row]:
+        return None
+
+    _refresh_median_splits()
+
+    last_checkin_time = float(_checkin_times[column][row])
+    split = _median_splits[column + 1]
+    if split is None:
+        event = state.Event()
+        if not event.valid or not _distances[column]:
+            return None
+        # A check-in time that is not after the start, e.g., because of a wrong clock, gives no speed
+        elapsed = last_checkin_time - event.start.timestamp()
+        if elapsed <= 0:
+            return None
+        speed = _distances[column] / elapsed
+        split = (_distances[column + 1] - _distances[column]) / speed
+
+    return _control_ids[column + 1], last_checkin_time + split
+
+
+def init() -> None:
+    """Start following changes of participants' statuses"""
+
+    state.add_on_participant_status_changed(record_checkin)
@@ -0,0 +1,168 @@
+"""
+Bulk operations on subscriptions
+
+Subscriptions are imported from and exported to CSV and JSON files, e.g., to pre-load subscriptions from the
+registration of an event.  A CSV file has a header and a row per subscription with the columns `tg_id`,
+`frame_plate_number`, and an optional `lang`.  A JSON file is an object with the user ID as the key and an object with
+`lang` and `numbers` (the list of frame plate numbers) as the value.  An imported file is parsed and validated
+completely before any of it is applied, and it is applied to the state at once.
+
+Announcements are sent to all subscribers by a repeating job, `_MESSAGES_PER_SECOND` at a time, so that sending them
+does not hit the limits of Telegram.  The progress is kept in the state, so sending resumes after a restart, and it is
+shown in the administrator's message that started the announcement.
+"""
+
+import csv
+import io
+import json
+import logging
+import time
+
+from telegram.error import Forbidden, TelegramError
+from telegram.ext import Application, ContextTypes, JobQueue
+
+from . import i18n, retry, state
+
+# Number of announcement messages sent per second
+_MESSAGES_PER_SECOND = 20
+
+# Minimum interval between updates of the progress of the announcement
+_PROGRESS_INTERVAL_SECONDS = 10
+
+_CSV_COLUMNS = ("tg_id", "frame_plate_number", "lang")
+
+_announcement_job = None
+_progress_time = None
+
+
+def parse_subscriptions(filename: str, content: bytes) -> list:
+    """Return subscriptions from the file as tuples of the user ID, the frame plate number, and the language or None
+
+    Raises ValueError if the file cannot be parsed.
+    """
+
+    text = content.decode("utf-8-sig")
+
+    try:
+        if filename.lower().endswith(".json"):
+            rows = [(str(tg_id), str(frame_plate_number), subscription.get("lang"))
+                    for tg_id, subscription in json.loads(text).items()
+                    for frame_plate_number in subscription["numbers"]]
+        else:
+            reader = csv.DictReader(io.StringIO(text))
+            if reader.fieldnames is None or not set(_CSV_COLUMNS[:2]).issubset(reader.fieldnames):
+                raise ValueError(f"the header must contain columns {', '.join(_CSV_COLUMNS)}")
+            rows = [(row["tg_id"].strip(), row["frame_plate_number"].strip(), (row.get("lang") or "").strip() or None)
+                    for row in reader]
+    except (AttributeError, KeyError, TypeError) as e:
+        raise ValueError(f"unexpected structure of the file: {e!r}")
+
+    for line_number, (tg_id, frame_plate_number, _) in enumerate(rows, 1):
+        if not tg_id.lstrip("-").isdigit() or not frame_plate_number.isdigit():
+            raise ValueError(f"subscription {line_number} has an invalid user ID or frame plate number")
+
+    return rows
+
+
+def export_subscriptions_csv() -> bytes:
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(_CSV_COLUMNS)
+    for subscription in state.subscriptions():
+        for frame_plate_number in subscription.numbers:
+            writer.writerow((subscription.tg_id, frame_plate_number, subscription.lang))
+    return output.getvalue().encode("utf-8")
+
+
+def export_subscriptions_json() -> bytes:
+    return json.dumps({subscription.tg_id: {"lang": subscription.lang, "numbers": subscription.numbers}
+                       for subscription in state.subscriptions()}, ensure_ascii=False, indent=1).encode("utf-8")
+
+
+def is_announcing() -> bool:
+    return _announcement_job is not None
+
+
+def _progress_text() -> str:
+    announcement = state.announcement()
+    trans = i18n.default()
+
+    if announcement.position < len(announcement.recipients):
+        return trans.gettext("MESSAGE_ADMIN_ANNOUNCEMENT_PROGRESS {sent} {total} {failed}").format(
+            failed=announcement.failed_count, sent=announcement.position, total=len(announcement.recipients))
+    return trans.gettext("MESSAGE_ADMIN_ANNOUNCEMENT_COMPLETE {sent} {failed}").format(
+        failed=announcement.failed_count, sent=announcement.position - announcement.failed_count)
+
+
+async def _report_progress(bot) -> None:
+    global _progress_time
+
+    announcement = state.announcement()
+    _progress_time = time.monotonic()
+    try:
+        await bot.edit_message_text(_progress_text(), chat_id=announcement.progress_chat_id,
+                                    message_id=announcement.progress_message_id)
+    except TelegramError as e:
+        logging.warning(f"Could not show the progress of the announcement: {e}")
+
+
+async def _send_announcement(context: ContextTypes.DEFAULT_TYPE) -> None:
+    announcement = state.announcement()
+    if announcement is None:
+        stop_announcement()
+        return
+
+    position, failed_count = announcement.position, announcement.failed_count
+    for tg_id in announcement.recipients[position:position + _MESSAGES_PER_SECOND]:
+        try:
+            await retry.send_message(context.bot, context.job_queue, tg_id, announcement.text)
+        except Forbidden:
+            logging.error(f"Got Forbidden when sending the announcement to user {tg_id}!  Removing their subscription.")
+            state.remove_subscriber(tg_id)
+            failed_count += 1
+        position += 1
+    state.set_announcement_progress(position, failed_count)
+
+    if position >= len(announcement.recipients):
+        logging.info(f"Sent the announcement to {position - failed_count} subscribers")
+        await _report_progress(context.bot)
+        stop_announcement()
+    elif time.monotonic() - _progress_time >= _PROGRESS_INTERVAL_SECONDS:
+        await _report_progress(context.bot)
+
+
+def start_announcement(job_queue: JobQueue, text: str, progress_chat_id, progress_message_id) -> int:
+    """Start sending the announcement to all subscribers, return the number of recipients"""
+
+    count = state.start_announcement(text, progress_chat_id, progress_message_id)
+    _schedule(job_queue)
+    return count
+
+
+def _schedule(job_queue: JobQueue) -> None:
+    global _announcement_job, _progress_time
+
+    _progress_time = time.monotonic()
+    _announcement_job = job_queue.run_repeating(_send_announcement, interval=1, first=0)
+
+
+def stop_announcement() -> None:
+    """Stop sending the announcement, the subscribers who did not get it yet will not get it"""
+
+    global _announcement_job
+
+    if _announcement_job:
+        _announcement_job.schedule_removal()
+        _announcement_job = None
+    state.finish_announcement()
+
+
+def init(application: Application) -> None:
+    """Resume sending the announcement that was interrupted by a restart"""
+
+    announcement = state.announcement()
+    if announcement is None:
+        return
+
+    logging.info(f"Resuming the announcement from recipient {announcement.position} of {len(announcement.recipients)}")
+    _schedule(application.job_queue)
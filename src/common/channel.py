@@ -0,0 +1,37 @@
+"""
+Posts in the broadcast channel
+
+If the bot is removed from the channel or loses the right to post there, the administrator is alerted once, and the
+callers notify the followers personally instead, until a post succeeds again.
+"""
+
+import logging
+
+from telegram.error import Forbidden
+from telegram.ext import JobQueue
+
+from . import i18n, retry, settings
+
+# Whether the last post in the channel was rejected because the bot may not post there
+_forbidden = False
+
+
+async def publish(bot, job_queue: JobQueue, text: str) -> bool:
+    """Post the message in the broadcast channel, return False if the bot may not post there"""
+
+    global _forbidden
+
+    try:
+        await retry.send_message(bot, job_queue, settings.BROADCAST_CHANNEL_ID, text)
+    except Forbidden as e:
+        logging.error(f"Got Forbidden when posting in the broadcast channel: {e}")
+        if not _forbidden:
+            _forbidden = True
+            await retry.send_message(bot, job_queue, settings.DEVELOPER_CHAT_ID,
+                                     i18n.default().gettext("MESSAGE_ADMIN_BROADCAST_CHANNEL_FORBIDDEN"))
+        return False
+
+    if _forbidden:
+        logging.info("Posting in the broadcast channel works again")
+        _forbidden = False
+    return True
@@ -0,0 +1,127 @@
+"""
+Identity of tracking updates
+
+The remote endpoint returns updates since the cursor of the last successful fetch, so after a failed cycle (or an
+outage) the same updates arrive again.  Updates are identified by frame plate number, control ID, and check-in time,
+and the most recently processed ones are remembered in a bounded LRU set, so repeated updates are dropped before any
+state or rendering work is done.  The set is seeded from the tail of the check-in history, so it survives restarts.
+
+An update only counts as processed once the fetch cycle that applied it completes and the cursor moves past it.  Until
+then it is applied again if it arrives again, and updates applied by a cycle that did not complete, e.g., because
+sending failed or the bot was stopped, are reported to followers again even though the status in the state did not
+change.
+"""
+
+import collections
+import datetime
+import itertools
+import logging
+
+from . import history
+
+# Number of remembered updates.  Must be well above the number of updates that may arrive again after an outage.
+_MAX_REMEMBERED_UPDATES = 100000
+
+_seeded = False
+_remembered = collections.OrderedDict()
+
+# Updates applied in the current fetch cycle
+_applied = {}
+
+# Updates applied in fetch cycles that did not complete, so their followers may not have been notified
+_interrupted = set()
+
+
+def _key(frame_plate_number, control_id, checkin_time) -> tuple:
+    """Return the identity of the update, `checkin_time` is an ISO timestamp, epoch seconds, or None"""
+
+    if isinstance(checkin_time, str):
+        checkin_time = datetime.datetime.fromisoformat(checkin_time).timestamp()
+    return int(frame_plate_number), int(control_id), checkin_time
+
+
+def _remember(key: tuple) -> None:
+    _remembered[key] = None
+    _remembered.move_to_end(key)
+    if len(_remembered) > _MAX_REMEMBERED_UPDATES:
+        _remembered.popitem(last=False)
+
+
+def _maybe_seed() -> None:
+    global _seeded
+
+    if _seeded:
+        return
+
+    # Imported here because the state module uses this one
+    from . import state
+
+    # Check-ins added to the history after the last successful fetch were applied by a cycle that did not complete
+    checkins = list(history.all_checkins())
+    confirmed_count = state.confirmed_checkin_count()
+    if confirmed_count is None:
+        confirmed_count = len(checkins)
+    for frame_plate_number, control_id, checkin_time in checkins[max(0, confirmed_count - _MAX_REMEMBERED_UPDATES):
+                                                                 confirmed_count]:
+        _remember(_key(frame_plate_number, control_id, checkin_time))
+    for frame_plate_number, control_id, checkin_time in checkins[confirmed_count:]:
+        _interrupted.add(_key(frame_plate_number, control_id, checkin_time))
+    _seeded = True
+
+    logging.info(f"Remembered {len(_remembered)} processed updates from the check-in history, "
+                 f"{len(_interrupted)} updates of an interrupted fetch cycle")
+
+
+def start_cycle() -> None:
+    """Start a fetch cycle, updates applied by the previous cycle count as interrupted unless it completed"""
+
+    _maybe_seed()
+
+    _interrupted.update(_applied)
+    _applied.clear()
+
+
+def complete_cycle() -> None:
+    """Remember the updates applied in the current fetch cycle and in interrupted ones as processed
+
+    Called once the cursor of the remote endpoint moved past them.
+    """
+
+    for key in itertools.chain(_interrupted, _applied):
+        _remember(key)
+    _interrupted.clear()
+    _applied.clear()
+
+
+def is_processed(frame_plate_number: str, control_id: str, checkin_time) -> bool:
+    """Return whether the update was processed already, in an earlier cycle or in the current one"""
+
+    _maybe_seed()
+
+    key = _key(frame_plate_number, control_id, checkin_time)
+    if key in _applied:
+        return True
+    if key not in _remembered:
+        return False
+
+    _remembered.move_to_end(key)
+    return True
+
+
+def mark_applied(frame_plate_number: str, control_id: str, checkin_time) -> bool:
+    """Remember that the update was applied in the current cycle, return whether a cycle that did not complete applied
+    it before"""
+
+    _maybe_seed()
+
+    key = _key(frame_plate_number, control_id, checkin_time)
+    _applied[key] = None
+    return key in _interrupted
+
+
+def clear() -> None:
+    """Forget all processed updates, e.g., when a new event is configured"""
+
+    _remembered.clear()
+    _applied.clear()
+    _interrupted.clear()
@@ -26,6 +26,88 @@ TIME_ZONE = "UTC"
 # Fetching interval in minutes.  Default is 5.
 FETCHING_INTERVAL_MINUTES = 5
 
+# ----------------------------------------------------------------------------------------------------------------------
+# Retries
+#
+# Delays before retrying failed sends and fetch cycles grow exponentially from this number of seconds, and are
+# randomised.  Default is 2.
+RETRY_BASE_SECONDS = 2
+# Maximum delay in seconds before retrying a failed send or fetch cycle.  Default is 300.
+RETRY_MAX_SECONDS = 300
+# Number of attempts to send a message before it is put into the dead-letter queue.  Default is 5.
+SEND_MAX_ATTEMPTS = 5
+# Number of fetch cycles in a row that may fail before fetching is paused.  Fetching resumes automatically as soon as
+# the remote endpoint responds again.  Default is 3.
+FETCH_FAILURES_BEFORE_PAUSE = 3
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Inline queries
+#
+# Time in seconds for which answers to inline queries are cached, both by the bot and by Telegram.  Answers cached by
+# the bot are also dropped when statuses of participants in them change, but answers cached by Telegram are not.
+# Default is 60.
+INLINE_QUERY_CACHE_SECONDS = 60
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Leaderboard
+#
+# Directory where the static leaderboard (JSON files and HTML pages with statuses of all participants) is exported, to
+# be served by a web server.  Default is an empty string, which disables the leaderboard.
+LEADERBOARD_DIRECTORY = ""
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Storage
+#
+# Whether participants are stored in a memory-mapped participant directory instead of the state file.  This saves memory
+# and time on events with very many participants.  Default is false.
+PARTICIPANT_DIRECTORY = False
+# Interval in minutes between versioned snapshots of the state, taken only if the state changed.  Default is 5.
+SNAPSHOT_INTERVAL_MINUTES = 5
+# Number of the newest versioned snapshots of the state that are kept, older ones are removed.  Default is 96.
+SNAPSHOT_RETENTION_COUNT = 96
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Sending
+#
+# Number of sender worker processes.  If it is greater than zero, the bot does not send notifications itself, it passes
+# them to the sender workers that must be started separately, see README.md.  Default is 0.
+SENDER_WORKER_COUNT = 0
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Live cards
+#
+# Whether every subscriber gets a single pinned message with the statuses of all participants in their list, which is
+# edited in place, instead of a new message on every check-in.  New messages are still sent when participants finish or
+# abandon.  Default is false.
+LIVE_CARDS = False
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Broadcasting
+#
+# ID of the Telegram channel where updates of participants with many followers are published instead of being sent to
+# each follower.  The bot must be an administrator of the channel.  Default is 0, which disables broadcasting.
+BROADCAST_CHANNEL_ID = 0
+# Link to the broadcast channel shown to the followers.  Default is an empty string.
+BROADCAST_CHANNEL_URL = ""
+# Number of followers starting from which updates of a participant are published in the broadcast channel.  Default is
+# 100.
+BROADCAST_FOLLOWER_THRESHOLD = 100
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Profiling
+#
+# Number of fetch cycles profiled when the administrator requests profiling of fetch cycles.  Default is 3.
+PROFILING_FETCH_CYCLES = 3
+# Duration in seconds of profiling requested by the administrator for all handlers.  Default is 60.
+PROFILING_HANDLER_SECONDS = 60
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Recording
+#
+# Whether responses of the remote endpoint and incoming Telegram updates are recorded to `recording.jsonl.gz` next to
+# the state file, to be replayed later, see README.md.  Default is false.
+RECORD_TRAFFIC = False
+
 # ----------------------------------------------------------------------------------------------------------------------
 # Other settings
 #
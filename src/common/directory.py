@@ -0,0 +1,182 @@
+"""
+Memory-mapped participant directory
+
+An alternative storage of participants for very large rosters.  Participants are stored in a binary file of fixed-size
+records sorted by frame plate number, which is memory-mapped, so lookups are binary searches that read the mapped pages
+directly, and several processes that open the file share the same pages.  Each record has a slot for the last known
+status of the participant, which is updated in place.
+
+The file starts with a header (magic bytes, layout version, number of records) followed by the records.  Frame plate
+numbers are stored as integers, like the rest of the bot assumes them to be.
+"""
+
+import bisect
+import mmap
+import os
+import pathlib
+import struct
+
+from . import settings
+
+_DIRECTORY_FILENAME = "/var/local/audax-tracker/directory.bin" if settings.SERVICE_MODE else pathlib.Path(
+    __file__).parent.parent / "directory.bin"
+
+_MAGIC, _VERSION = b"AUDAXDIR", 1
+
+# Magic bytes, layout version, number of records
+_HEADER = struct.Struct("<8sII")
+
+# Frame plate number, name, last known control ID, last known check-in time, whether the last known status is set.  Text
+# fields are UTF-8, padded with zeroes.  The record is padded to 160 bytes.
+_NAME_SIZE, _CHECKIN_TIME_SIZE = 116, 32
+_RECORD = struct.Struct(f"<I{_NAME_SIZE}sI{_CHECKIN_TIME_SIZE}s?3x")
+_PLATE = struct.Struct("<I")
+# Offset and layout of the last known status within a record
+_STATUS_OFFSET = _PLATE.size + _NAME_SIZE
+_STATUS = struct.Struct(f"<I{_CHECKIN_TIME_SIZE}s?")
+
+# Mapped file, number of records in it, and views of the mapped frame plate numbers that work with `bisect`
+_map = None
+_count = 0
+_views = []
+_plates = None
+
+
+def _encode(text: str, size: int) -> bytes:
+    """Encode text as UTF-8 that fits `size` bytes, dropping whatever does not fit"""
+
+    return text.encode("utf-8")[:size].decode("utf-8", errors="ignore").encode("utf-8")
+
+
+def _decode(data: bytes) -> str:
+    return data.rstrip(b"\0").decode("utf-8")
+
+
+def exists() -> bool:
+    return _map is not None or os.path.exists(_DIRECTORY_FILENAME)
+
+
+def _maybe_open() -> None:
+    global _count, _map, _plates
+
+    if _map is not None:
+        return
+
+    with open(_DIRECTORY_FILENAME, "r+b") as directory_file:
+        _map = mmap.mmap(directory_file.fileno(), 0)
+
+    magic, version, _count = _HEADER.unpack_from(_map)
+    if magic != _MAGIC or version != _VERSION:
+        raise RuntimeError(f"{_DIRECTORY_FILENAME} is not a participant directory of version {_VERSION}")
+
+    # Frame plate numbers are the first field of each record, so a strided view of the mapped file as unsigned integers
+    # is a sorted sequence of frame plate numbers, without copying anything.
+    records = memoryview(_map)[_HEADER.size:_HEADER.size + _count * _RECORD.size]
+    integers = records.cast("I")
+    _plates = integers[::_RECORD.size // _PLATE.size]
+    _views.extend((records, integers, _plates))
+
+
+def _close() -> None:
+    global _count, _map, _plates
+
+    for view in reversed(_views):
+        view.release()
+    _views.clear()
+    _plates = None
+
+    if _map is not None:
+        _map.close()
+    _map = None
+    _count = 0
+
+
+def build(participants: dict) -> None:
+    """Replace the directory with `participants`
+
+    `participants` maps frame plate numbers to dictionaries that have `name` and `last_known_status`, the same way the
+    state stores them.
+    """
+
+    temporary_filename = f"{_DIRECTORY_FILENAME}.tmp"
+    with open(temporary_filename, "wb") as directory_file:
+        directory_file.write(_HEADER.pack(_MAGIC, _VERSION, len(participants)))
+        for frame_plate_number in sorted(participants, key=lambda n: int(n)):
+            data = participants[frame_plate_number]
+            status = data["last_known_status"] if "last_known_status" in data else {}
+            has_status = "control" in status
+            directory_file.write(_RECORD.pack(
+                int(frame_plate_number), _encode(data["name"], _NAME_SIZE),
+                int(status["control"]) if has_status else 0,
+                _encode(status["checkin_time"] or "", _CHECKIN_TIME_SIZE) if has_status else b"", has_status))
+
+    _close()
+    os.replace(temporary_filename, _DIRECTORY_FILENAME)
+
+
+def remove() -> None:
+    """Delete the directory file"""
+
+    _close()
+    os.remove(_DIRECTORY_FILENAME)
+
+
+def count() -> int:
+    _maybe_open()
+    return _count
+
+
+def _find(frame_plate_number: str) -> int:
+    """Return the offset of the participant's record, or -1 if there is no such participant"""
+
+    _maybe_open()
+
+    if not frame_plate_number.isdigit():
+        return -1
+
+    plate = int(frame_plate_number)
+    index = bisect.bisect_left(_plates, plate)
+    if index < _count and _plates[index] == plate:
+        return _HEADER.size + index * _RECORD.size
+
+    return -1
+
+
+def has(frame_plate_number: str) -> bool:
+    return _find(frame_plate_number) >= 0
+
+
+def _unpack(offset: int) -> tuple:
+    """Return the frame plate number and the data of the participant whose record starts at `offset`"""
+
+    plate, name, control, checkin_time, has_status = _RECORD.unpack_from(_map, offset)
+    status = {"control": str(control), "checkin_time": _decode(checkin_time) or None} if has_status else {}
+
+    return str(plate), {"name": _decode(name), "last_known_status": status}
+
+
+def get(frame_plate_number: str):
+    """Return the data of the participant in the same form as the state stores it, or None if there is no such one"""
+
+    offset = _find(frame_plate_number)
+    return _unpack(offset)[1] if offset >= 0 else None
+
+
+def items():
+    """Iterate over all participants as tuples of frame plate number and data, ordered by frame plate number"""
+
+    _maybe_open()
+
+    for index in range(_count):
+        yield _unpack(_HEADER.size + index * _RECORD.size)
+
+
+def set_status(frame_plate_number: str, control_id: str, checkin_time: str) -> None:
+    """Write the last known status of the participant into their record"""
+
+    offset = _find(frame_plate_number)
+    if offset < 0:
+        raise KeyError(frame_plate_number)
+
+    _STATUS.pack_into(_map, offset + _STATUS_OFFSET, int(control_id), _encode(checkin_time or "", _CHECKIN_TIME_SIZE),
+                      True)
@@ -6,7 +6,34 @@ import datetime
 import logging
 from zoneinfo import ZoneInfo
 
-from common import settings, state
+from telegram.constants import MessageLimit
+
+from common import analytics, i18n, settings, state
+
+# Overdue participants listed by number in the statistics of the event, the rest are only counted
+_MAX_LISTED_OVERDUE_PARTICIPANTS = 20
+
+# Names of the months by translator, indexed by the month number
+_month_names = {}
+
+# Time zone of the event, and the setting it was created from
+_time_zone = None
+_time_zone_name = None
+
+
+def reset() -> None:
+    """Forget the month names, e.g., after the catalogs were read again"""
+
+    _month_names.clear()
+
+
+def event_time_zone() -> ZoneInfo:
+    global _time_zone, _time_zone_name
+
+    if _time_zone_name != settings.TIME_ZONE:
+        _time_zone, _time_zone_name = ZoneInfo(settings.TIME_ZONE), settings.TIME_ZONE
+
+    return _time_zone
 
 
 def datetime_remainder(trans, delta: datetime.timedelta) -> str:
@@ -44,83 +71,172 @@ def event_status(trans) -> str:
 def month_name(trans, month_index: int) -> str:
     """Return name of the month"""
 
-    if month_index == 1:
-        return trans.gettext("PIECE_DATETIME_JAN")
-    elif month_index == 2:
-        return trans.gettext("PIECE_DATETIME_FEB")
-    elif month_index == 3:
-        return trans.gettext("PIECE_DATETIME_MAR")
-    elif month_index == 4:
-        return trans.gettext("PIECE_DATETIME_APR")
-    elif month_index == 5:
-        return trans.gettext("PIECE_DATETIME_MAY")
-    elif month_index == 6:
-        return trans.gettext("PIECE_DATETIME_JUN")
-    elif month_index == 7:
-        return trans.gettext("PIECE_DATETIME_JUL")
-    elif month_index == 8:
-        return trans.gettext("PIECE_DATETIME_AUG")
-    elif month_index == 9:
-        return trans.gettext("PIECE_DATETIME_SEP")
-    elif month_index == 10:
-        return trans.gettext("PIECE_DATETIME_OCT")
-    elif month_index == 11:
-        return trans.gettext("PIECE_DATETIME_NOV")
-    elif month_index == 12:
-        return trans.gettext("PIECE_DATETIME_DEC")
-    else:
-        raise RuntimeError("Wrong month number: ".format(month_index))
+    if trans not in _month_names:
+        _month_names[trans] = (None, trans.gettext("PIECE_DATETIME_JAN"), trans.gettext("PIECE_DATETIME_FEB"),
+                               trans.gettext("PIECE_DATETIME_MAR"), trans.gettext("PIECE_DATETIME_APR"),
+                               trans.gettext("PIECE_DATETIME_MAY"), trans.gettext("PIECE_DATETIME_JUN"),
+                               trans.gettext("PIECE_DATETIME_JUL"), trans.gettext("PIECE_DATETIME_AUG"),
+                               trans.gettext("PIECE_DATETIME_SEP"), trans.gettext("PIECE_DATETIME_OCT"),
+                               trans.gettext("PIECE_DATETIME_NOV"), trans.gettext("PIECE_DATETIME_DEC"))
+
+    if not 1 <= month_index <= 12:
+        raise RuntimeError("Wrong month number: {}".format(month_index))
+
+    return _month_names[trans][month_index]
 
 
 def control_label(trans, control: state.Control) -> str:
     """Format a label for a control, which is control name and the distance to it"""
 
-    return trans.gettext("CONTROL_LABEL {name} {distance}").format(distance=control.distance, name=control.name(trans))
+    return i18n.template(trans, "CONTROL_LABEL {name} {distance}")(distance=control.distance, name=control.name(trans))
+
+
+def _day_and_time(trans, moment: datetime.datetime) -> str:
+    moment = moment.astimezone(event_time_zone())
+    return i18n.template(trans, "CHECKIN_DATE_AND_TIME {month} {day} {hour} {minute}")(
+        day=moment.day, hour=moment.hour, minute=moment.minute, month=month_name(trans, moment.month))
 
 
 def checkin_day_and_time(trans, timestamp: str) -> str:
     """Format a datetime object in checkin format, which is month, day, hour and minute"""
 
-    checkin_time = datetime.datetime.fromisoformat(timestamp).astimezone(ZoneInfo(settings.TIME_ZONE))
-    return trans.gettext("CHECKIN_DATE_AND_TIME {month} {day} {hour} {minute}").format(day=checkin_time.day,
-                                                                                       hour=checkin_time.hour,
-                                                                                       minute=checkin_time.minute,
-                                                                                       month=month_name(
-                                                                                           trans,
-                                                                                           checkin_time.month))
+    return _day_and_time(trans, datetime.datetime.fromisoformat(timestamp))
 
 
-def result_time(timestamp: str) -> str:
-    """Calculate difference with event start and format result as hours and minutes"""
+def hours_and_minutes(delta: datetime.timedelta) -> str:
+    """Format time delta as hours and minutes"""
 
-    delta = datetime.datetime.fromisoformat(timestamp) - state.Event().start
     hours = int(delta.seconds / 3600) + delta.days * 24
     minutes = int(delta.seconds % 3600 / 60)
     return f"{hours}:{minutes:02d}"
 
 
+def result_time(timestamp: str) -> str:
+    """Calculate difference with event start and format result as hours and minutes"""
+
+    return hours_and_minutes(datetime.datetime.fromisoformat(timestamp) - state.Event().start)
+
+
+def eta(trans, participant: state.Participant) -> str:
+    """Format the expected check-in of the participant at their next control, or return an empty string if unknown"""
+
+    estimate = analytics.eta(participant.frame_plate_number)
+    if not estimate:
+        return ""
+
+    control_id, eta_time = estimate
+    return i18n.template(trans, "PIECE_ETA {control_label} {checkin_time}")(
+        checkin_time=_day_and_time(trans, datetime.datetime.fromtimestamp(eta_time, datetime.timezone.utc)),
+        control_label=control_label(trans, state.Control(control_id)))
+
+
+def event_analytics(trans) -> str:
+    """Format statistics of the event: progress of participants along the controls, and participants that are overdue"""
+
+    message = []
+
+    median_splits = analytics.median_splits()
+    for control_id, passed in analytics.passed_counts().items():
+        median_split = median_splits[control_id]
+        message.append(trans.gettext("PIECE_ANALYTICS_CONTROL {control_label} {passed} {median_split}").format(
+            control_label=control_label(trans, state.Control(control_id)),
+            median_split=hours_and_minutes(datetime.timedelta(seconds=median_split)) if median_split else "—",
+            passed=passed))
+
+    overdue = analytics.overdue_participants()
+    if overdue:
+        participants = ", ".join(overdue[:_MAX_LISTED_OVERDUE_PARTICIPANTS])
+        if len(overdue) > _MAX_LISTED_OVERDUE_PARTICIPANTS:
+            participants += ", …"
+        message.append(trans.ngettext("PIECE_ANALYTICS_OVERDUE_S {count} {participants}",
+                                      "PIECE_ANALYTICS_OVERDUE_P {count} {participants}", len(overdue)).format(
+            count=len(overdue), participants=participants))
+
+    return "\n".join(message)
+
+
 def participant_status(trans, participant: state.Participant) -> str:
     """Format current status of the participant"""
 
     if not participant.last_known_control_id:
-        return trans.gettext("LAST_KNOWN_STATUS_UNKNOWN {participant_label}").format(
+        return i18n.template(trans, "LAST_KNOWN_STATUS_UNKNOWN {participant_label}")(
             participant_label=participant.label)
 
     control = state.Control(participant.last_known_control_id)
 
     if control.finish:
-        return trans.gettext("LAST_KNOWN_STATUS_FINISH {participant_label} {checkin_time} {result_time}").format(
+        return i18n.template(trans, "LAST_KNOWN_STATUS_FINISH {participant_label} {checkin_time} {result_time}")(
             checkin_time=checkin_day_and_time(trans, participant.last_known_checkin_time),
             participant_label=participant.label,
             result_time=result_time(participant.last_known_checkin_time))
 
     if participant.last_known_checkin_time:
-        return trans.gettext(
-            "LAST_KNOWN_STATUS_OK {participant_label} {checkin_time} {control_label}").format(
-                control_label=control_label(trans, control),
-                checkin_time=checkin_day_and_time(trans, participant.last_known_checkin_time),
-                participant_label=participant.label)
+        status = i18n.template(trans, "LAST_KNOWN_STATUS_OK {participant_label} {checkin_time} {control_label}")(
+            control_label=control_label(trans, control),
+            checkin_time=checkin_day_and_time(trans, participant.last_known_checkin_time),
+            participant_label=participant.label)
+        eta_line = eta(trans, participant)
+        return f"{status}\n{eta_line}" if eta_line else status
 
-    return trans.gettext("LAST_KNOWN_STATUS_ABANDONED {participant_label} {control_label}").format(
+    return i18n.template(trans, "LAST_KNOWN_STATUS_ABANDONED {participant_label} {control_label}")(
         control_label=control_label(trans, control),
         participant_label=participant.label)
+
+
+def subscription_status(trans, tg_id: str) -> str:
+    """Format the status of the event and current statuses of all participants in the user's list"""
+
+    message = []
+    event = state.Event()
+    if event.valid:
+        message.append("<strong>{event_name}</strong>".format(event_name=event.name(trans)))
+        message.append(event_status(trans))
+        message.append("")
+
+    if not state.has_subscriber(tg_id):
+        message.append(trans.gettext("MESSAGE_STATUS_SUBSCRIPTION_EMPTY"))
+    else:
+        message.append(trans.gettext("MESSAGE_STATUS_SUBSCRIPTION_LIST_HEADER"))
+        for frame_plate_number in state.Subscription(tg_id).numbers:
+            message.append(participant_status(trans, state.Participant(frame_plate_number)))
+
+    return "\n".join(message)
+
+
+def moved_to_broadcast_channel(trans, participant: state.Participant) -> str:
+    """Format a notice that updates of the participant are published in the broadcast channel"""
+
+    return trans.gettext("PIECE_MOVED_TO_BROADCAST_CHANNEL {participant_label} {url}").format(
+        participant_label=participant.label, url=settings.BROADCAST_CHANNEL_URL)
+
+
+def group_entries(render, entries: list) -> list:
+    """Return the entries in as few consecutive groups as possible, each of which fits into a Telegram message
+
+    `render(entries=...)` makes the text of a message from its entries joined by newlines, e.g., it is the `format`
+    method of a translated message.
+    """
+
+    overhead = len(render(entries=""))
+    groups = []
+    current = []
+    length = overhead
+    for entry in entries:
+        if current and length + 1 + len(entry) > MessageLimit.MAX_TEXT_LENGTH:
+            groups.append(current)
+            current = []
+            length = overhead
+        length += len(entry) + (1 if current else 0)
+        current.append(entry)
+    if current:
+        groups.append(current)
+    return groups
+
+
+def split_entries(render, entries: list) -> list:
+    """Return texts of as few messages as possible that list the entries within the length limit of a Telegram message
+
+    See `group_entries()` for `render`.
+    """
+
+    return [render(entries="\n".join(group)) for group in group_entries(render, entries)]
@@ -0,0 +1,221 @@
+"""
+Check-in history
+
+Every check-in reported for a participant is stored in an append-only binary file of fixed-size records, separately from
+the state, so the file is never rewritten when a check-in is added.  The records are also kept in memory in columnar
+arrays, indexed by participant and by control.  The index by control is ordered by check-in time, so range queries use
+binary search.
+
+Frame plate numbers and control IDs are stored as integers, like the rest of the bot assumes them to be.
+"""
+
+import array
+import bisect
+import datetime
+import logging
+import math
+import os
+import pathlib
+import struct
+
+from . import settings
+
+_HISTORY_FILENAME = "/var/local/audax-tracker/history.bin" if settings.SERVICE_MODE else pathlib.Path(
+    __file__).parent.parent / "history.bin"
+
+# Frame plate number, control ID, check-in time as epoch seconds
+_RECORD = struct.Struct("<IId")
+
+# Check-in time stored for participants who abandoned at a control.  Infinity keeps the index by control sorted.
+_ABANDONED = math.inf
+
+_loaded = False
+_file = None
+
+# All records, by row
+_plates = array.array("I")
+_controls = array.array("I")
+_times = array.array("d")
+
+# Rows by frame plate number
+_by_participant = {}
+
+# Check-in times and rows by control ID, both sorted by check-in time
+_by_control = {}
+
+
+def _index(row: int) -> None:
+    plate, control, checkin_time = _plates[row], _controls[row], _times[row]
+
+    if plate not in _by_participant:
+        _by_participant[plate] = array.array("I")
+    _by_participant[plate].append(row)
+
+    if control not in _by_control:
+        _by_control[control] = (array.array("d"), array.array("I"))
+    times, rows = _by_control[control]
+    if not times or times[-1] <= checkin_time:
+        times.append(checkin_time)
+        rows.append(row)
+    else:
+        position = bisect.bisect_right(times, checkin_time)
+        times.insert(position, checkin_time)
+        rows.insert(position, row)
+
+
+def _maybe_load() -> None:
+    global _file, _loaded
+
+    if _loaded:
+        return
+
+    try:
+        with open(_HISTORY_FILENAME, "rb") as history_file:
+            data = history_file.read()
+    except FileNotFoundError:
+        data = b""
+
+    complete_size = len(data) - len(data) % _RECORD.size
+    if complete_size != len(data):
+        logging.error("The check-in history ends with an incomplete record, dropping it")
+        with open(_HISTORY_FILENAME, "r+b") as history_file:
+            history_file.truncate(complete_size)
+
+    for plate, control, checkin_time in _RECORD.iter_unpack(data[:complete_size]):
+        _plates.append(plate)
+        _controls.append(control)
+        _times.append(checkin_time)
+        _index(len(_plates) - 1)
+
+    _file = open(_HISTORY_FILENAME, "ab")
+    _loaded = True
+
+    logging.info(f"Loaded {len(_plates)} check-ins from the history")
+
+
+def append(frame_plate_number: str, control_id: str, checkin_time) -> bool:
+    """Add a check-in to the history, unless exactly the same check-in is there already
+
+    `checkin_time` is an ISO timestamp, epoch seconds, or None if the participant abandoned at that control.  Returns
+    whether the check-in was added.
+    """
+
+    _maybe_load()
+
+    plate, control = int(frame_plate_number), int(control_id)
+    if checkin_time is None:
+        epoch = _ABANDONED
+    elif isinstance(checkin_time, str):
+        epoch = datetime.datetime.fromisoformat(checkin_time).timestamp()
+    else:
+        epoch = checkin_time
+
+    for row in _by_participant.get(plate, ()):
+        if _controls[row] == control and _times[row] == epoch:
+            return False
+
+    _plates.append(plate)
+    _controls.append(control)
+    _times.append(epoch)
+    _index(len(_plates) - 1)
+
+    _file.write(_RECORD.pack(plate, control, epoch))
+    _file.flush()
+
+    return True
+
+
+def count() -> int:
+    """Return the number of check-ins in the history"""
+
+    _maybe_load()
+
+    return len(_plates)
+
+
+def _checkin_time(row: int):
+    return _times[row] if _times[row] != _ABANDONED else None
+
+
+def checkins(frame_plate_number: str) -> list:
+    """Return check-ins of the participant as tuples of control ID and check-in time, ordered by check-in time
+
+    Check-in time is epoch seconds, or None if the participant abandoned at that control.
+    """
+
+    _maybe_load()
+
+    rows = sorted(_by_participant.get(int(frame_plate_number), ()), key=lambda r: _times[r])
+    return [(str(_controls[row]), _checkin_time(row)) for row in rows]
+
+
+def checkins_at_control(control_id: str, since: float = -math.inf, until: float = math.inf) -> list:
+    """Return check-ins at the control as tuples of frame plate number and check-in time, ordered by check-in time
+
+    Only check-ins with `since` <= check-in time < `until` are returned, times are epoch seconds.  Abandons are not
+    returned.
+    """
+
+    _maybe_load()
+
+    if int(control_id) not in _by_control:
+        return []
+
+    times, rows = _by_control[int(control_id)]
+    first = bisect.bisect_left(times, since)
+    last = bisect.bisect_left(times, min(until, _ABANDONED), lo=first)
+    return [(str(_plates[rows[i]]), times[i]) for i in range(first, last)]
+
+
+def all_checkins():
+    """Iterate over all check-ins in the order they were added, as tuples of frame plate number, control ID, and
+    check-in time (epoch seconds or None)"""
+
+    _maybe_load()
+
+    for row in range(len(_plates)):
+        yield str(_plates[row]), str(_controls[row]), _checkin_time(row)
+
+
+def truncate(count: int) -> None:
+    """Drop the check-ins added after the first `count` ones, e.g., when the state is rolled back to a snapshot"""
+
+    global _file, _loaded
+
+    if _file is not None:
+        _file.close()
+        _file = None
+
+    try:
+        with open(_HISTORY_FILENAME, "r+b") as history_file:
+            history_file.truncate(count * _RECORD.size)
+            os.fsync(history_file.fileno())
+    except FileNotFoundError:
+        pass
+
+    for column in (_plates, _controls, _times):
+        del column[:]
+    _by_participant.clear()
+    _by_control.clear()
+    _loaded = False
+
+    logging.info(f"Truncated the check-in history to {count} check-ins")
+
+
+def clear() -> None:
+    """Delete the whole history, e.g., when a new event is configured"""
+
+    global _file
+
+    _maybe_load()
+
+    _file.close()
+    os.remove(_HISTORY_FILENAME)
+    _file = open(_HISTORY_FILENAME, "ab")
+
+    for column in (_plates, _controls, _times):
+        del column[:]
+    _by_participant.clear()
+    _by_control.clear()
+
+    logging.info("Cleared the check-in history")
@@ -11,8 +11,26 @@ from . import settings
 
 _DOMAIN = "bot"
 
-_last_used_lang = None
-_last_used_trans = None
+# Translators that were loaded already, by language code.  Compiled catalogs are only read from the disk once.
+_translators = {}
+
+# Compiled templates by translator, see `templates()`
+_templates = {}
+
+
+class _Templates(dict):
+    """Templates of one language: the bound `format` method of the translated message, by message ID
+
+    A message is translated and compiled the first time it is used, after that rendering it is a single call.
+    """
+
+    def __init__(self, translator: gettext.GNUTranslations):
+        super().__init__()
+        self._translator = translator
+
+    def __missing__(self, message_id: str):
+        template = self[message_id] = self._translator.gettext(message_id).format
+        return template
 
 
 def _get_locale_directory() -> pathlib.Path:
@@ -21,33 +39,56 @@ def _get_locale_directory() -> pathlib.Path:
     return pathlib.Path(__file__).parent.parent / "locales"
 
 
+def _load(language_code: str) -> gettext.GNUTranslations:
+    """Get the translator for `language_code`, loading its catalog if that was not done yet"""
+
+    if language_code not in _translators:
+        # Not `gettext.translation()`, which keeps every catalog it read for the life of the process, so `reset()`
+        # would not make it read the catalog again
+        catalog_filename = gettext.find(_DOMAIN, _get_locale_directory(), [language_code])
+        if catalog_filename is None:
+            raise FileNotFoundError(f"No catalog of the {language_code} language in {_get_locale_directory()}")
+        with open(catalog_filename, "rb") as catalog_file:
+            translator = gettext.GNUTranslations(catalog_file)
+        _translators[language_code] = translator
+        _templates[translator] = _Templates(translator)
+
+    return _translators[language_code]
+
+
+def reset() -> None:
+    """Forget the loaded translators, so that catalogs are read from the disk again, e.g., after settings changed"""
+
+    _translators.clear()
+    _templates.clear()
+
+
 def default() -> gettext.GNUTranslations:
     """Get the default translator"""
 
-    return gettext.translation(domain=_DOMAIN, localedir=_get_locale_directory(), languages=[settings.DEFAULT_LANGUAGE])
+    return _load(settings.DEFAULT_LANGUAGE)
 
 
 def for_lang(language_code: str) -> gettext.GNUTranslations:
     """Get the translator for `language_code` if it exists, otherwise the default one"""
 
-    return gettext.translation(domain=_DOMAIN, localedir=_get_locale_directory(), languages=[
-        language_code if language_code in settings.SUPPORTED_LANGUAGES else settings.DEFAULT_LANGUAGE])
+    return _load(language_code if language_code in settings.SUPPORTED_LANGUAGES else settings.DEFAULT_LANGUAGE)
 
 
-def trans(user: User) -> gettext.GNUTranslations:
-    """Get a translator for the given user
+def template(translator: gettext.GNUTranslations, message_id: str):
+    """Get the compiled template of the message in the translator's language
 
-    Respects the language-related settings.  Caches the translator and only loads another one if the language changes.
+    `template(trans, message_id)(**values)` renders the same text as `trans.gettext(message_id).format(**values)`.
+    Message IDs passed to this function are extracted to the catalogs like those passed to `gettext()`.
     """
 
-    if user.language_code not in settings.SUPPORTED_LANGUAGES:
-        user_lang = settings.DEFAULT_LANGUAGE
-    else:
-        user_lang = user.language_code
+    return _templates[translator][message_id]
 
-    global _last_used_lang, _last_used_trans
-    if _last_used_lang != user_lang:
-        _last_used_lang = user_lang
-        _last_used_trans = gettext.translation(domain=_DOMAIN, localedir=_get_locale_directory(), languages=[user_lang])
 
-    return _last_used_trans
+def trans(user: User) -> gettext.GNUTranslations:
+    """Get a translator for the given user
+
+    Respects the language-related settings.
+    """
+
+    return for_lang(user.language_code)
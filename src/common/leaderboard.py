@@ -0,0 +1,223 @@
+"""
+Static live leaderboard
+
+The last known statuses of all participants are exported to `LEADERBOARD_DIRECTORY` as static JSON files and
+pre-rendered HTML pages, so that any web server can serve them to spectators without involving the bot.  Participants
+are split into chunks by frame plate number, each chunk has its own JSON file and HTML page, and only the chunks of
+participants whose status changed are written again.  The summary (the event, and how many participants passed each
+control) is small and is written whenever anything changed.  Every file is written to a temporary file first and then
+renamed, so the web server never serves a partly written file.
+"""
+
+import datetime
+import html
+import json
+import logging
+import os
+import pathlib
+import time
+
+from telegram.ext import Application, ContextTypes
+
+from . import analytics, format, i18n, settings, state
+
+# Number of participants per chunk
+_CHUNK_SIZE = 500
+
+# Interval between checks whether anything has to be exported
+_EXPORT_INTERVAL_SECONDS = 30
+
+_SUMMARY_JSON_FILENAME = "leaderboard.json"
+_SUMMARY_HTML_FILENAME = "index.html"
+
+_PAGE = """<!DOCTYPE html>
+<html lang="{lang}">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{title}</title>
+</head>
+<body>
+<h1>{title}</h1>
+{body}
+<p><small>{updated}</small></p>
+</body>
+</html>
+"""
+
+# Frame plate numbers by chunk, and chunks by frame plate number
+_chunks = []
+_chunk_indices = {}
+
+# Whether all files have to be written, and the chunks that have to be written
+_all_dirty = True
+_dirty_chunks = set()
+
+
+def _chunk_filename(index: int, extension: str) -> str:
+    return f"participants-{index + 1}.{extension}"
+
+
+def _write(filename: str, content: str) -> None:
+    path = pathlib.Path(settings.LEADERBOARD_DIRECTORY) / filename
+    temporary_path = path.with_name(f".{path.name}.tmp")
+    with open(temporary_path, "w", encoding="utf8") as temporary_file:
+        temporary_file.write(content)
+    os.replace(temporary_path, path)
+
+
+def _page(trans, title: str, body: str, updated: datetime.datetime) -> str:
+    return _PAGE.format(body=body, lang=trans.info()["language"], title=html.escape(title),
+                        updated=html.escape(trans.gettext("LEADERBOARD_UPDATED {time}").format(
+                            time=format.checkin_day_and_time(trans, updated.isoformat()))))
+
+
+def _participant_entry(participant: state.Participant) -> dict:
+    entry = {"frame_plate_number": participant.frame_plate_number, "name": participant.name, "control": None,
+             "checkin_time": None, "finished": False, "abandoned": False, "result_time": None}
+    if participant.last_known_control_id:
+        entry["control"] = participant.last_known_control_id
+        entry["checkin_time"] = participant.last_known_checkin_time
+        entry["abandoned"] = participant.last_known_checkin_time is None
+        if participant.last_known_checkin_time and state.Control(participant.last_known_control_id).finish:
+            entry["finished"] = True
+            entry["result_time"] = format.result_time(participant.last_known_checkin_time)
+    return entry
+
+
+def _chunk_title(trans, index: int) -> str:
+    return trans.gettext("LEADERBOARD_PARTICIPANTS {first} {last}").format(first=_chunks[index][0],
+                                                                           last=_chunks[index][-1])
+
+
+def _status_html(trans, participant: state.Participant) -> str:
+    """Format the status of the participant for a web page
+
+    The status is formatted for Telegram and includes the name from the remote endpoint as is, so it is escaped as a
+    whole, and only the emphasis added by the message templates is restored.
+    """
+
+    status = html.escape(format.participant_status(trans, participant))
+    return status.replace("&lt;strong&gt;", "<strong>").replace("&lt;/strong&gt;", "</strong>").replace("\n", "<br>")
+
+
+def _write_chunk(trans, index: int, updated: datetime.datetime) -> None:
+    participants = [state.Participant(frame_plate_number) for frame_plate_number in _chunks[index]]
+
+    _write(_chunk_filename(index, "json"), json.dumps(
+        {"updated": updated.isoformat(), "participants": [_participant_entry(p) for p in participants]},
+        ensure_ascii=False))
+
+    rows = "\n".join(f"<li>{_status_html(trans, p)}</li>" for p in participants)
+    body = (f'<p><a href="{_SUMMARY_HTML_FILENAME}">{html.escape(state.Event().name(trans))}</a></p>\n'
+            f"<ul>\n{rows}\n</ul>")
+    _write(_chunk_filename(index, "html"), _page(trans, _chunk_title(trans, index), body, updated))
+
+
+def _write_summary(trans, updated: datetime.datetime) -> None:
+    event = state.Event()
+    passed_counts = analytics.passed_counts()
+
+    _write(_SUMMARY_JSON_FILENAME, json.dumps(
+        {"updated": updated.isoformat(), "event": event.name(trans), "participant_count": len(_chunk_indices),
+         "controls": [{"id": control_id, "name": state.Control(control_id).name(trans),
+                       "distance": state.Control(control_id).distance, "passed": passed}
+                      for control_id, passed in passed_counts.items()],
+         "chunks": [{"first": chunk[0], "last": chunk[-1], "json": _chunk_filename(index, "json"),
+                     "html": _chunk_filename(index, "html")} for index, chunk in enumerate(_chunks)]},
+        ensure_ascii=False))
+
+    progress = "\n".join(f"<li>{html.escape(format.control_label(trans, state.Control(control_id)))}: {passed}</li>"
+                         for control_id, passed in passed_counts.items())
+    links = "\n".join(f'<li><a href="{_chunk_filename(index, "html")}">'
+                      f"{html.escape(_chunk_title(trans, index))}</a></li>" for index in range(len(_chunks)))
+    heading = html.escape(trans.gettext("LEADERBOARD_PROGRESS"))
+    body = f"<h2>{heading}</h2>\n<ul>\n{progress}\n</ul>\n<ul>\n{links}\n</ul>"
+    _write(_SUMMARY_HTML_FILENAME, _page(trans, event.name(trans), body, updated))
+
+
+def _rebuild_chunks() -> None:
+    global _chunk_indices, _chunks
+
+    frame_plate_numbers = sorted((p.frame_plate_number for p in state.participants()), key=lambda n: int(n))
+    _chunks = [frame_plate_numbers[i:i + _CHUNK_SIZE] for i in range(0, len(frame_plate_numbers), _CHUNK_SIZE)]
+    _chunk_indices = {n: index for index, chunk in enumerate(_chunks) for n in chunk}
+
+
+def _remove_stale_chunks() -> None:
+    """Remove chunk files left from a bigger list of participants"""
+
+    for path in pathlib.Path(settings.LEADERBOARD_DIRECTORY).glob("participants-*.*"):
+        number = path.stem.removeprefix("participants-")
+        if number.isdigit() and int(number) > len(_chunks):
+            path.unlink()
+
+
+def export() -> int:
+    """Write the files that changed since the last export, return the number of written chunks"""
+
+    global _all_dirty
+
+    if not _all_dirty and not _dirty_chunks:
+        return 0
+
+    started = time.perf_counter()
+
+    os.makedirs(settings.LEADERBOARD_DIRECTORY, exist_ok=True)
+    if _all_dirty:
+        _rebuild_chunks()
+        _remove_stale_chunks()
+        indices = range(len(_chunks))
+    else:
+        indices = sorted(_dirty_chunks)
+    _all_dirty = False
+    _dirty_chunks.clear()
+
+    trans = i18n.default()
+    updated = datetime.datetime.now(datetime.timezone.utc)
+    for index in indices:
+        _write_chunk(trans, index, updated)
+    _write_summary(trans, updated)
+
+    logging.info(f"Exported {len(indices)} of {len(_chunks)} leaderboard chunks in "
+                 f"{time.perf_counter() - started:.3f} seconds")
+
+    return len(indices)
+
+
+def invalidate() -> None:
+    """Make all files be written at the next export, e.g., after the configuration changed"""
+
+    global _all_dirty
+
+    _all_dirty = True
+
+
+def on_participant_status_changed(frame_plate_number: str, control_id: str, checkin_time: str) -> None:
+    if frame_plate_number in _chunk_indices:
+        _dirty_chunks.add(_chunk_indices[frame_plate_number])
+    else:
+        invalidate()
+
+
+def on_participants_changed(added: dict, removed: list) -> None:
+    invalidate()
+
+
+async def _export(context: ContextTypes.DEFAULT_TYPE) -> None:
+    export()
+
+
+def init(application: Application) -> None:
+    """Start exporting the leaderboard periodically, if it is enabled"""
+
+    if not settings.LEADERBOARD_DIRECTORY:
+        return
+
+    state.add_on_participant_status_changed(on_participant_status_changed)
+    state.add_on_participants_changed(on_participants_changed)
+
+    application.job_queue.run_repeating(_export, interval=_EXPORT_INTERVAL_SECONDS, first=0)
+
+    logging.info(f"The leaderboard is exported to {settings.LEADERBOARD_DIRECTORY} "
+                 f"every {_EXPORT_INTERVAL_SECONDS} seconds")
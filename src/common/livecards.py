@@ -0,0 +1,134 @@
+"""
+Live cards
+
+When `LIVE_CARDS` is enabled, every subscriber has a single pinned message, the live card, with the same content as the
+response to the /status command.  When statuses of participants in the subscriber's list change, the card is edited in
+place instead of a new message being sent, and only milestones (finishes and abandons) are still sent as new messages,
+so that the subscriber gets notified about them.
+
+Cards are not edited right away: a card that became outdated is edited after `_DEBOUNCE_SECONDS`, so that several
+check-ins in a row lead to a single edit, a card is not edited more often than every `_MIN_EDIT_INTERVAL_SECONDS`, and
+no more than `_MAX_EDITS_PER_FLUSH` cards are edited at once, to stay well within the limits of Telegram.  A card is
+only edited if the hash of its content changed.
+"""
+
+import hashlib
+import logging
+import math
+import time
+
+from telegram import Bot
+from telegram.error import BadRequest, Forbidden, TelegramError
+from telegram.ext import Application, ContextTypes
+
+from . import format, i18n, retry, settings, state
+
+# Interval between checks for outdated cards
+_FLUSH_INTERVAL_SECONDS = 5
+
+# Time for which an outdated card waits for more changes, and the minimum time between edits of the same card
+_DEBOUNCE_SECONDS = 10
+_MIN_EDIT_INTERVAL_SECONDS = 60
+
+# Maximum number of cards edited or sent at each check
+_MAX_EDITS_PER_FLUSH = 100
+
+# Outdated cards: subscriber ID -> the moment when the card became outdated
+_outdated = {}
+
+# Subscriber ID -> the moment when their card was edited last time
+_last_edit_times = {}
+
+
+def mark_outdated(tg_ids) -> None:
+    """Make the cards of the subscribers be edited soon"""
+
+    if not settings.LIVE_CARDS:
+        return
+
+    now = time.monotonic()
+    for tg_id in tg_ids:
+        _outdated.setdefault(tg_id, now)
+
+
+def is_milestone(frame_plate_number: str) -> bool:
+    """Return whether the last status change of the participant is a finish or an abandon"""
+
+    participant = state.Participant(frame_plate_number)
+    if not participant.last_known_control_id:
+        return False
+    return participant.last_known_checkin_time is None or state.Control(participant.last_known_control_id).finish
+
+
+async def _update_card(bot: Bot, tg_id: str):
+    """Edit or send the card, return the pair of its message ID and content hash, or None if the card did not change"""
+
+    text = format.subscription_status(i18n.for_lang(state.Subscription(tg_id).lang), tg_id)
+    content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    message_id, old_content_hash = state.live_card(tg_id)
+    if content_hash == old_content_hash:
+        return None
+
+    if message_id is not None:
+        try:
+            await bot.edit_message_text(text, chat_id=tg_id, message_id=message_id)
+            return message_id, content_hash
+        except BadRequest as e:
+            if "not modified" in str(e):
+                return message_id, content_hash
+            logging.info(f"Could not edit the live card of user {tg_id}, sending a new one: {e}")
+
+    message = await bot.send_message(chat_id=tg_id, text=text, disable_notification=True)
+    try:
+        await bot.pin_chat_message(chat_id=tg_id, message_id=message.message_id, disable_notification=True)
+    except TelegramError as e:
+        logging.warning(f"Could not pin the live card of user {tg_id}: {e}")
+    return message.message_id, content_hash
+
+
+async def _flush(context: ContextTypes.DEFAULT_TYPE) -> None:
+    now = time.monotonic()
+    due = [tg_id for tg_id, outdated_time in _outdated.items()
+           if now - outdated_time >= _DEBOUNCE_SECONDS and
+           now - _last_edit_times.get(tg_id, -math.inf) >= _MIN_EDIT_INTERVAL_SECONDS]
+    if not due:
+        return
+
+    cards = {}
+    for tg_id in due[:_MAX_EDITS_PER_FLUSH]:
+        del _outdated[tg_id]
+        if not state.has_subscriber(tg_id):
+            continue
+
+        _last_edit_times[tg_id] = now
+        try:
+            card = await _update_card(context.bot, tg_id)
+        except Forbidden:
+            logging.error(f"Got Forbidden when updating the live card of user {tg_id}!  Removing their subscription.")
+            state.remove_subscriber(tg_id)
+            continue
+        except TelegramError as e:
+            if retry.is_transient(e):
+                logging.warning(f"Could not update the live card of user {tg_id}, retrying later: {e}")
+                _outdated.setdefault(tg_id, now)
+            else:
+                logging.error(f"Could not update the live card of user {tg_id}: {e}")
+            continue
+
+        if card is not None:
+            cards[tg_id] = card
+
+    if cards:
+        state.set_live_cards(cards)
+
+    logging.info(f"Updated {len(cards)} live cards, {len(_outdated)} more are outdated")
+
+
+def init(application: Application) -> None:
+    """Start updating live cards, if they are enabled"""
+
+    if not settings.LIVE_CARDS:
+        return
+
+    application.job_queue.run_repeating(_flush, interval=_FLUSH_INTERVAL_SECONDS, first=_FLUSH_INTERVAL_SECONDS)
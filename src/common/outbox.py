@@ -0,0 +1,128 @@
+"""
+Outbox shared between the bot and the sender worker processes
+
+When sender workers are enabled, the bot does not send notifications itself, it puts them into the outbox, which is a
+SQLite database next to the state file.  Each message is assigned to a partition by the ID of the chat it is sent to,
+and each worker only takes messages from its own partition in the order they were added, so messages to the same chat
+are never reordered.  Workers report chats that blocked the bot back to the bot, which owns the state and removes their
+subscriptions.
+"""
+
+import pathlib
+import sqlite3
+
+from . import settings
+
+_OUTBOX_FILENAME = "/var/local/audax-tracker/outbox.sqlite3" if settings.SERVICE_MODE else pathlib.Path(
+    __file__).parent.parent / "outbox.sqlite3"
+
+_connection = None
+
+
+def exists() -> bool:
+    """Return whether the outbox was ever created, e.g., by enabling sender workers"""
+
+    return pathlib.Path(_OUTBOX_FILENAME).exists()
+
+
+def _connect() -> sqlite3.Connection:
+    global _connection
+
+    if _connection is None:
+        _connection = sqlite3.connect(_OUTBOX_FILENAME, timeout=30, isolation_level=None)
+        _connection.execute("PRAGMA journal_mode=WAL")
+        _connection.execute("PRAGMA synchronous=NORMAL")
+        _connection.execute("CREATE TABLE IF NOT EXISTS messages (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                            "partition INTEGER NOT NULL, chat_id TEXT NOT NULL, text TEXT NOT NULL, "
+                            "silent INTEGER NOT NULL DEFAULT 0)")
+        if "silent" not in [column[1] for column in _connection.execute("PRAGMA table_info(messages)")]:
+            _connection.execute("ALTER TABLE messages ADD COLUMN silent INTEGER NOT NULL DEFAULT 0")
+        _connection.execute("CREATE INDEX IF NOT EXISTS messages_partition ON messages (partition, id)")
+        _connection.execute("CREATE TABLE IF NOT EXISTS blocked_chats (chat_id TEXT PRIMARY KEY)")
+
+    return _connection
+
+
+def partition(chat_id: str, partition_count: int) -> int:
+    """Return the partition of the chat"""
+
+    return int(chat_id) % partition_count
+
+
+def enqueue(messages: list) -> None:
+    """Add messages, which are tuples of chat ID, text, and whether to send silently, to the outbox in a single
+    transaction"""
+
+    connection = _connect()
+    with connection:
+        connection.execute("BEGIN")
+        connection.executemany("INSERT INTO messages (partition, chat_id, text, silent) VALUES (?, ?, ?, ?)",
+                               ((partition(chat_id, settings.SENDER_WORKER_COUNT), chat_id, text, silent)
+                                for chat_id, text, silent in messages))
+
+
+def take(partition_index: int, limit: int) -> list:
+    """Return up to `limit` oldest messages of the partition as tuples of message ID, chat ID, text, and whether to
+    send silently
+
+    The messages stay in the outbox until `remove()` is called for them.
+    """
+
+    return _connect().execute("SELECT id, chat_id, text, silent FROM messages WHERE partition = ? ORDER BY id LIMIT ?",
+                              (partition_index, limit)).fetchall()
+
+
+def take_all(limit: int) -> list:
+    """Return up to `limit` oldest messages of all partitions, like `take()`"""
+
+    return _connect().execute("SELECT id, chat_id, text, silent FROM messages ORDER BY id LIMIT ?", (limit,)).fetchall()
+
+
+def repartition(partition_count: int) -> int:
+    """Move pending messages to the partitions of their chats for `partition_count` workers, return how many moved
+
+    Messages enqueued while a different number of workers was configured would otherwise wait for a worker that is not
+    started anymore.  Messages keep their IDs, so messages to the same chat are still sent in order.
+    """
+
+    connection = _connect()
+    with connection:
+        connection.execute("BEGIN IMMEDIATE")
+        moves = [(partition(chat_id, partition_count), chat_id)
+                 for chat_id, old_partition in connection.execute("SELECT DISTINCT chat_id, partition FROM messages")
+                 if partition(chat_id, partition_count) != old_partition]
+        return connection.executemany("UPDATE messages SET partition = ? WHERE chat_id = ?", moves).rowcount
+
+
+def remove(message_id: int) -> None:
+    """Remove a message from the outbox after it was handled"""
+
+    _connect().execute("DELETE FROM messages WHERE id = ?", (message_id,))
+
+
+def pending_count() -> int:
+    """Return the number of messages that were not sent yet"""
+
+    return _connect().execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+
+
+def report_blocked_chat(chat_id: str) -> None:
+    """Tell the bot that sending to the chat is forbidden, and drop all messages waiting to be sent there"""
+
+    connection = _connect()
+    with connection:
+        connection.execute("BEGIN")
+        connection.execute("INSERT OR IGNORE INTO blocked_chats (chat_id) VALUES (?)", (chat_id,))
+        connection.execute("DELETE FROM messages WHERE chat_id = ?", (chat_id,))
+
+
+def take_blocked_chats() -> list:
+    """Return IDs of chats reported as blocked since the last call"""
+
+    connection = _connect()
+    with connection:
+        connection.execute("BEGIN")
+        chat_ids = [row[0] for row in connection.execute("SELECT chat_id FROM blocked_chats")]
+        connection.execute("DELETE FROM blocked_chats")
+
+    return chat_ids
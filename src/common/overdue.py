@@ -0,0 +1,209 @@
+"""
+Warnings about overdue participants
+
+Every participant on the route has a deadline: the closing time of the next control after the one where they checked in
+last.  Deadlines are kept in a heap, so each check only pops the participants whose deadlines passed instead of scanning
+all of them.  A participant who misses a deadline is reported to the administrator, and their followers are warned (or
+the broadcast channel, for participants whose updates are published there), according to the followers' notification
+preferences.  A check-in pushes the new deadline of the participant, and the entry it replaces is skipped when it comes
+out of the heap.
+
+Only controls with closing times provided by the remote endpoint have deadlines.  Participants who never checked in,
+finished, or abandoned are not considered, like in the analytics.  Deadlines that passed before the heap was built,
+e.g., while the bot was not running, are not reported.  No checks are made while fetching updates is stopped or
+paused after failures, as check-ins are not received then either.  Fetching resumes with a cycle that catches up on
+the missed check-ins, so participants who checked in meanwhile are not reported.
+"""
+
+import datetime
+import heapq
+import logging
+import time
+
+from telegram.error import Forbidden
+from telegram.ext import Application, ContextTypes
+
+from . import channel, format, i18n, remote, retry, settings, state
+
+# Interval between checks for passed deadlines
+_CHECK_INTERVAL_SECONDS = 60
+
+# Maximum number of overdue participants listed to the administrator per check, in as many messages as they need
+_MAX_ADMIN_ENTRIES = 50
+
+# Whether the heap reflects the current configuration of the event
+_built = False
+
+# Entries of the heap are tuples of the deadline as epoch seconds, the frame plate number, and the control ID
+_heap = []
+
+# The current deadline of each participant, as a pair of epoch seconds and the control ID
+_deadlines = {}
+
+# The control that follows each control along the route, for controls that follow another one and close
+_next_controls = {}
+
+
+def invalidate() -> None:
+    """Make the heap be rebuilt at the next check, e.g., after the configuration changed"""
+
+    global _built
+
+    _built = False
+
+
+def _deadline(participant: state.Participant):
+    """Return the deadline of the participant as a pair of epoch seconds and the control ID, or None if there is none"""
+
+    if participant.last_known_checkin_time is None or participant.last_known_control_id not in _next_controls:
+        return None
+
+    control_id = _next_controls[participant.last_known_control_id]
+    return state.Control(control_id).close.timestamp(), control_id
+
+
+def _push(participant: state.Participant, now: float) -> None:
+    deadline = _deadline(participant)
+    if deadline is None or deadline[0] <= now:
+        _deadlines.pop(participant.frame_plate_number, None)
+        return
+
+    _deadlines[participant.frame_plate_number] = deadline
+    heapq.heappush(_heap, (deadline[0], participant.frame_plate_number, deadline[1]))
+
+
+def _maybe_build() -> None:
+    global _built, _heap, _next_controls
+
+    if _built:
+        return
+
+    started = time.perf_counter()
+
+    controls = {control_id: state.Control(control_id) for control_id in state.control_ids()}
+    route = sorted(controls, key=lambda c: (controls[c].finish, controls[c].distance))
+    _next_controls = {control_id: next_control_id for control_id, next_control_id in zip(route, route[1:])
+                      if controls[next_control_id].close is not None}
+
+    now = time.time()
+    _deadlines.clear()
+    for participant in state.participants():
+        deadline = _deadline(participant)
+        if deadline is not None and deadline[0] > now:
+            _deadlines[participant.frame_plate_number] = deadline
+    _heap = [(deadline, frame_plate_number, control_id)
+             for frame_plate_number, (deadline, control_id) in _deadlines.items()]
+    heapq.heapify(_heap)
+
+    _built = True
+
+    logging.info(f"Built the heap of {len(_heap)} deadlines in {time.perf_counter() - started:.3f} seconds")
+
+
+def pop_overdue(now: float = None) -> list:
+    """Return participants whose deadlines passed since the last call, as pairs of frame plate number and control ID"""
+
+    global _heap
+
+    _maybe_build()
+
+    if now is None:
+        now = time.time()
+
+    overdue = []
+    while _heap and _heap[0][0] <= now:
+        deadline, frame_plate_number, control_id = heapq.heappop(_heap)
+        if _deadlines.get(frame_plate_number) == (deadline, control_id):
+            del _deadlines[frame_plate_number]
+            overdue.append((frame_plate_number, control_id))
+
+    # Entries replaced by check-ins pile up in the heap, drop them once they outnumber the current ones
+    if len(_heap) > 2 * len(_deadlines) + 1000:
+        _heap = [entry for entry in _heap if _deadlines.get(entry[1]) == (entry[0], entry[2])]
+        heapq.heapify(_heap)
+
+    return overdue
+
+
+def on_participant_status_changed(frame_plate_number: str, control_id: str, checkin_time: str) -> None:
+    if _built:
+        _push(state.Participant(frame_plate_number), time.time())
+
+
+def on_participants_changed(added: dict, removed: list) -> None:
+    invalidate()
+
+
+def _entry(trans, frame_plate_number: str, control_id: str) -> str:
+    control = state.Control(control_id)
+    return trans.gettext("PIECE_OVERDUE {participant} {control_label} {close_time}").format(
+        close_time=format.checkin_day_and_time(trans, control.close.isoformat()),
+        control_label=format.control_label(trans, control), participant=state.Participant(frame_plate_number).label)
+
+
+async def _check(context: ContextTypes.DEFAULT_TYPE) -> None:
+    if not remote.is_fetching() or remote.pause_remaining_seconds() is not None:
+        return
+
+    overdue = pop_overdue()
+    if not overdue:
+        return
+
+    logging.info(f"{len(overdue)} participants did not check in before their next control closed")
+
+    trans = i18n.default()
+    entries = [_entry(trans, frame_plate_number, control_id) for frame_plate_number, control_id in overdue]
+    more_count = len(entries) - _MAX_ADMIN_ENTRIES
+    if more_count > 0:
+        entries = entries[:_MAX_ADMIN_ENTRIES] + [trans.ngettext(
+            "PIECE_ADMIN_OVERDUE_MORE_S {count}", "PIECE_ADMIN_OVERDUE_MORE_P {count}", more_count).format(
+            count=more_count)]
+    for text in format.split_entries(trans.gettext("MESSAGE_ADMIN_OVERDUE {entries}").format, entries):
+        await retry.send_message(context.bot, context.job_queue, settings.DEVELOPER_CHAT_ID, text)
+
+    broadcast = []
+    packages = {}
+
+    # Followers are warned if they want to be notified about the check-in the participant missed
+    def add_followers(frame_plate_number: str, control_id: str) -> None:
+        keys = state.status_change_keys(control_id, state.Control(control_id).close.isoformat())
+        for tg_id in state.notified_followers(frame_plate_number, keys):
+            if tg_id not in packages:
+                packages[tg_id] = []
+            packages[tg_id].append((frame_plate_number, control_id))
+
+    for frame_plate_number, control_id in overdue:
+        if state.is_broadcast_participant(frame_plate_number):
+            broadcast.append((frame_plate_number, control_id))
+        else:
+            add_followers(frame_plate_number, control_id)
+
+    render = trans.gettext("MESSAGE_BROADCAST_OVERDUE {entries}").format
+    for group in format.group_entries(render, [_entry(trans, *item) for item in broadcast]):
+        if not await channel.publish(context.bot, context.job_queue, render(entries="\n".join(group))):
+            # The followers of the participants in this post and the following ones are warned personally instead
+            for item in broadcast:
+                add_followers(*item)
+            break
+        broadcast = broadcast[len(group):]
+
+    hour = datetime.datetime.now(format.event_time_zone()).hour
+    for tg_id, items in packages.items():
+        trans = i18n.for_lang(state.Subscription(tg_id).lang)
+        try:
+            for text in format.split_entries(trans.gettext("MESSAGE_OVERDUE {entries}").format,
+                                             [_entry(trans, *item) for item in items]):
+                await retry.send_message(context.bot, context.job_queue, tg_id, text,
+                                         disable_notification=state.is_quiet(tg_id, hour))
+        except Forbidden:
+            logging.error(f"Got Forbidden when sending a warning to user {tg_id}!  Removing their subscription.")
+            state.remove_subscriber(tg_id)
+
+
+def init(application: Application) -> None:
+    """Start checking for participants who missed closing times of controls"""
+
+    state.add_on_participant_status_changed(on_participant_status_changed)
+    state.add_on_participants_changed(on_participants_changed)
+
+    application.job_queue.run_repeating(_check, interval=_CHECK_INTERVAL_SECONDS, first=_CHECK_INTERVAL_SECONDS)
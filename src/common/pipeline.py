@@ -0,0 +1,89 @@
+"""
+Streaming pipelines of async generator stages
+
+A stage is an async generator that takes the items yielded by the previous stage and yields its own items.  `connect()`
+runs every stage in its own task and passes its items to the next stage through a bounded queue.  A stage may thus work
+on the next item while a later stage waits for I/O, e.g., while messages are being sent, and a stage that gets ahead
+waits for the queue to have room, so the memory taken by items in flight is bounded by the sizes of the queues rather
+than by the number of items.  Stages report the time they spend on their own work to a `StageTimer`.
+"""
+
+import asyncio
+import collections
+import time
+from collections.abc import AsyncIterator, Callable
+
+# Marks the end of the items in a queue
+_END = object()
+
+
+class StageTimer:
+    """Accumulates the time spent and the number of items processed by each stage"""
+
+    def __init__(self):
+        self._seconds = collections.defaultdict(float)
+        self._counts = collections.Counter()
+
+    def add(self, stage: str, started: float, count: int) -> None:
+        """Account the work of the stage started at `started` (by `time.perf_counter()`) on `count` items"""
+
+        self._seconds[stage] += time.perf_counter() - started
+        self._counts[stage] += count
+
+    def summary(self) -> str:
+        return ", ".join(f"{stage} {seconds * 1000:.1f} ms ({self._counts[stage]})"
+                         for stage, seconds in self._seconds.items())
+
+
+class _Failure:
+    """Carries the error that stopped a stage to the next one"""
+
+    def __init__(self, error: Exception):
+        self.error = error
+
+
+async def _buffered(items: AsyncIterator, queue_size: int) -> AsyncIterator:
+    """Yield the items, which are produced by a separate task that gets at most `queue_size` items ahead"""
+
+    queue = asyncio.Queue(queue_size)
+
+    async def produce() -> None:
+        try:
+            async for item in items:
+                await queue.put(item)
+            await queue.put(_END)
+        except Exception as e:
+            await queue.put(_Failure(e))
+        finally:
+            await items.aclose()
+
+    task = asyncio.create_task(produce())
+    try:
+        while (item := await queue.get()) is not _END:
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        task.cancel()
+        await asyncio.wait([task])
+
+
+async def connect(source: AsyncIterator, stages: list[Callable[[AsyncIterator], AsyncIterator]],
+                  queue_size: int) -> AsyncIterator:
+    """Yield the items of the last stage of the pipeline that starts with `source`
+
+    Each stage is a function that takes the items of the previous stage and returns an async generator.  Once the
+    pipeline is closed, e.g., with `contextlib.aclosing()` after the consumer raised, none of the stages runs anymore.
+    """
+
+    buffers = [_buffered(source, queue_size)]
+    for stage in stages:
+        buffers.append(_buffered(stage(buffers[-1]), queue_size))
+
+    try:
+        async for item in buffers[-1]:
+            yield item
+    finally:
+        # A stage does not close the stage before it, so all of them are closed here, from the last one
+        for buffer in reversed(buffers):
+            await buffer.aclose()
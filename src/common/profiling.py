@@ -0,0 +1,180 @@
+"""
+Profiling of the hot paths on demand
+
+The profiler is only created when the administrator requests a capture, so there is no overhead while profiling is off.
+Only one capture may run at a time.  When a capture is complete, its report is sent to the developer as a document.  A
+capture of fetch cycles that cannot complete, because fetching was stopped or did not run in time, ends with a report
+of the cycles profiled so far.
+"""
+
+import cProfile
+import datetime
+import io
+import logging
+import pstats
+
+from telegram import Bot
+from telegram.ext import Application, ContextTypes
+
+from . import i18n, settings
+
+# Profiler of the current capture, or None if nothing is being captured
+_profiler = None
+
+# Number of fetch cycles requested and left to profile in the current capture
+_fetch_cycles_requested = 0
+_fetch_cycles_left = 0
+
+# A capture of fetch cycles is stopped with a partial report if the cycles do not run within this number of fetching
+# intervals per requested cycle, e.g., when fetching is paused after failures
+_FETCH_CYCLE_TIMEOUT_INTERVALS = 2
+
+# Job that stops the current capture of fetch cycles when it times out
+_timeout_job = None
+
+
+def is_profiling() -> bool:
+    """Return whether a capture is running"""
+
+    return _profiler is not None
+
+
+def is_profiling_fetch_cycles() -> bool:
+    """Return whether the next fetch cycle should be profiled"""
+
+    return _fetch_cycles_left > 0
+
+
+def _render_report(profiler: cProfile.Profile) -> str:
+    """Render statistics collected by `profiler` as text, sorted by cumulative time and by internal time"""
+
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(60)
+    stats.sort_stats(pstats.SortKey.TIME).print_stats(30)
+    return stream.getvalue()
+
+
+def _end_capture() -> cProfile.Profile:
+    """Stop the current capture and return its profiler"""
+
+    global _fetch_cycles_left, _profiler, _timeout_job
+
+    profiler = _profiler
+    _profiler = None
+    _fetch_cycles_left = 0
+    if _timeout_job:
+        _timeout_job.schedule_removal()
+        _timeout_job = None
+
+    profiler.disable()
+    return profiler
+
+
+async def _send_report(bot: Bot, profiler: cProfile.Profile, caption: str) -> None:
+    """Send the report of a capture to the developer"""
+
+    timestamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    logging.info(f"Profiling complete, sending the report {timestamp} to the developer")
+
+    try:
+        # Statistics are empty if no fetch cycle ran
+        report = _render_report(profiler)
+    except TypeError:
+        report = ""
+
+    await bot.send_document(chat_id=settings.DEVELOPER_CHAT_ID, caption=caption,
+                            document=io.BytesIO(bytes(report, "utf-8")),
+                            filename=f"audax-tracker-profile-{timestamp}.txt")
+
+
+async def _send_partial_fetch_cycles_report(context: ContextTypes.DEFAULT_TYPE) -> None:
+    profiler, profiled_count = context.job.data
+    await _send_report(context.bot, profiler, i18n.default().gettext(
+        "PROFILING_REPORT_CAPTION_FETCH_CYCLES_PARTIAL {count} {requested}").format(
+        count=profiled_count, requested=_fetch_cycles_requested))
+
+
+def stop_profiling_fetch_cycles(application: Application) -> None:
+    """Stop the current capture of fetch cycles, if any, and send the report of the cycles profiled so far"""
+
+    if not is_profiling_fetch_cycles():
+        return
+
+    profiled_count = _fetch_cycles_requested - _fetch_cycles_left
+    logging.info(f"Stopping profiling after {profiled_count} of {_fetch_cycles_requested} fetch cycles")
+
+    application.job_queue.run_once(_send_partial_fetch_cycles_report, 0, data=(_end_capture(), profiled_count))
+
+
+async def _stop_profiling_fetch_cycles_on_timeout(context: ContextTypes.DEFAULT_TYPE) -> None:
+    global _timeout_job
+
+    _timeout_job = None
+    logging.warning("Fetch cycles to profile did not run in time")
+    stop_profiling_fetch_cycles(context.application)
+
+
+def start_profiling_fetch_cycles(application: Application, count: int) -> None:
+    """Start a capture that covers the next `count` fetch cycles"""
+
+    global _fetch_cycles_left, _fetch_cycles_requested, _profiler, _timeout_job
+
+    if is_profiling():
+        logging.error("Called start_profiling_fetch_cycles() but already profiling!")
+        return
+
+    logging.info(f"Profiling the next {count} fetch cycles")
+
+    _profiler = cProfile.Profile()
+    _fetch_cycles_requested = _fetch_cycles_left = count
+    _timeout_job = application.job_queue.run_once(
+        _stop_profiling_fetch_cycles_on_timeout,
+        _FETCH_CYCLE_TIMEOUT_INTERVALS * count * 60 * settings.FETCHING_INTERVAL_MINUTES)
+
+
+async def profile_fetch_cycle(fetch_cycle, bot: Bot):
+    """Await `fetch_cycle` with the profiler enabled, send the report if that was the last cycle to profile, and return
+    the result of the cycle
+
+    The profiler sees everything that runs in the event loop while the cycle is awaited, including handlers of updates
+    that arrive at the same time.
+    """
+
+    global _fetch_cycles_left
+
+    profiler = _profiler
+    profiler.enable()
+    try:
+        return await fetch_cycle
+    finally:
+        profiler.disable()
+
+        # The capture may have been stopped while the cycle was running
+        if _profiler is profiler:
+            _fetch_cycles_left -= 1
+            if _fetch_cycles_left == 0:
+                await _send_report(bot, _end_capture(), i18n.default().gettext(
+                    "PROFILING_REPORT_CAPTION_FETCH_CYCLES {count}").format(count=_fetch_cycles_requested))
+
+
+async def _stop_profiling_handlers(context: ContextTypes.DEFAULT_TYPE) -> None:
+    await _send_report(context.bot, _end_capture(), i18n.default().gettext(
+        "PROFILING_REPORT_CAPTION_HANDLERS {seconds}").format(seconds=context.job.data))
+
+
+def start_profiling_handlers(application: Application, seconds: int) -> None:
+    """Start a capture that covers everything the bot does during the next `seconds` seconds"""
+
+    global _profiler
+
+    if is_profiling():
+        logging.error("Called start_profiling_handlers() but already profiling!")
+        return
+
+    logging.info(f"Profiling handlers for {seconds} seconds")
+
+    _profiler = cProfile.Profile()
+    _profiler.enable()
+
+    application.job_queue.run_once(_stop_profiling_handlers, seconds, data=seconds)
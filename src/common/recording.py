@@ -0,0 +1,66 @@
+"""
+Recording of the traffic of the bot
+
+When `RECORD_TRAFFIC` is enabled, raw responses of the remote endpoint and incoming Telegram updates are appended to
+a gzip-compressed log next to the state file (`recording.jsonl.gz`), one JSON array per line: the time of the record in
+epoch seconds, the kind of the record, and the data.  The log is fed back to the bot by the replay mode, see
+`replay.py`.  Each run of the bot appends a new gzip member, and a log cut short by a crash is read up to the last
+complete record.
+"""
+
+import gzip
+import json
+import logging
+import pathlib
+import time
+import zlib
+from collections.abc import Iterator
+
+from . import settings
+
+_RECORDING_FILENAME = "/var/local/audax-tracker/recording.jsonl.gz" if settings.SERVICE_MODE else pathlib.Path(
+    __file__).parent.parent / "recording.jsonl.gz"
+
+# Kinds of records: responses to `get-configuration` and `get-tracking-updates`, and Telegram updates
+CONFIGURATION, TRACKING_UPDATES, TELEGRAM_UPDATE = "configuration", "tracking-updates", "telegram-update"
+
+_file = None
+
+
+def record(kind: str, data: dict) -> None:
+    """Append a record to the log, if recording is enabled"""
+
+    global _file
+
+    if not settings.RECORD_TRAFFIC:
+        return
+
+    if _file is None:
+        _file = gzip.open(_RECORDING_FILENAME, "at", encoding="utf8")
+        logging.info(f"Recording the traffic to {_RECORDING_FILENAME}")
+
+    _file.write(json.dumps([time.time(), kind, data], ensure_ascii=False, separators=(",", ":")))
+    _file.write("\n")
+
+
+def close() -> None:
+    """Finish the gzip member, so that the log is complete"""
+
+    global _file
+
+    if _file is not None:
+        _file.close()
+        _file = None
+
+
+def read(filename) -> Iterator:
+    """Yield records of the log as tuples of the time, the kind, and the data"""
+
+    try:
+        with gzip.open(filename, "rt", encoding="utf8") as log_file:
+            for line in log_file:
+                if line.endswith("\n"):
+                    record_time, kind, data = json.loads(line)
+                    yield record_time, kind, data
+    except (EOFError, zlib.error) as e:
+        logging.warning(f"The recording {filename} is cut short, replaying it up to the last complete record: {e}")
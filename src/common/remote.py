@@ -2,32 +2,71 @@
 Calls to the remote endpoint
 """
 
+import contextlib
+import datetime
+import functools
+import itertools
 import logging
+import time
+from collections.abc import AsyncIterator, Iterator
 
-import requests
 from telegram.error import Forbidden
-from telegram.ext import ContextTypes, Application
+from telegram.ext import ContextTypes, Application, JobQueue
 
-from . import format, i18n, settings, state
+from . import analytics, channel, dedup, format, i18n, leaderboard, livecards, outbox, overdue, pipeline, profiling, \
+    recording, retry, settings, state
 
 
 _periodic_fetching_job = None
 
+# Compact encoding of tracking updates that the bot asks the remote endpoint for, see README.md.  Endpoints that do not
+# support it ignore the request and respond with the default encoding.
+_COLUMNAR_ENCODING = "columnar"
+
+# Encoding of the last response, to log when the endpoint switches between encodings
+_encoding = None
+
+# Number of tracking updates that go through the stages of the fetch cycle together, and the number of such chunks that
+# may wait between two stages
+_PIPELINE_CHUNK_SIZE = 500
+_PIPELINE_QUEUE_SIZE = 2
+
+# Circuit breaker of the remote endpoint.  A failed fetch cycle is retried soon, after a backoff delay.  After
+# `FETCH_FAILURES_BEFORE_PAUSE` failures in a row, fetching is paused for a longer backoff delay, then a single cycle is
+# tried again, which either resumes fetching or pauses it for even longer.
+_consecutive_failure_count = 0
+_paused_until = None
+_retry_job = None
+_is_cycle_running = False
+
 
 def is_fetching() -> bool:
     return _periodic_fetching_job is not None
 
 
+def _post(request: dict):
+    """Send `request` to the remote endpoint and return the raw response
+
+    `requests` is imported here rather than at the top of the module because it is only needed once the bot starts
+    talking to the remote endpoint, and importing it delays the start of the bot.
+    """
+
+    import requests
+
+    return requests.post(settings.REMOTE_ENDPOINT_URL, json=request)
+
+
 async def reload_configuration() -> bool:
     try:
         request = {"token": settings.REMOTE_ENDPOINT_AUTH_TOKEN, "method": "get-configuration"}
         logging.info("Sending request: {}".format(request))
-        response_raw = requests.post(settings.REMOTE_ENDPOINT_URL, json=request)
+        response_raw = _post(request)
         if response_raw.status_code != 200:
             logging.info("Got HTTP error response: {c} {r}".format(c=response_raw.status_code, r=response_raw.reason))
             return False
 
         response = response_raw.json()
+        recording.record(recording.CONFIGURATION, response)
         if not response["success"]:
             logging.info("Got API error response: {}".format(response["error_message"]))
             return False
@@ -37,6 +76,9 @@ async def reload_configuration() -> bool:
         state.set_event(response["event"])
         state.set_controls(response["controls"])
         state.set_participants(response["participants"])
+        analytics.invalidate()
+        leaderboard.invalidate()
+        overdue.invalidate()
 
         return True
 
@@ -45,57 +87,427 @@ async def reload_configuration() -> bool:
         return False
 
 
-async def periodic_fetch_data_and_notify_subscribers(context: ContextTypes.DEFAULT_TYPE) -> None:
-    try:
-        request = {"token": settings.REMOTE_ENDPOINT_AUTH_TOKEN, "method": "get-tracking-updates",
-                   "since": state.last_successful_fetch()}
-        response_raw = requests.post(settings.REMOTE_ENDPOINT_URL, json=request)
-        if response_raw.status_code != 200:
-            logging.info("Got HTTP error response: {c} {r}".format(c=response_raw.status_code, r=response_raw.reason))
+def _decode_updates(response: dict) -> Iterator:
+    """Yield tracking updates of the response as tuples of the frame plate number, control ID, and check-in time
+
+    Check-in times are yielded as epoch seconds, or None for an abandon, which the rest of the fetch cycle uses without
+    converting them back and forth.  The default encoding is a list of objects with check-in times in ISO format.  The
+    columnar encoding has a list per field, and check-in times in it are epoch seconds, each one but the first given as
+    the difference from the previous check-in time, or null for an abandon.  Columns are decoded straight into tuples,
+    without building an object per update.
+    """
+
+    global _encoding
+
+    encoding = response.get("encoding", "")
+    if encoding != _encoding:
+        logging.info(f"The remote endpoint sends tracking updates in the {encoding or 'default'} encoding")
+        _encoding = encoding
+
+    if encoding == _COLUMNAR_ENCODING:
+        columns = response["columns"]
+        checkin_time = 0
+        for frame_plate_number, control_id, delta in zip(map(str, columns["frame_plate_numbers"]),
+                                                         map(str, columns["controls"]), columns["checkin_times"],
+                                                         strict=True):
+            if delta is None:
+                yield frame_plate_number, control_id, None
+                continue
+            checkin_time += delta
+            yield frame_plate_number, control_id, checkin_time
+    else:
+        for update in response["updates"]:
+            yield update["frame_plate_number"], str(update["control"]), datetime.datetime.fromisoformat(
+                update["checkin_time"]).timestamp() if update["checkin_time"] is not None else None
+
+
+def _broadcast_posts(participants: list) -> list:
+    """Render the messages with the current status of the participants for the broadcast channel, return pairs of the
+    participants listed in the message and its text"""
+
+    trans = i18n.default()
+
+    logging.info(f"Publishing updates of {len(participants)} participants in the broadcast channel")
+
+    render = trans.gettext("MESSAGE_BROADCAST_CHECKIN_UPDATE {entries}").format
+    posts = []
+    for group in format.group_entries(render, [format.participant_status(trans, p) for p in participants]):
+        posts.append((participants[:len(group)], render(entries="\n".join(group))))
+        participants = participants[len(group):]
+    return posts
+
+
+def _render_messages(packages: dict, published: set) -> list:
+    """Render messages about the participants to their followers, return pairs of the subscriber ID and the text
+
+    `packages` are participants by subscriber ID, followers of the `published` ones are told that their updates are
+    published in the broadcast channel.
+    """
+
+    # Statuses are rendered once per participant and language, however many followers they have.
+    rendered = {}
+    messages = []
+    for tg_id, participants in packages.items():
+        lang = state.Subscription(tg_id).lang
+        trans = i18n.for_lang(lang)
+        checkins = []
+        for participant in participants:
+            key = participant.frame_plate_number, lang
+            if key not in rendered:
+                if participant in published:
+                    rendered[key] = format.moved_to_broadcast_channel(trans, participant)
+                else:
+                    rendered[key] = format.participant_status(trans, participant)
+            checkins.append(rendered[key])
+        messages.extend((tg_id, text) for text in format.split_entries(
+            trans.gettext("MESSAGE_CHECKIN_UPDATE {entries}").format, checkins))
+    return messages
+
+
+async def _decode_stage(response: dict, timer: pipeline.StageTimer) -> AsyncIterator:
+    """Yield chunks of tracking updates from the response"""
+
+    updates = _decode_updates(response)
+    while True:
+        started = time.perf_counter()
+        chunk = list(itertools.islice(updates, _PIPELINE_CHUNK_SIZE))
+        timer.add("decode", started, len(chunk))
+        if not chunk:
             return
+        yield chunk
+
+
+async def _dedupe_stage(chunks: AsyncIterator, timer: pipeline.StageTimer) -> AsyncIterator:
+    """Drop updates that were processed in earlier cycles, and updates of unknown participants"""
+
+    processed_count = 0
+    async for chunk in chunks:
+        started = time.perf_counter()
+        new_updates = []
+        for frame_plate_number, control_id, checkin_time in chunk:
+            if dedup.is_processed(frame_plate_number, control_id, checkin_time):
+                processed_count += 1
+            elif not state.has_participant(frame_plate_number):
+                logging.error(f"Got an update for unknown participant {frame_plate_number}, ignoring it")
+            else:
+                new_updates.append((frame_plate_number, control_id, checkin_time))
+        timer.add("dedupe", started, len(chunk))
+        if new_updates:
+            yield new_updates
+
+    if processed_count:
+        logging.info(f"Dropped {processed_count} updates that were processed already")
+
+
+async def _apply_stage(chunks: AsyncIterator, timer: pipeline.StageTimer) -> AsyncIterator:
+    """Apply updates to the state, yield the united keys of the status changes by frame plate number
+
+    Followers are matched against every status change of the chunk, not only the last one, so that a check-in at a
+    control a subscriber chose is not missed when a later check-in comes in the same cycle.
+    """
+
+    async for chunk in chunks:
+        started = time.perf_counter()
+        changed = {}
+        for frame_plate_number, control_id, checkin_time in chunk:
+            status_changed = state.maybe_set_participant_last_known_status(frame_plate_number, control_id,
+                                                                            checkin_time)
+            # An update applied by an interrupted cycle is in the state already, but its followers may not know it
+            if dedup.mark_applied(frame_plate_number, control_id, checkin_time) or status_changed:
+                keys = state.status_change_keys(control_id, checkin_time)
+                changed[frame_plate_number] = changed[frame_plate_number] | keys if frame_plate_number in changed \
+                    else keys
+        timer.add("apply", started, len(chunk))
+        if changed:
+            yield changed
+
+
+async def _fan_out_stage(chunks: AsyncIterator, timer: pipeline.StageTimer) -> AsyncIterator:
+    """Yield the keys of the status changes of the participants published in the broadcast channel by participant,
+    participants to notify about by subscriber ID, and whether to publish in the broadcast channel
+
+    Followers are collected over the whole cycle, so that each subscriber gets a single message per cycle, however
+    many chunks the updates of the cycle came in.  Then the subscribers are yielded in chunks, with the participants
+    as they are after all updates of the cycle were applied.
+    """
+
+    # Frame plate numbers by subscriber ID, and the keys of the status changes of the participants published in the
+    # broadcast channel by frame plate number, in the order of their first update
+    packages = {}
+    broadcast = {}
+    async for changes in chunks:
+        started = time.perf_counter()
+
+        # Updates of participants with many followers are published in the broadcast channel, their followers are
+        # only notified once that the updates moved there.  Other followers are only notified about the status changes
+        # they want, according to their preferences.
+        for frame_plate_number, keys in changes.items():
+            # The live cards of all followers show the participant, whatever they want to be notified about
+            livecards.mark_outdated(state.followers(frame_plate_number))
+            if state.is_broadcast_participant(frame_plate_number):
+                broadcast[frame_plate_number] = broadcast[frame_plate_number] | keys \
+                    if frame_plate_number in broadcast else keys
+                if state.is_broadcast_announced(frame_plate_number):
+                    continue
+                tg_ids = state.followers(frame_plate_number)
+            else:
+                tg_ids = state.notified_followers(frame_plate_number, keys)
+            for tg_id in tg_ids:
+                if tg_id not in packages:
+                    packages[tg_id] = {}
+                packages[tg_id][frame_plate_number] = None
+
+        timer.add("fan-out", started, len(changes))
+
+    started = time.perf_counter()
+
+    participants = {}
+
+    def participant(frame_plate_number: str) -> state.Participant:
+        if frame_plate_number not in participants:
+            participants[frame_plate_number] = state.Participant(frame_plate_number)
+        return participants[frame_plate_number]
+
+    broadcast = {participant(n): broadcast[n] for n in sorted(broadcast, key=lambda n: int(n))}
+    packages = {tg_id: [participant(n) for n in sorted(package, key=lambda n: int(n))]
+                for tg_id, package in packages.items()}
+
+    # With live cards, the cards of the followers are edited in place later, and only milestones and notices about
+    # the broadcast channel are sent as new messages.
+    if settings.LIVE_CARDS:
+        published = set(broadcast)
+        milestones = {p for p in participants.values()
+                      if p in published or livecards.is_milestone(p.frame_plate_number)}
+        packages = {tg_id: [p for p in package if p in milestones]
+                    for tg_id, package in packages.items() if not milestones.isdisjoint(package)}
+
+    timer.add("fan-out", started, 0)
+
+    # The broadcast channel gets a single post per cycle, with the first chunk
+    items = iter(packages.items())
+    publish = bool(broadcast)
+    while (package_chunk := dict(itertools.islice(items, _PIPELINE_CHUNK_SIZE))) or publish:
+        yield broadcast, package_chunk, publish
+        publish = False
+
+
+async def _render_stage(chunks: AsyncIterator, timer: pipeline.StageTimer) -> AsyncIterator:
+    """Yield the participants published in the broadcast channel, the posts to publish there (see
+    `_broadcast_posts()`), and messages as pairs of the subscriber ID and the text"""
+
+    async for broadcast, packages, publish in chunks:
+        started = time.perf_counter()
+
+        messages = _render_messages(packages, set(broadcast))
+        broadcast, broadcast_posts = (broadcast, _broadcast_posts(list(broadcast))) if publish else ({}, [])
+
+        timer.add("render", started, len(messages))
+        yield broadcast, broadcast_posts, messages
+
+
+def _personal_messages(participants: dict) -> list:
+    """Render messages about the participants to their followers, in place of a post in the broadcast channel
+
+    `participants` are the keys of the status changes by participant.
+    """
+
+    packages = {}
+    for participant, keys in participants.items():
+        for tg_id in state.notified_followers(participant.frame_plate_number, keys):
+            if tg_id not in packages:
+                packages[tg_id] = []
+            packages[tg_id].append(participant)
+
+    logging.info(f"Notifying {len(packages)} followers personally instead of posting in the broadcast channel")
+
+    return _render_messages(packages, set())
+
+
+async def _send(chunks: AsyncIterator, context: ContextTypes.DEFAULT_TYPE, timer: pipeline.StageTimer) -> None:
+    """Send the rendered messages, or pass them to the sender workers"""
+
+    async for broadcast, broadcast_posts, messages in chunks:
+        started = time.perf_counter()
+        hour = datetime.datetime.now(format.event_time_zone()).hour
+
+        # Followers are told once that updates of a participant moved to the broadcast channel, after the participant
+        # was posted there.  Participants of the posts that failed, and of the ones after them, are sent to the
+        # followers personally instead.
+        for position, (participants, text) in enumerate(broadcast_posts):
+            if not await channel.publish(context.bot, context.job_queue, text):
+                failed = [p for participants, _ in broadcast_posts[position:] for p in participants]
+                messages = messages + _personal_messages({p: broadcast[p] for p in failed})
+                break
+            state.set_broadcast_announced([p.frame_plate_number for p in participants])
+
+        if settings.SENDER_WORKER_COUNT:
+            logging.info(f"Passing {len(messages)} messages to the sender workers")
+            outbox.enqueue([(tg_id, text, state.is_quiet(tg_id, hour)) for tg_id, text in messages])
+        else:
+            for tg_id, text in messages:
+                try:
+                    await retry.send_message(context.bot, context.job_queue, tg_id, text,
+                                             disable_notification=state.is_quiet(tg_id, hour))
+                except Forbidden:
+                    logging.error(f"Got Forbidden when sending an update to user {tg_id}!  "
+                                  f"Removing their subscription.")
+                    state.remove_subscriber(tg_id)
 
-        response = response_raw.json()
-        if not response["success"]:
-            logging.info("Got API error response: {}".format(response["error_message"]))
-            return
+        timer.add("send", started, len(messages))
 
-        logging.info(response)
 
-        logging.info("Got data response from the remote endpoint, preparing updates for the subscribers.")
-        packages = {}
-        for update in response["updates"]:
-            for subscription in state.subscriptions():
-                if update["frame_plate_number"] in subscription.numbers:
-                    if subscription.tg_id not in packages:
-                        packages[subscription.tg_id] = []
-                    packages[subscription.tg_id].append(update)
-
-        for tg_id, updates in packages.items():
-            checkins = []
-            trans = i18n.for_lang(state.Subscription(tg_id).lang)
-            for update in sorted(updates, key=lambda u: int(u['frame_plate_number'])):
-                frame_plate_number = update["frame_plate_number"]
-                control_id = str(update["control"])
-                checkin_time = update["checkin_time"]
-                if state.maybe_set_participant_last_known_status(frame_plate_number, control_id, checkin_time):
-                    checkins.append(format.participant_status(trans, state.Participant(frame_plate_number)))
+async def _drain_outbox(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Send messages left in the outbox after sender workers were disabled, before any new ones"""
 
+    for tg_id in outbox.take_blocked_chats():
+        logging.error(f"Sender workers got Forbidden when sending an update to user {tg_id}!  "
+                      f"Removing their subscription.")
+        state.remove_subscriber(tg_id)
+
+    while messages := outbox.take_all(_PIPELINE_CHUNK_SIZE):
+        logging.warning(f"Sending {len(messages)} messages left in the outbox by sender workers")
+        for message_id, tg_id, text, silent in messages:
             try:
-                await context.bot.send_message(chat_id=tg_id,
-                                               text=trans.gettext("MESSAGE_CHECKIN_UPDATE {entries}").format(
-                                                                  entries="\n".join(checkins)))
-            except Forbidden as e:
-                logging.error(f"Got Forbidden when sending an update to user {tg_id}!  Removing their subscription.")
+                await retry.send_message(context.bot, context.job_queue, tg_id, text, disable_notification=bool(silent))
+            except Forbidden:
+                logging.error(f"Got Forbidden when sending an update to user {tg_id}!  "
+                              f"Removing their subscription.")
                 state.remove_subscriber(tg_id)
+            outbox.remove(message_id)
+
+
+async def _fetch_data_and_notify_subscribers(context: ContextTypes.DEFAULT_TYPE) -> bool:
+    """Run a fetch cycle, return whether the remote endpoint responded successfully"""
+
+    if settings.SENDER_WORKER_COUNT:
+        for tg_id in outbox.take_blocked_chats():
+            logging.error(f"Sender workers got Forbidden when sending an update to user {tg_id}!  "
+                          f"Removing their subscription.")
+            state.remove_subscriber(tg_id)
+    elif outbox.exists():
+        await _drain_outbox(context)
+
+    request = {"token": settings.REMOTE_ENDPOINT_AUTH_TOKEN, "method": "get-tracking-updates",
+               "since": state.last_successful_fetch(), "encodings": [_COLUMNAR_ENCODING]}
+    response_raw = _post(request)
+    if response_raw.status_code != 200:
+        logging.info("Got HTTP error response: {c} {r}".format(c=response_raw.status_code, r=response_raw.reason))
+        return False
+
+    response = response_raw.json()
+    recording.record(recording.TRACKING_UPDATES, response)
+    if not response["success"]:
+        logging.info("Got API error response: {}".format(response["error_message"]))
+        return False
+
+    logging.info(response)
+
+    logging.info("Got data response from the remote endpoint, preparing updates for the subscribers.")
+
+    # Updates stream through the stages of the pipeline in chunks, so that the first chunks are fanned out while the
+    # following ones are still being applied, and messages to the first subscribers are sent while the following ones
+    # are still being rendered.  Each follower gets a single message per cycle.
+    dedup.start_cycle()
+    timer = pipeline.StageTimer()
+    stages = [functools.partial(stage, timer=timer)
+              for stage in (_dedupe_stage, _apply_stage, _fan_out_stage, _render_stage)]
+    async with contextlib.aclosing(pipeline.connect(_decode_stage(response, timer), stages,
+                                                    _PIPELINE_QUEUE_SIZE)) as chunks:
+        await _send(chunks, context, timer)
+    logging.info(f"Fetch cycle stages: {timer.summary()}")
+
+    state.set_last_successful_fetch(response["next_since"])
+    dedup.complete_cycle()
+
+    return True
+
+
+def _schedule_retry(job_queue: JobQueue, delay: float) -> None:
+    global _retry_job
+
+    if _retry_job:
+        _retry_job.schedule_removal()
+    _retry_job = job_queue.run_once(periodic_fetch_data_and_notify_subscribers, delay)
 
-        state.set_last_successful_fetch(response["next_since"])
 
-    except Exception:
+async def _on_fetch_cycle_failed(context: ContextTypes.DEFAULT_TYPE, error: Exception) -> None:
+    global _consecutive_failure_count, _paused_until
+
+    _consecutive_failure_count += 1
+    if error:
+        logging.error(f"Fetch cycle failed: {error}", exc_info=error)
+
+    if _consecutive_failure_count < settings.FETCH_FAILURES_BEFORE_PAUSE:
+        delay = retry.backoff(_consecutive_failure_count)
+        logging.warning(f"Fetch cycle failed {_consecutive_failure_count} times in a row, retrying in {delay:.1f} "
+                        f"seconds")
+        _schedule_retry(context.job_queue, delay)
+        return
+
+    delay = max(settings.RETRY_BASE_SECONDS,
+                retry.backoff(_consecutive_failure_count - settings.FETCH_FAILURES_BEFORE_PAUSE + 1))
+    logging.error(f"Fetch cycle failed {_consecutive_failure_count} times in a row, pausing fetching for {delay:.1f} "
+                  f"seconds")
+    _paused_until = time.monotonic() + delay
+    _schedule_retry(context.job_queue, delay)
+
+    if _consecutive_failure_count == settings.FETCH_FAILURES_BEFORE_PAUSE:
+        await context.bot.send_message(chat_id=settings.DEVELOPER_CHAT_ID, text=i18n.default().ngettext(
+            "MESSAGE_ADMIN_FETCHING_PAUSED_AFTER_FAILURES_S {count}",
+            "MESSAGE_ADMIN_FETCHING_PAUSED_AFTER_FAILURES_P {count}", _consecutive_failure_count).format(
+            count=_consecutive_failure_count))
+        if error:
+            # Let the error handler report the details once, rather than after every failed attempt.
+            raise error
+
+
+async def _on_fetch_cycle_succeeded(context: ContextTypes.DEFAULT_TYPE) -> None:
+    global _consecutive_failure_count, _paused_until
+
+    if _consecutive_failure_count >= settings.FETCH_FAILURES_BEFORE_PAUSE:
+        logging.info("Fetch cycle succeeded, resuming fetching")
         await context.bot.send_message(chat_id=settings.DEVELOPER_CHAT_ID,
-                                       text=i18n.default().gettext("MESSAGE_ADMIN_FETCHING_STOPPED_AFTER_FAILURE"))
+                                       text=i18n.default().gettext("MESSAGE_ADMIN_FETCHING_RESUMED"))
+
+    _consecutive_failure_count = 0
+    _paused_until = None
 
-        stop_fetching()
-        raise
+
+def pause_remaining_seconds():
+    """Return in how many seconds fetching resumes if it is paused after failures, otherwise None"""
+
+    return max(0.0, _paused_until - time.monotonic()) if _paused_until is not None else None
+
+
+async def periodic_fetch_data_and_notify_subscribers(context: ContextTypes.DEFAULT_TYPE) -> None:
+    global _is_cycle_running, _retry_job
+
+    if context.job is _retry_job:
+        _retry_job = None
+
+    if _is_cycle_running:
+        logging.info("Previous fetch cycle is still running, skipping this one")
+        return
+    if _paused_until is not None and time.monotonic() < _paused_until:
+        logging.info(f"Fetching is paused after failures for {pause_remaining_seconds():.0f} more seconds")
+        return
+
+    _is_cycle_running = True
+    error = None
+    try:
+        if profiling.is_profiling_fetch_cycles():
+            succeeded = await profiling.profile_fetch_cycle(_fetch_data_and_notify_subscribers(context), context.bot)
+        else:
+            succeeded = await _fetch_data_and_notify_subscribers(context)
+    except Exception as e:
+        succeeded, error = False, e
+    finally:
+        _is_cycle_running = False
+
+    if succeeded:
+        await _on_fetch_cycle_succeeded(context)
+    else:
+        await _on_fetch_cycle_failed(context, error)
 
 
 def start_fetching(application: Application) -> None:
@@ -112,9 +524,28 @@ def start_fetching(application: Application) -> None:
     state.set_is_fetching(True)
 
 
-def stop_fetching() -> None:
+def reschedule_fetching(application: Application) -> None:
+    """Apply a changed `FETCHING_INTERVAL_MINUTES` to the periodic fetching
+
+    A fetch cycle that is running goes on, and a pending retry or pause after failures is kept.
+    """
+
     global _periodic_fetching_job
 
+    if not _periodic_fetching_job:
+        return
+
+    interval = 60 * settings.FETCHING_INTERVAL_MINUTES
+    _periodic_fetching_job.schedule_removal()
+    _periodic_fetching_job = application.job_queue.run_repeating(periodic_fetch_data_and_notify_subscribers,
+                                                                 interval=interval, first=interval)
+
+    logging.info(f"Fetching every {settings.FETCHING_INTERVAL_MINUTES} minutes now")
+
+
+def stop_fetching(application: Application) -> None:
+    global _consecutive_failure_count, _paused_until, _periodic_fetching_job, _retry_job
+
     if not _periodic_fetching_job:
         logging.error("Called stop_fetching() but not fetching!")
         return
@@ -122,4 +553,13 @@ def stop_fetching() -> None:
     _periodic_fetching_job.schedule_removal()
     _periodic_fetching_job = None
 
+    if _retry_job:
+        _retry_job.schedule_removal()
+        _retry_job = None
+    _consecutive_failure_count = 0
+    _paused_until = None
+
+    # Fetch cycles that were requested to be profiled will not run
+    profiling.stop_profiling_fetch_cycles(application)
+
     state.set_is_fetching(False)
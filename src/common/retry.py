@@ -0,0 +1,153 @@
+"""
+Retries of failed sends
+
+Messages that could not be sent because of a transient fault (network errors, time-outs, flood control) are sent again
+later by one-off jobs, after a delay that grows exponentially with the number of attempts, is capped, and is randomised
+("full jitter"), so that many failed messages do not all retry at the same moment.  Messages that keep failing, fail
+permanently (e.g., the message is malformed), or do not fit the bounded retry queue, end up in the bounded dead-letter
+queue, from which the administrator can send them again.  While a message to a chat waits to be retried, later
+messages to that chat wait after it, so that messages to the same chat are never reordered.
+"""
+
+import collections
+import datetime
+import logging
+import random
+
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TelegramError
+from telegram.ext import ContextTypes, JobQueue
+
+from . import settings, state
+
+# Maximum number of messages waiting to be retried, and maximum number of messages in the dead-letter queue
+_MAX_PENDING_RETRIES = 10000
+_MAX_DEAD_LETTERS = 1000
+
+# Messages waiting to be retried, as lists of chat ID, text, whether to send silently, and the number of the next
+# attempt, in deques by chat ID.
+# One job per chat sends them in order, so a message that failed is not overtaken by later messages to the same chat.
+_retry_queues = {}
+_pending_retry_count = 0
+
+# Messages that could not be sent, as tuples of time of the last attempt, chat ID, text, whether to send silently, and
+# the error
+_dead_letters = collections.deque(maxlen=_MAX_DEAD_LETTERS)
+
+
+def backoff(attempt: int) -> float:
+    """Return the delay in seconds before the attempt that follows the `attempt`-th failed one (counting from 1)"""
+
+    return random.uniform(0, min(settings.RETRY_MAX_SECONDS, settings.RETRY_BASE_SECONDS * 2 ** (attempt - 1)))
+
+
+def is_transient(error: Exception) -> bool:
+    """Return whether the error is likely to go away if the request is repeated"""
+
+    return isinstance(error, RetryAfter) or (isinstance(error, NetworkError) and not isinstance(error, BadRequest))
+
+
+def _retry_delay(error: TelegramError, attempt: int) -> float:
+    delay = error.retry_after if isinstance(error, RetryAfter) else backoff(attempt)
+    if isinstance(delay, datetime.timedelta):
+        delay = delay.total_seconds()
+    return delay
+
+
+def _dead_letter(chat_id, text: str, disable_notification: bool, error: str) -> None:
+    logging.error(f"Giving up sending a message to chat {chat_id}: {error}")
+    _dead_letters.append((datetime.datetime.now(datetime.timezone.utc), chat_id, text, disable_notification, error))
+
+
+def dead_letter_count() -> int:
+    return len(_dead_letters)
+
+
+def _queue_retry(job_queue: JobQueue, chat_id, text: str, disable_notification: bool, attempt: int, delay: float,
+                 error: str) -> None:
+    """Queue the message after the messages to the chat that wait to be retried, or retry it after `delay` seconds"""
+
+    global _pending_retry_count
+
+    if _pending_retry_count >= _MAX_PENDING_RETRIES:
+        _dead_letter(chat_id, text, disable_notification, error)
+        return
+
+    _pending_retry_count += 1
+    queue = _retry_queues.get(str(chat_id))
+    if queue is None:
+        _retry_queues[str(chat_id)] = collections.deque([[chat_id, text, disable_notification, attempt]])
+        job_queue.run_once(_retry_send_messages, delay, data=str(chat_id))
+    else:
+        queue.append([chat_id, text, disable_notification, attempt])
+
+
+async def send_message(bot, job_queue: JobQueue, chat_id, text: str, disable_notification: bool = False) -> None:
+    """Send the message, or schedule sending it again if that failed because of a transient fault
+
+    If earlier messages to the chat wait to be retried, the message waits after them instead of being sent now.  Raises
+    Forbidden if the bot is blocked in the chat, so that the caller can clean up.
+    """
+
+    if str(chat_id) in _retry_queues:
+        _queue_retry(job_queue, chat_id, text, disable_notification, 1, 0, "Too many messages waiting to be retried")
+        return
+
+    try:
+        await bot.send_message(chat_id=chat_id, text=text, disable_notification=disable_notification)
+    except Forbidden:
+        raise
+    except TelegramError as e:
+        if not is_transient(e) or settings.SEND_MAX_ATTEMPTS <= 1:
+            _dead_letter(chat_id, text, disable_notification, str(e))
+            return
+
+        delay = _retry_delay(e, 1)
+        logging.warning(f"Could not send a message to chat {chat_id} (attempt 1): {e}, "
+                        f"retrying in {delay:.1f} seconds")
+        _queue_retry(job_queue, chat_id, text, disable_notification, 2, delay, str(e))
+
+
+async def _retry_send_messages(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Send the messages waiting to be retried for the chat in order, until one of them fails again"""
+
+    global _pending_retry_count
+
+    queue = _retry_queues[context.job.data]
+    while queue:
+        chat_id, text, disable_notification, attempt = queue[0]
+        try:
+            await context.bot.send_message(chat_id=chat_id, text=text, disable_notification=disable_notification)
+        except Forbidden:
+            _pending_retry_count -= len(queue)
+            del _retry_queues[context.job.data]
+            if chat_id == settings.BROADCAST_CHANNEL_ID:
+                logging.error("Got Forbidden when posting in the broadcast channel!")
+                return
+            logging.error(f"Got Forbidden when sending a message to user {chat_id}!  Removing their subscription.")
+            state.remove_subscriber(str(chat_id))
+            return
+        except TelegramError as e:
+            if is_transient(e) and attempt < settings.SEND_MAX_ATTEMPTS:
+                delay = _retry_delay(e, attempt)
+                logging.warning(f"Could not send a message to chat {chat_id} (attempt {attempt}): {e}, "
+                                f"retrying in {delay:.1f} seconds")
+                queue[0][3] = attempt + 1
+                context.job_queue.run_once(_retry_send_messages, delay, data=context.job.data)
+                return
+            _dead_letter(chat_id, text, disable_notification, str(e))
+
+        queue.popleft()
+        _pending_retry_count -= 1
+
+    del _retry_queues[context.job.data]
+
+
+def resend_dead_letters(job_queue: JobQueue) -> int:
+    """Schedule sending all messages from the dead-letter queue again, return the number of messages"""
+
+    dead_letters = list(_dead_letters)
+    _dead_letters.clear()
+    for _, chat_id, text, disable_notification, error in dead_letters:
+        _queue_retry(job_queue, chat_id, text, disable_notification, 1, 0, error)
+
+    return len(dead_letters)
@@ -0,0 +1,208 @@
+"""
+Participant search
+
+Participants can be found by frame plate number typed with stray characters (e.g., "#0123"), or by a part of their
+name, possibly with a typo.  Names are normalised (case, diacritics, punctuation) and split into trigrams, and the index
+maps each trigram to the participants whose names contain it.  Every word is padded with spaces at the start, so the
+first trigrams of a word also match its prefixes.  The index is built once, then updated incrementally when the list of
+participants changes, so a query only reads the posting lists of its own trigrams.
+
+Posting lists are ordered by rank (shorter names first), so names that contain all trigrams of the query are found by
+walking the list of the rarest trigram and stopping as soon as there are enough of them.  Only if there are none, names
+that contain most of the trigrams are looked for, which tolerates typos.  Such names must be in at least one of
+the posting lists of the rarest trigrams, so only those lists are scanned.  To keep the latency of such queries low at
+big events, no more than `_MAX_FUZZY_CANDIDATES` names are scored: the lists are taken from the rarest, and the very
+common trigrams that would exceed that, e.g., the first letters of names, are skipped.  The name with the typo is
+nearly always found anyway, because it also has most of the rare trigrams.
+"""
+
+import bisect
+import collections
+import heapq
+import logging
+import math
+import re
+import time
+import unicodedata
+
+from . import state
+
+# Share of the query trigrams that a name must contain to be a candidate
+_MIN_SCORE = 0.6
+
+# Maximum number of names scored for a query with a typo
+_MAX_FUZZY_CANDIDATES = 400
+
+# Shorter queries match too many names to be useful
+_MIN_QUERY_LENGTH = 2
+
+_NON_DIGITS = re.compile(r"\D")
+_NON_WORD_CHARACTERS = re.compile(r"[\W_]+")
+
+_built = False
+
+# Frame plate numbers by trigram, ordered by rank
+_index = collections.defaultdict(list)
+
+# Trigrams of the names, and ranks (shorter names first) by frame plate number
+_name_trigrams = {}
+_ranks = {}
+
+
+def normalise_frame_plate_number(text: str) -> str:
+    """Return the frame plate number typed by the user without stray characters and leading zeroes
+
+    Returns an empty string if there are no digits in `text`.
+    """
+
+    digits = _NON_DIGITS.sub("", text)
+    return digits.lstrip("0") or digits[:1]
+
+
+def _normalise_name(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    letters = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return _NON_WORD_CHARACTERS.sub(" ", letters).strip()
+
+
+def normalise_query(text: str) -> str:
+    """Return the query in the form it is matched in: a frame plate number if there are no letters in it, otherwise
+    a normalised name
+
+    Queries that are typed differently but match the same participants have the same normalised form.
+    """
+
+    if not any(c.isalpha() for c in text):
+        return normalise_frame_plate_number(text)
+    return _normalise_name(text)
+
+
+def _trigrams(normalised_name: str) -> set:
+    """Return trigrams of the words, which are padded with two spaces at the start, so that prefixes of one and two
+    characters are trigrams as well"""
+
+    trigrams = set()
+    for word in normalised_name.split():
+        padded = f"  {word}"
+        trigrams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+
+    return trigrams
+
+
+def _add(frame_plate_number: str, name: str, keep_order: bool = True) -> None:
+    """Add the participant to the index
+
+    Unless `keep_order` is set, the participant is appended to the posting lists, which must be sorted afterwards.
+    """
+
+    normalised_name = _normalise_name(name)
+    trigrams = frozenset(_trigrams(normalised_name))
+
+    _name_trigrams[frame_plate_number] = trigrams
+    _ranks[frame_plate_number] = (len(normalised_name), int(frame_plate_number))
+    for trigram in trigrams:
+        if keep_order:
+            bisect.insort(_index[trigram], frame_plate_number, key=_ranks.__getitem__)
+        else:
+            _index[trigram].append(frame_plate_number)
+
+
+def _remove(frame_plate_number: str) -> None:
+    if frame_plate_number not in _ranks:
+        return
+
+    rank = _ranks[frame_plate_number]
+    for trigram in _name_trigrams.pop(frame_plate_number):
+        posting = _index[trigram]
+        del posting[bisect.bisect_left(posting, rank, key=_ranks.__getitem__)]
+        if not posting:
+            del _index[trigram]
+    del _ranks[frame_plate_number]
+
+
+def _maybe_build() -> None:
+    global _built
+
+    if _built:
+        return
+
+    started = time.perf_counter()
+
+    for participant in state.participants():
+        _add(participant.frame_plate_number, participant.name, keep_order=False)
+    for posting in _index.values():
+        posting.sort(key=_ranks.__getitem__)
+    _built = True
+
+    logging.info(f"Built the search index of {len(_ranks)} participants ({len(_index)} trigrams) "
+                 f"in {time.perf_counter() - started:.3f} seconds")
+
+
+def on_participants_changed(added: dict, removed: list) -> None:
+    """Update the index
+
+    `added` maps frame plate numbers of new or renamed participants to their names, `removed` lists frame plate numbers
+    of participants that are gone.
+    """
+
+    if not _built:
+        # The index will be built from the state when it is used for the first time.
+        return
+
+    for frame_plate_number in removed:
+        _remove(frame_plate_number)
+    for frame_plate_number, name in added.items():
+        _remove(frame_plate_number)
+        _add(frame_plate_number, name)
+
+
+def find(text: str, limit: int) -> list:
+    """Return frame plate numbers of up to `limit` participants that match the query, best matches first
+
+    A query without letters is a frame plate number, and only returns the participant with that number, if there is
+    one.  Otherwise, the query is matched against names.
+    """
+
+    query = normalise_query(text)
+    if query.isdigit():
+        return [query] if state.has_participant(query) else []
+
+    _maybe_build()
+
+    if len(query.replace(" ", "")) < _MIN_QUERY_LENGTH:
+        return []
+    trigrams = _trigrams(query)
+
+    # Rarest trigrams first
+    postings = sorted((_index.get(trigram, []) for trigram in trigrams), key=len)
+
+    exact = []
+    for n in postings[0]:
+        if trigrams <= _name_trigrams[n]:
+            exact.append(n)
+            if len(exact) == limit:
+                break
+    if exact:
+        return exact
+
+    # A name that has at least `min_score` of the trigrams must have one of the `len(trigrams) - min_score + 1` rarest
+    min_score = math.ceil(len(trigrams) * _MIN_SCORE)
+    candidates = set()
+    for posting in postings[:len(trigrams) - min_score + 1]:
+        if len(candidates) + len(posting) > _MAX_FUZZY_CANDIDATES:
+            # The lists that are left are even longer
+            if not candidates:
+                candidates.update(posting[:_MAX_FUZZY_CANDIDATES])
+            break
+        candidates.update(posting)
+    scores = ((len(trigrams & _name_trigrams[n]), n) for n in candidates)
+    fuzzy = heapq.nsmallest(limit, ((score, n) for score, n in scores if score >= min_score),
+                            key=lambda c: (-c[0], _ranks[c[1]]))
+
+    return [n for _, n in fuzzy]
+
+
+def init() -> None:
+    """Start following changes of participants"""
+
+    state.add_on_participants_changed(on_participants_changed)
@@ -2,9 +2,17 @@
 Effective configuration of the bot
 
 Merges the default settings defined in `/common/defaults.py` with the settings defined by the user in `settings.yaml`
+
+The settings may be reloaded while the bot is running, see `reload()`.  Other modules read the settings as attributes of
+this module when they need them, so most changes take effect at once.  Changes of the settings in `RESTART_REQUIRED`
+only take effect after a restart.
 """
 
+import gettext
+import importlib
 import pathlib
+import sys
+import zoneinfo
 
 import yaml
 # noinspection PyUnresolvedReferences
@@ -13,7 +21,21 @@ from common.defaults import *
 _SETTINGS_FILENAME = "/usr/local/etc/audax-tracker/settings.yaml" if SERVICE_MODE else pathlib.Path(
     __file__).parent.parent / "settings.yaml"
 
-_user_settings = yaml.safe_load(open(_SETTINGS_FILENAME))
+_REQUIRED_SETTINGS = ("BOT_TOKEN", "DEVELOPER_CHAT_ID", "REMOTE_ENDPOINT_URL", "REMOTE_ENDPOINT_AUTH_TOKEN")
+
+# Settings that are only used when the bot starts, `reload()` keeps their current values
+RESTART_REQUIRED = ("BOT_TOKEN", "LEADERBOARD_DIRECTORY", "LIVE_CARDS", "PARTICIPANT_DIRECTORY", "RECORD_TRAFFIC",
+                    "SENDER_WORKER_COUNT", "SNAPSHOT_INTERVAL_MINUTES")
+
+
+def _read() -> dict:
+    with open(_SETTINGS_FILENAME) as settings_file:
+        return yaml.safe_load(settings_file)
+
+
+# When the module is re-executed by `reload()`, the settings that it read and validated are used, so that the file is
+# not read again.
+_user_settings = _reloaded_user_settings if "_reloaded_user_settings" in globals() else _read()
 
 BOT_TOKEN = _user_settings["BOT_TOKEN"]
 DEVELOPER_CHAT_ID = _user_settings["DEVELOPER_CHAT_ID"]
@@ -30,10 +52,115 @@ if "TIME_ZONE" in _user_settings:
 if "FETCHING_INTERVAL_MINUTES" in _user_settings:
     FETCHING_INTERVAL_MINUTES = _user_settings["FETCHING_INTERVAL_MINUTES"]
 
+if "RETRY_BASE_SECONDS" in _user_settings:
+    RETRY_BASE_SECONDS = _user_settings["RETRY_BASE_SECONDS"]
+if "RETRY_MAX_SECONDS" in _user_settings:
+    RETRY_MAX_SECONDS = _user_settings["RETRY_MAX_SECONDS"]
+if "SEND_MAX_ATTEMPTS" in _user_settings:
+    SEND_MAX_ATTEMPTS = _user_settings["SEND_MAX_ATTEMPTS"]
+if "FETCH_FAILURES_BEFORE_PAUSE" in _user_settings:
+    FETCH_FAILURES_BEFORE_PAUSE = _user_settings["FETCH_FAILURES_BEFORE_PAUSE"]
+
+if "INLINE_QUERY_CACHE_SECONDS" in _user_settings:
+    INLINE_QUERY_CACHE_SECONDS = _user_settings["INLINE_QUERY_CACHE_SECONDS"]
+
+if "LEADERBOARD_DIRECTORY" in _user_settings:
+    LEADERBOARD_DIRECTORY = _user_settings["LEADERBOARD_DIRECTORY"]
+
+if "PARTICIPANT_DIRECTORY" in _user_settings:
+    PARTICIPANT_DIRECTORY = _user_settings["PARTICIPANT_DIRECTORY"]
+if "SNAPSHOT_INTERVAL_MINUTES" in _user_settings:
+    SNAPSHOT_INTERVAL_MINUTES = _user_settings["SNAPSHOT_INTERVAL_MINUTES"]
+if "SNAPSHOT_RETENTION_COUNT" in _user_settings:
+    SNAPSHOT_RETENTION_COUNT = _user_settings["SNAPSHOT_RETENTION_COUNT"]
+
+if "SENDER_WORKER_COUNT" in _user_settings:
+    SENDER_WORKER_COUNT = _user_settings["SENDER_WORKER_COUNT"]
+
+if "LIVE_CARDS" in _user_settings:
+    LIVE_CARDS = _user_settings["LIVE_CARDS"]
+
+if "BROADCAST_CHANNEL_ID" in _user_settings:
+    BROADCAST_CHANNEL_ID = _user_settings["BROADCAST_CHANNEL_ID"]
+if "BROADCAST_CHANNEL_URL" in _user_settings:
+    BROADCAST_CHANNEL_URL = _user_settings["BROADCAST_CHANNEL_URL"]
+if "BROADCAST_FOLLOWER_THRESHOLD" in _user_settings:
+    BROADCAST_FOLLOWER_THRESHOLD = _user_settings["BROADCAST_FOLLOWER_THRESHOLD"]
+
+if "PROFILING_FETCH_CYCLES" in _user_settings:
+    PROFILING_FETCH_CYCLES = _user_settings["PROFILING_FETCH_CYCLES"]
+if "PROFILING_HANDLER_SECONDS" in _user_settings:
+    PROFILING_HANDLER_SECONDS = _user_settings["PROFILING_HANDLER_SECONDS"]
+
+if "RECORD_TRAFFIC" in _user_settings:
+    RECORD_TRAFFIC = _user_settings["RECORD_TRAFFIC"]
+
 if "MAX_SUBSCRIPTION_COUNT" in _user_settings:
     MAX_SUBSCRIPTION_COUNT = _user_settings["MAX_SUBSCRIPTION_COUNT"]
 
 
+def _validate(user_settings) -> None:
+    """Raise ValueError if the settings read from the file are not valid"""
+
+    if not isinstance(user_settings, dict):
+        raise ValueError("the file must contain a mapping of setting names to values")
+
+    missing = [name for name in _REQUIRED_SETTINGS if name not in user_settings]
+    if missing:
+        raise ValueError(f"required settings are missing: {', '.join(missing)}")
+
+    for name in ("FETCHING_INTERVAL_MINUTES", "MAX_SUBSCRIPTION_COUNT"):
+        value = user_settings.get(name, 1)
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+            raise ValueError(f"{name} must be a positive number")
+
+    supported_languages = user_settings.get("SUPPORTED_LANGUAGES", SUPPORTED_LANGUAGES)
+    locale_directory = pathlib.Path(__file__).parent.parent / "locales"
+    if not supported_languages or not all(
+            isinstance(lang, str) and gettext.find("bot", locale_directory, [lang]) for lang in supported_languages):
+        raise ValueError("SUPPORTED_LANGUAGES must list languages present in the locales directory")
+    if user_settings.get("DEFAULT_LANGUAGE", DEFAULT_LANGUAGE) not in supported_languages:
+        raise ValueError("DEFAULT_LANGUAGE must be one of SUPPORTED_LANGUAGES")
+
+    try:
+        zoneinfo.ZoneInfo(user_settings.get("TIME_ZONE", TIME_ZONE))
+    except (TypeError, ValueError, zoneinfo.ZoneInfoNotFoundError):
+        raise ValueError("TIME_ZONE must be a name of a time zone, e.g., Asia/Novosibirsk")
+
+
+def reload() -> list:
+    """Read `settings.yaml` again and apply it, return names of the settings that changed
+
+    Raises ValueError if the file cannot be read or the settings in it are not valid, the current settings are kept
+    then.
+    """
+
+    global _reloaded_user_settings
+
+    try:
+        user_settings = _read()
+    except (OSError, yaml.YAMLError) as e:
+        raise ValueError(f"cannot read {_SETTINGS_FILENAME}: {e}")
+    _validate(user_settings)
+
+    old_values = {name: value for name, value in globals().items() if name.isupper()}
+
+    # Executing the module again starts from the defaults, so settings removed from the file get their default values.
+    _reloaded_user_settings = user_settings
+    try:
+        importlib.reload(sys.modules[__name__])
+    finally:
+        del _reloaded_user_settings
+
+    changed = sorted(name for name, value in globals().items() if name.isupper() and old_values.get(name) != value)
+
+    # The running bot keeps using these until it is restarted
+    for name in RESTART_REQUIRED:
+        globals()[name] = old_values[name]
+
+    return changed
+
+
 def source_path() -> str:
     """Return path to the file from which the settings were loaded"""
 
@@ -3,35 +3,63 @@ Persistent state
 """
 
 import datetime
+import functools
 import gettext
 import json
 import logging
+import os
 import pathlib
+import pickle
+import time
 from collections.abc import Iterator
 
 from telegram import User
 
-from . import settings
+from . import dedup, directory, history, settings, snapshots
 
 _STATE_FILENAME = "/var/local/audax-tracker/state.json" if settings.SERVICE_MODE else pathlib.Path(
     __file__).parent.parent / "state.json"
 
+# Binary snapshot of the state, saved when the bot stops.  It loads much faster than the JSON file, so it is preferred
+# at startup unless the JSON file was changed after the snapshot was taken.
+_SNAPSHOT_FILENAME = pathlib.Path(_STATE_FILENAME).with_suffix(".pickle")
+
 # Keys used in the state object
-(_CHECKIN_TIME, _CONTROL, _CONTROLS, _EVENT, _FEED_STATUS, _FINISH, _IS_FETCHING, _LANG, _LAST_KNOWN_STATUS,
- _LAST_SUCCESSFUL_FETCH, _NAME, _NUMBERS, _PARTICIPANT_LIST_URL, _PARTICIPANTS, _START, _SUBSCRIPTIONS) = (
-    "checkin_time", "control", "controls", "event", "feed_status", "finish", "is_fetching", "lang", "last_known_status",
-    "last_successful_fetch", "name", "numbers", "participant_list_url", "participants", "start", "subscriptions")
+(_ANNOUNCEMENT, _BOT_STRINGS_HASH, _BROADCAST_PARTICIPANTS, _CHAT_ID, _CHECKIN_COUNT, _CHECKIN_TIME,
+ _CONFIRMED_CHECKIN_COUNT, _CONTENT_HASH, _CONTROL, _CONTROLS, _EVENT, _FAILED_COUNT, _FEED_STATUS, _FINISH,
+ _IS_FETCHING, _LANG, _LAST_KNOWN_STATUS, _LAST_SUCCESSFUL_FETCH, _LIVE_CARD, _MESSAGE_ID, _NAME, _NOTIFY, _NUMBERS,
+ _PARTICIPANT_LIST_URL, _PARTICIPANTS, _POSITION, _PREFERENCES, _QUIET_HOURS, _RECIPIENTS, _START, _SUBSCRIPTIONS,
+ _TEXT) = (
+    "announcement", "bot_strings_hash", "broadcast_participants", "chat_id", "checkin_count", "checkin_time",
+    "confirmed_checkin_count", "content_hash", "control", "controls", "event", "failed_count", "feed_status", "finish",
+    "is_fetching", "lang", "last_known_status", "last_successful_fetch", "live_card", "message_id", "name", "notify",
+    "numbers", "participant_list_url", "participants", "position", "preferences", "quiet_hours", "recipients", "start",
+    "subscriptions", "text")
+
+# Which status changes of the followed participants a subscriber is notified about: all of them, finishes, abandons, or
+# check-ins and abandons at selected controls
+NOTIFY_ALL, NOTIFY_ABANDON, NOTIFY_CONTROLS, NOTIFY_FINISH = "all", "abandon", "controls", "finish"
 
 # If set, called back when participants are removed from the state
 _on_participants_removed = None
 
+# Called back with the frame plate number, the control ID, and the check-in time when the last known status of
+# a participant changes
+_on_participant_status_changed = []
+
+# Called back with the names of new or renamed participants by frame plate number, and the list of frame plate numbers
+# of removed participants, when the list of participants changes
+_on_participants_changed = []
+
 
 class Control:
     """Read-only convenience wrapper that describes a control"""
 
+    _CLOSE = "close"
     _DISTANCE = "distance"
     _FINISH = "finish"
     _NAME = "name"
+    _OPEN = "open"
 
     def __init__(self, control_id: str):
         data = _state[_CONTROLS][control_id]
@@ -41,6 +69,10 @@ class Control:
         self.distance = data[self._DISTANCE]
         self.finish = data[self._FINISH]
 
+        # Opening and closing times are optional, None if the remote endpoint does not provide them
+        self.open = datetime.datetime.fromisoformat(data[self._OPEN]) if self._OPEN in data else None
+        self.close = datetime.datetime.fromisoformat(data[self._CLOSE]) if self._CLOSE in data else None
+
     def name(self, trans: gettext.GNUTranslations):
         return self._name[trans.info()["language"]]
 
@@ -67,7 +99,14 @@ class Participant:
     """Read-only convenience wrapper that describes a participant"""
 
     def __init__(self, frame_plate_number: str, other_data=None):
-        data = other_data if other_data else _state[_PARTICIPANTS][frame_plate_number]
+        if other_data:
+            data = other_data
+        elif _uses_directory():
+            data = directory.get(frame_plate_number)
+            if data is None:
+                raise KeyError(frame_plate_number)
+        else:
+            data = _state[_PARTICIPANTS][frame_plate_number]
 
         self.frame_plate_number = frame_plate_number
         self.name = data[_NAME]
@@ -92,15 +131,86 @@ class Subscription:
         self.lang = data[_LANG] if _LANG in data else settings.DEFAULT_LANGUAGE
         self.numbers = sorted(data[_NUMBERS], key=lambda n: int(n)) if _NUMBERS in data else []
 
+        preferences = data[_PREFERENCES] if _PREFERENCES in data else {}
+
+        self.notify = preferences[_NOTIFY] if _NOTIFY in preferences else NOTIFY_ALL
+        self.controls = preferences[_CONTROLS] if _CONTROLS in preferences else []
+        self.quiet_hours = tuple(preferences[_QUIET_HOURS]) if _QUIET_HOURS in preferences else None
+
+
+class Announcement:
+    """Read-only convenience wrapper that describes the announcement being sent to all subscribers"""
+
+    def __init__(self):
+        data = _state[_ANNOUNCEMENT]
+
+        self.text = data[_TEXT]
+        self.recipients = data[_RECIPIENTS]
+        self.position = data[_POSITION]
+        self.failed_count = data[_FAILED_COUNT]
+        self.progress_chat_id = data[_CHAT_ID]
+        self.progress_message_id = data[_MESSAGE_ID]
+
 
 # State object.  Loaded once from the file, then used in-memory, saved to the file when changed.
 _state = {}
 
+# Index of subscriptions: frame plate number -> set of IDs of subscribers.  Built from the state when needed, dropped
+# when subscriptions change.
+_followers = None
+
+# Index of notification preferences, built and dropped together with `_followers`: frame plate number -> set of IDs of
+# subscribers who are notified about every status change, and frame plate number -> compiled filter -> set of IDs of
+# subscribers who chose what to be notified about.  A compiled filter is the set of status change keys the subscribers
+# are notified about (see `status_change_keys()`).
+_unfiltered_followers = None
+_filtered_followers = None
+
+# Whether the state changed since the last versioned snapshot was saved
+_changed_since_snapshot = True
+
+
+def _replace(filename, content: bytes) -> None:
+    """Write the file through a temporary file renamed over it, so that a crash never leaves it partly written"""
+
+    temporary_filename = pathlib.Path(filename).with_name(f".{pathlib.Path(filename).name}.tmp")
+    with open(temporary_filename, "wb") as temporary_file:
+        temporary_file.write(content)
+        temporary_file.flush()
+        os.fsync(temporary_file.fileno())
+    os.replace(temporary_filename, filename)
+
 
 def _save() -> None:
+    global _changed_since_snapshot
+
     if _state is not None:
-        with open(_STATE_FILENAME, "w", encoding="utf8") as json_file:
-            json.dump(_state, json_file, ensure_ascii=False)
+        _replace(_STATE_FILENAME, json.dumps(_state, ensure_ascii=False).encode("utf-8"))
+        _changed_since_snapshot = True
+
+
+def _snapshot_is_current() -> bool:
+    """Return whether the binary snapshot exists and is not older than the JSON file"""
+
+    try:
+        return os.stat(_SNAPSHOT_FILENAME).st_mtime_ns >= os.stat(_STATE_FILENAME).st_mtime_ns
+    except FileNotFoundError:
+        return False
+
+
+def _load_newest_versioned_snapshot():
+    """Return the state from the newest versioned snapshot that is not damaged, or None if there is none"""
+
+    for version in snapshots.versions():
+        try:
+            loaded_state = json.loads(snapshots.read(version))
+        except (OSError, ValueError) as e:
+            logging.error(f"Could not load the state snapshot {version}, trying an older one: {e}")
+            continue
+        logging.warning(f"Loaded the state from the snapshot {version}")
+        loaded_state[_FEED_STATUS].pop(_CHECKIN_COUNT, None)
+        return loaded_state
+    return None
 
 
 def _maybe_load() -> None:
@@ -109,13 +219,134 @@ def _maybe_load() -> None:
     if _state:
         return
 
+    if _snapshot_is_current():
+        try:
+            with open(_SNAPSHOT_FILENAME, "rb") as snapshot_file:
+                _state = pickle.load(snapshot_file)
+        except Exception as e:
+            logging.error(f"Could not load the state snapshot, falling back to the JSON file: {e}")
+
+    if not _state:
+        _load_json()
+
+    # Whichever way the state was loaded, the setting may have changed since it was saved
+    _maybe_migrate_participants()
+
+
+def _load_json() -> None:
+    global _state
+
     try:
-        with open(_STATE_FILENAME, "r") as json_file:
+        with open(_STATE_FILENAME, "r", encoding="utf8") as json_file:
             _state = json.load(json_file)
+    except (FileNotFoundError, ValueError) as e:
+        if not isinstance(e, FileNotFoundError):
+            logging.error(f"Could not load the state file, falling back to the newest versioned snapshot: {e}")
+        _state = _load_newest_versioned_snapshot()
+        if _state is None:
+            # First run, no problem, creating an empty state.
+            _state = {_PARTICIPANTS: {}, _CONTROLS: {}, _SUBSCRIPTIONS: {},
+                      _FEED_STATUS: {_IS_FETCHING: False, _LAST_SUCCESSFUL_FETCH: None, _CONFIRMED_CHECKIN_COUNT: 0}}
+
+
+def _maybe_migrate_participants() -> None:
+    """Move participants between the state and the participant directory if the setting has changed"""
+
+    if settings.PARTICIPANT_DIRECTORY and _state[_PARTICIPANTS]:
+        logging.info("Moving participants from the state to the participant directory")
+        directory.build(_state[_PARTICIPANTS])
+        _state[_PARTICIPANTS] = {}
+        _save()
+    elif not settings.PARTICIPANT_DIRECTORY and directory.exists():
+        logging.info("Moving participants from the participant directory to the state")
+        _state[_PARTICIPANTS] = dict(directory.items())
+        directory.remove()
+        _save()
+
+
+def save_snapshot() -> None:
+    """Save the binary snapshot of the state that will be loaded at the next start"""
+
+    if not _state:
+        return
+
+    _replace(_SNAPSHOT_FILENAME, pickle.dumps(_state, protocol=pickle.HIGHEST_PROTOCOL))
+
+    logging.info(f"Saved the state snapshot to {_SNAPSHOT_FILENAME}")
+
+
+def _snapshot_content(snapshot_state: dict) -> bytes:
+    """Return the content of a versioned snapshot of the state
+
+    Unlike the state file, a snapshot includes the participants kept in the participant directory and the number of
+    check-ins in the history, so that restoring it rolls them back too.
+    """
+
+    snapshot_state = {**snapshot_state, _FEED_STATUS: {**snapshot_state[_FEED_STATUS], _CHECKIN_COUNT: history.count()}}
+    if directory.exists() and not snapshot_state[_PARTICIPANTS]:
+        snapshot_state[_PARTICIPANTS] = dict(directory.items())
+    return json.dumps(snapshot_state, ensure_ascii=False).encode("utf-8")
+
+
+def save_versioned_snapshot():
+    """Save a versioned snapshot of the state if it changed since the previous one, return its version or None"""
+
+    global _changed_since_snapshot
+
+    if not _state or not _changed_since_snapshot:
+        return None
+
+    started = time.perf_counter()
+    version = snapshots.write(_snapshot_content(_state))
+    _changed_since_snapshot = False
+
+    logging.info(f"Saved the state snapshot {version} in {time.perf_counter() - started:.3f} seconds")
+
+    return version
+
+
+def restore_versioned_snapshot(version: str) -> None:
+    """Replace the state file with the versioned snapshot, for the next start of the bot
+
+    The participant directory and the check-in history are rolled back too: the directory is built again from the
+    participants in the snapshot at the next start, and the check-ins added after the snapshot was taken are dropped.
+    The current state is saved as a new snapshot first, so the restore can be undone, except for the dropped check-ins,
+    which the remote endpoint sends again.  Raises FileNotFoundError if there is no such snapshot, and ValueError if the
+    snapshot is damaged.
+    """
+
+    restored_state = json.loads(snapshots.read(version))
+    checkin_count = restored_state[_FEED_STATUS].pop(_CHECKIN_COUNT, None)
+    if checkin_count is None:
+        # Snapshots taken by older versions of the bot only tell how many check-ins were confirmed
+        checkin_count = restored_state[_FEED_STATUS].get(_CONFIRMED_CHECKIN_COUNT)
+
+    try:
+        with open(_STATE_FILENAME, "rb") as json_file:
+            current_content = json_file.read()
+        try:
+            current_content = _snapshot_content(json.loads(current_content))
+        except ValueError:
+            pass
+        logging.info(f"Saved the current state as the snapshot {snapshots.write(current_content)}")
     except FileNotFoundError:
-        # First run, no problem, creating an empty state.
-        _state = {_PARTICIPANTS: {}, _CONTROLS: {}, _SUBSCRIPTIONS: {},
-                  _FEED_STATUS: {_IS_FETCHING: False, _LAST_SUCCESSFUL_FETCH: None}}
+        pass
+
+    _replace(_STATE_FILENAME, json.dumps(restored_state, ensure_ascii=False).encode("utf-8"))
+    pathlib.Path(_SNAPSHOT_FILENAME).unlink(missing_ok=True)
+
+    if directory.exists():
+        if restored_state[_PARTICIPANTS]:
+            directory.remove()
+        else:
+            logging.warning("The snapshot has no participants, the statuses in the participant directory are kept")
+
+    if checkin_count is None or checkin_count > history.count():
+        logging.warning("The snapshot does not match the check-in history, the history is kept")
+    else:
+        history.truncate(checkin_count)
+
+    logging.info(f"Restored the state from the snapshot {version}")
 
 
 def is_fetching() -> bool:
@@ -141,17 +372,53 @@ def last_successful_fetch() -> str:
 
 
 def set_last_successful_fetch(new_value: str) -> None:
-    """Set the last successful fetch"""
+    """Set the last successful fetch
+
+    The check-ins that are in the history at this moment are confirmed: the remote endpoint does not send them again.
+    """
 
     global _state
 
     _state[_FEED_STATUS][_LAST_SUCCESSFUL_FETCH] = new_value
+    _state[_FEED_STATUS][_CONFIRMED_CHECKIN_COUNT] = history.count()
+    _save()
+
+
+def confirmed_checkin_count():
+    """Return the number of check-ins in the history that were added before the last successful fetch
+
+    Returns None if that is not known, e.g., for a state saved by an older version of the bot.
+    """
+
+    _maybe_load()
+    return _state[_FEED_STATUS].get(_CONFIRMED_CHECKIN_COUNT)
+
+
+def bot_strings_hash() -> str:
+    """Return the hash of the bot commands and descriptions registered last time, or None if it was never stored"""
+
+    _maybe_load()
+    return _state[_BOT_STRINGS_HASH] if _BOT_STRINGS_HASH in _state else None
+
+
+def set_bot_strings_hash(new_value: str) -> None:
+    """Set the hash of the bot commands and descriptions"""
+
+    global _state
+
+    _state[_BOT_STRINGS_HASH] = new_value
     _save()
 
 
 def set_event(new_value: dict) -> None:
     global _state
 
+    if _EVENT in _state and _state[_EVENT].get(_START) != new_value.get(_START):
+        logging.info("The event has changed, the check-in history of the previous one is not needed anymore")
+        history.clear()
+        dedup.clear()
+        _state[_FEED_STATUS][_CONFIRMED_CHECKIN_COUNT] = 0
+
     _state[_EVENT] = new_value
     _save()
 
@@ -165,6 +432,11 @@ def control_count() -> int:
     return len(_state[_CONTROLS])
 
 
+def control_ids() -> list:
+    _maybe_load()
+    return list(_state[_CONTROLS])
+
+
 def set_controls(new_value: list) -> None:
     global _state
 
@@ -176,33 +448,61 @@ def set_controls(new_value: list) -> None:
 # Participant API
 
 
+def _uses_directory() -> bool:
+    """Return whether participants are stored in the participant directory rather than in the state"""
+
+    return settings.PARTICIPANT_DIRECTORY and directory.exists()
+
+
 def participant_count() -> int:
     _maybe_load()
-    return len(_state[_PARTICIPANTS])
+    return directory.count() if _uses_directory() else len(_state[_PARTICIPANTS])
+
+
+def participants() -> Iterator:
+    _maybe_load()
+
+    for frame_plate_number, data in directory.items() if _uses_directory() else _state[_PARTICIPANTS].items():
+        yield Participant(frame_plate_number, data)
 
 
 def has_participant(frame_plate_number: str) -> bool:
+    if _uses_directory():
+        return directory.has(frame_plate_number)
     return frame_plate_number in _state[_PARTICIPANTS]
 
 
 def set_participants(new_value: dict) -> None:
     global _state
 
-    old_participants = _state[_PARTICIPANTS] if _PARTICIPANTS in _state else {}
+    if _uses_directory():
+        old_participants = dict(directory.items())
+    else:
+        old_participants = _state[_PARTICIPANTS] if _PARTICIPANTS in _state else {}
 
     def get_last_known_status(n: str) -> dict:
         if n not in old_participants or _LAST_KNOWN_STATUS not in old_participants[n]:
             return {}
         return old_participants[n][_LAST_KNOWN_STATUS]
 
-    _state[_PARTICIPANTS] = {}
+    new_participants = {}
     for frame_plate_number, name in new_value.items():
-        _state[_PARTICIPANTS][frame_plate_number] = {
+        new_participants[frame_plate_number] = {
             _NAME: name,
             _LAST_KNOWN_STATUS: get_last_known_status(frame_plate_number)
         }
 
-    removed_participants = {k: Participant(k, v) for k, v in old_participants.items() if k not in _state[_PARTICIPANTS]}
+    if settings.PARTICIPANT_DIRECTORY:
+        directory.build(new_participants)
+        _state[_PARTICIPANTS] = {}
+    else:
+        _state[_PARTICIPANTS] = new_participants
+
+    removed_participants = {k: Participant(k, v) for k, v in old_participants.items() if k not in new_participants}
+
+    changed_names = {k: v for k, v in new_value.items() if k not in old_participants or old_participants[k][_NAME] != v}
+    for handler in _on_participants_changed:
+        handler(changed_names, list(removed_participants))
     if not removed_participants:
         logging.info("No participants were removed")
     else:
@@ -226,29 +526,52 @@ def set_participants(new_value: dict) -> None:
     _save()
 
 
-def maybe_set_participant_last_known_status(frame_plate_number: str, control_id: str, checkin_time: str) -> bool:
+@functools.lru_cache(maxsize=1024)
+def _iso_checkin_time(epoch_seconds: float) -> str:
+    # Cached because updates come in the order of check-in times, and many of them share the same minute
+    return datetime.datetime.fromtimestamp(epoch_seconds, datetime.timezone.utc).isoformat()
+
+
+def maybe_set_participant_last_known_status(frame_plate_number: str, control_id: str, checkin_time) -> bool:
     """Set last known status of the participant iff there is no newer status already
 
-    Returns whether the state was changed.
+    `checkin_time` is an ISO timestamp, epoch seconds, or None for an abandon.  The status is stored, and passed to the
+    handlers, with the check-in time in ISO format.  Returns whether the state was changed.
     """
 
     global _state
 
+    history.append(frame_plate_number, control_id, checkin_time)
+
+    # Check-in times are compared as epoch seconds, so that the same moment in different time zones is equal
+    epoch = datetime.datetime.fromisoformat(checkin_time).timestamp() if isinstance(checkin_time, str) else checkin_time
+    if epoch is not None:
+        checkin_time = _iso_checkin_time(epoch)
+
     p = Participant(frame_plate_number)
+    last_known_epoch = datetime.datetime.fromisoformat(p.last_known_checkin_time).timestamp() \
+        if p.last_known_checkin_time else None
+    if p.last_known_control_id == control_id and last_known_epoch == epoch:
+        return False
     if (p.last_known_control_id and p.last_known_control_id != control_id and
-            p.last_known_checkin_time and checkin_time is not None and checkin_time < p.last_known_checkin_time):
+            last_known_epoch is not None and epoch is not None and epoch < last_known_epoch):
         logging.info(f"Ignoring checkin of participant {frame_plate_number} at control {control_id} at {checkin_time} "
                      f"because they have checked in at control {p.last_known_control_id} "
                      f"at {p.last_known_checkin_time} (more recently)")
         return False
 
-    global _state
-    _state[_PARTICIPANTS][frame_plate_number][_LAST_KNOWN_STATUS][_CONTROL] = control_id
-    _state[_PARTICIPANTS][frame_plate_number][_LAST_KNOWN_STATUS][_CHECKIN_TIME] = checkin_time
-
     logging.info(f"New last known checkin time for participant {frame_plate_number} is {checkin_time}")
 
-    _save()
+    if _uses_directory():
+        # The status is written in place in the directory, the state does not change.
+        directory.set_status(frame_plate_number, control_id, checkin_time)
+    else:
+        _state[_PARTICIPANTS][frame_plate_number][_LAST_KNOWN_STATUS][_CONTROL] = control_id
+        _state[_PARTICIPANTS][frame_plate_number][_LAST_KNOWN_STATUS][_CHECKIN_TIME] = checkin_time
+        _save()
+
+    for handler in _on_participant_status_changed:
+        handler(frame_plate_number, control_id, checkin_time)
 
     return True
 
@@ -259,6 +582,14 @@ def set_on_participants_removed(handler) -> None:
     _on_participants_removed = handler
 
 
+def add_on_participant_status_changed(handler) -> None:
+    _on_participant_status_changed.append(handler)
+
+
+def add_on_participants_changed(handler) -> None:
+    _on_participants_changed.append(handler)
+
+
 # ----------------------------------------------------------------------------------------------------------------------
 # Subscription API
 
@@ -270,9 +601,126 @@ def subscriptions() -> Iterator:
         yield Subscription(tg_id)
 
 
-def add_subscription(user: User, frame_plate_number: str) -> None:
+def _compile_filter(data: dict):
+    """Return the compiled filter of the subscription, or None if the subscriber is notified about everything"""
+
+    preferences = data[_PREFERENCES] if _PREFERENCES in data else {}
+    notify = preferences[_NOTIFY] if _NOTIFY in preferences else NOTIFY_ALL
+
+    if notify == NOTIFY_ALL:
+        return None
+
+    if notify == NOTIFY_CONTROLS:
+        return frozenset((_CONTROL, control_id) for control_id in preferences[_CONTROLS])
+    return frozenset((notify,))
+
+
+def status_change_keys(control_id: str, checkin_time: str) -> frozenset:
+    """Return the keys of the status change to the check-in that compiled filters are matched against"""
+
+    keys = {NOTIFY_ALL}
+    if control_id:
+        keys.add((_CONTROL, control_id))
+        if checkin_time is None:
+            keys.add(NOTIFY_ABANDON)
+        elif Control(control_id).finish:
+            keys.add(NOTIFY_FINISH)
+    return frozenset(keys)
+
+
+def _maybe_build_followers() -> None:
+    global _filtered_followers, _followers, _unfiltered_followers
+
+    _maybe_load()
+
+    if _followers is not None:
+        return
+
+    _followers, _unfiltered_followers, _filtered_followers = {}, {}, {}
+    for tg_id, data in _state[_SUBSCRIPTIONS].items():
+        compiled_filter = _compile_filter(data)
+        for frame_plate_number in data[_NUMBERS]:
+            _followers.setdefault(frame_plate_number, set()).add(tg_id)
+            if compiled_filter is None:
+                _unfiltered_followers.setdefault(frame_plate_number, set()).add(tg_id)
+            else:
+                _filtered_followers.setdefault(frame_plate_number, {}).setdefault(compiled_filter, set()).add(tg_id)
+
+
+def followers(frame_plate_number: str) -> set:
+    """Return IDs of users subscribed to the participant"""
+
+    _maybe_build_followers()
+    return _followers[frame_plate_number] if frame_plate_number in _followers else set()
+
+
+def notified_followers(frame_plate_number: str, keys: frozenset = None) -> set:
+    """Return IDs of users subscribed to the participant who want to be notified about the status changes
+
+    `keys` are the united keys of the status changes (see `status_change_keys()`), by default those of the last one.
+    """
+
+    _maybe_build_followers()
+
+    unfiltered = _unfiltered_followers[frame_plate_number] if frame_plate_number in _unfiltered_followers else set()
+    if frame_plate_number not in _filtered_followers:
+        return unfiltered
+
+    if keys is None:
+        participant = Participant(frame_plate_number)
+        keys = status_change_keys(participant.last_known_control_id, participant.last_known_checkin_time)
+    notified = set(unfiltered)
+    for filter_keys, tg_ids in _filtered_followers[frame_plate_number].items():
+        if not filter_keys.isdisjoint(keys):
+            notified.update(tg_ids)
+    return notified
+
+
+def is_quiet(tg_id: str, hour: int) -> bool:
+    """Return whether the user wants messages to arrive silently at the hour in the time zone of the event"""
+
+    _maybe_load()
+
+    data = _state[_SUBSCRIPTIONS][tg_id] if tg_id in _state[_SUBSCRIPTIONS] else {}
+    preferences = data[_PREFERENCES] if _PREFERENCES in data else {}
+    if _QUIET_HOURS not in preferences:
+        return False
+
+    start, end = preferences[_QUIET_HOURS]
+    return start <= hour < end if start <= end else hour >= start or hour < end
+
+
+def is_broadcast_participant(frame_plate_number: str) -> bool:
+    """Return whether updates of the participant are published in the broadcast channel rather than sent to followers
+
+    That is the case for participants who have so many followers that sending each of them a message is too expensive.
+    """
+
+    return (settings.BROADCAST_CHANNEL_ID != 0 and
+            len(followers(frame_plate_number)) >= settings.BROADCAST_FOLLOWER_THRESHOLD)
+
+
+def is_broadcast_announced(frame_plate_number: str) -> bool:
+    """Return whether followers of the participant were told that their updates moved to the broadcast channel"""
+
+    _maybe_load()
+    return _BROADCAST_PARTICIPANTS in _state and frame_plate_number in _state[_BROADCAST_PARTICIPANTS]
+
+
+def set_broadcast_announced(frame_plate_numbers: list) -> None:
+    """Remember that followers of the participants were told that their updates moved to the broadcast channel"""
+
     global _state
 
+    if _BROADCAST_PARTICIPANTS not in _state:
+        _state[_BROADCAST_PARTICIPANTS] = []
+    _state[_BROADCAST_PARTICIPANTS].extend(n for n in frame_plate_numbers if n not in _state[_BROADCAST_PARTICIPANTS])
+    _save()
+
+
+def add_subscription(user: User, frame_plate_number: str) -> None:
+    global _followers, _state
+
     tg_id = str(user.id)
     if tg_id not in _state[_SUBSCRIPTIONS]:
         _state[_SUBSCRIPTIONS][tg_id] = {_LANG: "", _NUMBERS: []}
@@ -286,19 +734,53 @@ def add_subscription(user: User, frame_plate_number: str) -> None:
 
     if frame_plate_number not in _state[_SUBSCRIPTIONS][tg_id][_NUMBERS]:
         _state[_SUBSCRIPTIONS][tg_id][_NUMBERS].append(frame_plate_number)
+        _followers = None
 
     logging.info(f"Subscribed user {tg_id} at participant {frame_plate_number}")
     _save()
 
 
+def import_subscriptions(rows: list) -> int:
+    """Add many subscriptions at once, return the number of added ones
+
+    `rows` are tuples of the user ID, the frame plate number, and the language or None.  Subscriptions to unknown
+    participants, and subscriptions over the maximum number per user, are skipped.  The state is saved once.
+    """
+
+    global _followers, _state
+
+    _maybe_load()
+
+    added_count = 0
+    for tg_id, frame_plate_number, lang in rows:
+        if not has_participant(frame_plate_number):
+            continue
+        if tg_id not in _state[_SUBSCRIPTIONS]:
+            _state[_SUBSCRIPTIONS][tg_id] = {_LANG: settings.DEFAULT_LANGUAGE, _NUMBERS: []}
+        if lang in settings.SUPPORTED_LANGUAGES:
+            _state[_SUBSCRIPTIONS][tg_id][_LANG] = lang
+        numbers = _state[_SUBSCRIPTIONS][tg_id][_NUMBERS]
+        if frame_plate_number in numbers or len(numbers) >= settings.MAX_SUBSCRIPTION_COUNT:
+            continue
+        numbers.append(frame_plate_number)
+        added_count += 1
+
+    _followers = None
+    logging.info(f"Imported {added_count} of {len(rows)} subscriptions")
+    _save()
+
+    return added_count
+
+
 def remove_subscription(tg_id: str, frame_plate_number: str) -> None:
-    global _state
+    global _followers, _state
 
     if tg_id not in _state[_SUBSCRIPTIONS]:
         return
     if frame_plate_number not in _state[_SUBSCRIPTIONS][tg_id][_NUMBERS]:
         return
     _state[_SUBSCRIPTIONS][tg_id][_NUMBERS].remove(frame_plate_number)
+    _followers = None
     logging.info(f"Unsubscribed user {tg_id} from participant {frame_plate_number}")
 
     if not _state[_SUBSCRIPTIONS][tg_id][_NUMBERS]:
@@ -309,11 +791,12 @@ def remove_subscription(tg_id: str, frame_plate_number: str) -> None:
 
 
 def remove_subscriber(tg_id: str) -> None:
-    global _state
+    global _followers, _state
 
     if tg_id not in _state[_SUBSCRIPTIONS]:
         return
     del _state[_SUBSCRIPTIONS][tg_id]
+    _followers = None
     logging.info(f"User {tg_id} is removed with all their subscriptions")
 
     _save()
@@ -327,6 +810,48 @@ def has_subscription(tg_id: str, frame_plate_number: str) -> bool:
     return tg_id in _state[_SUBSCRIPTIONS] and frame_plate_number in _state[_SUBSCRIPTIONS][tg_id][_NUMBERS]
 
 
+def set_subscription_preferences(tg_id: str, notify: str, controls: list, quiet_hours) -> None:
+    """Set which status changes the subscriber is notified about, `quiet_hours` is a pair of hours or None"""
+
+    global _followers, _state
+
+    if tg_id not in _state[_SUBSCRIPTIONS]:
+        return
+
+    preferences = {_NOTIFY: notify}
+    if notify == NOTIFY_CONTROLS:
+        preferences[_CONTROLS] = controls
+    if quiet_hours is not None:
+        preferences[_QUIET_HOURS] = list(quiet_hours)
+    _state[_SUBSCRIPTIONS][tg_id][_PREFERENCES] = preferences
+    _followers = None
+
+    logging.info(f"Set notification preferences of user {tg_id} to {preferences}")
+    _save()
+
+
+def live_card(tg_id: str) -> tuple:
+    """Return the message ID and the content hash of the subscriber's live card, or a pair of None if there is none"""
+
+    if tg_id not in _state[_SUBSCRIPTIONS] or _LIVE_CARD not in _state[_SUBSCRIPTIONS][tg_id]:
+        return None, None
+
+    card = _state[_SUBSCRIPTIONS][tg_id][_LIVE_CARD]
+    return card[_MESSAGE_ID], card[_CONTENT_HASH]
+
+
+def set_live_cards(cards: dict) -> None:
+    """Remember live cards of subscribers, given as pairs of the message ID and the content hash by subscriber ID"""
+
+    global _state
+
+    for tg_id, (message_id, content_hash) in cards.items():
+        if tg_id in _state[_SUBSCRIPTIONS]:
+            _state[_SUBSCRIPTIONS][tg_id][_LIVE_CARD] = {_MESSAGE_ID: message_id, _CONTENT_HASH: content_hash}
+
+    _save()
+
+
 def maybe_update_subscription_language(user: User) -> None:
     """Update language of a user's subscription, if there is one"""
 
@@ -339,3 +864,49 @@ def maybe_update_subscription_language(user: User) -> None:
     _state[_SUBSCRIPTIONS][tg_id][_LANG] = new_lang
 
     _save()
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Announcement API
+
+
+def announcement():
+    """Return the announcement being sent to all subscribers, or None if there is none"""
+
+    _maybe_load()
+    return Announcement() if _ANNOUNCEMENT in _state else None
+
+
+def start_announcement(text: str, progress_chat_id, progress_message_id) -> int:
+    """Start sending the announcement to all current subscribers, return the number of recipients
+
+    `progress_chat_id` and `progress_message_id` identify the message where the progress is shown.
+    """
+
+    global _state
+
+    recipients = sorted(_state[_SUBSCRIPTIONS], key=lambda tg_id: int(tg_id))
+    _state[_ANNOUNCEMENT] = {_TEXT: text, _RECIPIENTS: recipients, _POSITION: 0, _FAILED_COUNT: 0,
+                             _CHAT_ID: progress_chat_id, _MESSAGE_ID: progress_message_id}
+    logging.info(f"Started sending an announcement to {len(recipients)} subscribers")
+    _save()
+
+    return len(recipients)
+
+
+def set_announcement_progress(position: int, failed_count: int) -> None:
+    """Remember how many recipients the announcement was sent to, so that sending resumes from there after a restart"""
+
+    global _state
+
+    _state[_ANNOUNCEMENT][_POSITION] = position
+    _state[_ANNOUNCEMENT][_FAILED_COUNT] = failed_count
+    _save()
+
+
+def finish_announcement() -> None:
+    global _state
+
+    if _ANNOUNCEMENT in _state:
+        del _state[_ANNOUNCEMENT]
+        _save()
@@ -0,0 +1,169 @@
+"""
+Replay of recorded traffic
+
+Feeds a log written by `common/recording.py` back to the bot, to test a new release against the traffic of a past event.
+The bot keeps its state in a temporary directory, so the real state is never touched, and talks to a fake Bot API that
+answers every request without sending anything and counts the requests.  Responses of the remote endpoint are taken
+from the log, each fetch cycle is run as soon as its response is due, and Telegram updates are processed as they
+arrived, at the original pace multiplied by the speed, or as fast as possible.
+
+After every fetch cycle, the replay prints the time it took, the number of messages sent during it, and the memory used
+by the process, and in the end it prints a summary.  Start it with `python bot.py --replay <log> [--speed <speed>]`.
+"""
+
+import asyncio
+import collections
+import json
+import logging
+import resource
+import statistics
+import tempfile
+import time
+
+from telegram import Update
+from telegram.ext import Application, CallbackContext
+from telegram.request import BaseRequest
+
+from common import directory, history, outbox, recording, remote, settings, snapshots, state
+
+
+class _RecordingRequest(BaseRequest):
+    """Answers all requests to the Bot API without touching the network, and counts them by method"""
+
+    def __init__(self):
+        self.counts = collections.Counter()
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None):
+        parameters = request_data.parameters if request_data else {}
+        method_name = url.rsplit("/", 1)[-1]
+        self.counts[method_name] += 1
+
+        if method_name == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "Bot", "username": "audax_tracker_bot"}
+        elif method_name in ("sendMessage", "editMessageText"):
+            result = {"message_id": self.counts[method_name], "date": int(time.time()),
+                      "text": parameters.get("text", ""), "chat": {"id": int(parameters["chat_id"]), "type": "private"}}
+        else:
+            result = True
+        return 200, json.dumps({"ok": True, "result": result}).encode("utf-8")
+
+
+class _RecordedResponse:
+    """Stands for the response of the remote endpoint taken from the log"""
+
+    status_code = 200
+    reason = "OK"
+
+    def __init__(self, data: dict):
+        self._data = data
+
+    def json(self) -> dict:
+        return self._data
+
+
+def _memory_megabytes() -> float:
+    """Return the resident memory of the process, or the peak one where the current one is not known"""
+
+    try:
+        with open("/proc/self/statm") as statm_file:
+            return int(statm_file.read().split()[1]) * resource.getpagesize() / 2 ** 20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2 ** 10
+
+
+def _use_temporary_storage() -> None:
+    """Keep all files of the bot in a temporary directory, and do not record the replayed traffic"""
+
+    storage = tempfile.mkdtemp(prefix="audax-tracker-replay-")
+    state._STATE_FILENAME = f"{storage}/state.json"
+    state._SNAPSHOT_FILENAME = f"{storage}/state.pickle"
+    snapshots._SNAPSHOT_DIRECTORY = f"{storage}/snapshots"
+    history._HISTORY_FILENAME = f"{storage}/history.bin"
+    outbox._OUTBOX_FILENAME = f"{storage}/outbox.sqlite3"
+    directory._DIRECTORY_FILENAME = f"{storage}/directory.bin"
+    if settings.LEADERBOARD_DIRECTORY:
+        settings.LEADERBOARD_DIRECTORY = f"{storage}/leaderboard"
+    settings.RECORD_TRAFFIC = False
+    settings.SENDER_WORKER_COUNT = 0
+
+    state._maybe_load()
+
+    logging.warning(f"Replaying with the state in {storage}")
+
+
+async def _replay(application: Application, request: _RecordingRequest, filename: str, speed: float) -> None:
+    responses = collections.deque()
+    remote._post = lambda r: _RecordedResponse(responses.popleft())
+
+    context = CallbackContext(application)
+    cycle_times = []
+    started = time.perf_counter()
+    first_record_time = None
+
+    print(f"{'replay time':>12} {'cycle':>10} {'sent':>6} {'memory':>10}")
+    for record_time, kind, data in recording.read(filename):
+        if first_record_time is None:
+            first_record_time = record_time
+        if speed:
+            delay = (record_time - first_record_time) / speed - (time.perf_counter() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        if kind == recording.CONFIGURATION:
+            responses.append(data)
+            await remote.reload_configuration()
+        elif kind == recording.TRACKING_UPDATES:
+            responses.append(data)
+            sent_before = request.counts["sendMessage"]
+            cycle_started = time.perf_counter()
+            await remote.periodic_fetch_data_and_notify_subscribers(context)
+            cycle_times.append(time.perf_counter() - cycle_started)
+            print(f"{time.perf_counter() - started:11.1f}s {cycle_times[-1] * 1000:8.1f}ms "
+                  f"{request.counts['sendMessage'] - sent_before:6d} {_memory_megabytes():8.1f}MB")
+        elif kind == recording.TELEGRAM_UPDATE:
+            await application.process_update(Update.de_json(data, application.bot))
+
+    print()
+    print(f"Replayed in {time.perf_counter() - started:.1f} seconds at "
+          f"{f'{speed:g}x' if speed else 'full'} speed")
+    if cycle_times:
+        cycle_times.sort()
+        print(f"Fetch cycles: {len(cycle_times)}, median {statistics.median(cycle_times) * 1000:.1f} ms, "
+              f"95th percentile {cycle_times[len(cycle_times) * 95 // 100] * 1000:.1f} ms, "
+              f"maximum {cycle_times[-1] * 1000:.1f} ms")
+    print("Requests to the Bot API: " + ", ".join(f"{method} {count}"
+                                                  for method, count in request.counts.most_common()))
+    print(f"Peak memory: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2 ** 10:.1f} MB")
+
+
+def run(create_application, filename: str, speed: float) -> None:
+    """Replay the log with the application built by `create_application(builder)`
+
+    `speed` is how many times faster than the original pace the traffic is fed, 0 means as fast as possible.
+    """
+
+    _use_temporary_storage()
+
+    request = _RecordingRequest()
+    application = create_application(Application.builder().request(request).get_updates_request(request))
+
+    async def replay() -> None:
+        async with application:
+            await application.start()
+            try:
+                await _replay(application, request, filename, speed)
+            finally:
+                await application.stop()
+
+    asyncio.run(replay())
@@ -0,0 +1,91 @@
+"""
+Entry point of a sender worker process
+
+When `SENDER_WORKER_COUNT` is greater than zero, the bot puts notifications into the outbox instead of sending them, and
+this many sender workers send them.  Each worker is started with its index (from 0 to `SENDER_WORKER_COUNT` - 1) as the
+only argument, and only sends messages from its own partition of the outbox.
+
+See README.md for details.
+"""
+
+import asyncio
+import logging
+import sys
+
+from telegram.constants import ParseMode
+from telegram.error import Forbidden, RetryAfter, TelegramError
+from telegram.ext import Defaults, ExtBot
+
+from common import outbox, retry, settings
+
+logging.basicConfig(format="[%(asctime)s %(levelname)s %(name)s %(filename)s:%(lineno)d] %(message)s",
+                    level=logging.INFO)
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+# Number of messages taken from the outbox at once, and the delay before checking again when it is empty
+_BATCH_SIZE = 100
+_IDLE_DELAY_SECONDS = 1
+
+
+async def run(partition_index: int, bot) -> None:
+    """Send messages of the partition until cancelled
+
+    A message that failed because of a transient fault stays in the outbox and is retried after a backoff delay, before
+    any newer messages, until it was attempted `SEND_MAX_ATTEMPTS` times.
+    """
+
+    logging.info(f"Sender worker {partition_index} of {settings.SENDER_WORKER_COUNT} started")
+
+    # Number of failed attempts to send the message at the head of the partition, by message ID
+    failed_attempts = {}
+
+    while True:
+        messages = outbox.take(partition_index, _BATCH_SIZE)
+        if not messages:
+            await asyncio.sleep(_IDLE_DELAY_SECONDS)
+            continue
+
+        for message_id, chat_id, text, silent in messages:
+            try:
+                await bot.send_message(chat_id=chat_id, text=text, disable_notification=bool(silent))
+            except Forbidden:
+                logging.error(f"Got Forbidden when sending a message to user {chat_id}!  Reporting to the bot.")
+                outbox.report_blocked_chat(chat_id)
+                continue
+            except RetryAfter as e:
+                # Keep the message in the outbox, so that it is sent after the delay, before any newer messages.
+                logging.warning(f"Flood control exceeded, retrying in {e.retry_after} seconds")
+                await asyncio.sleep(e.retry_after)
+                break
+            except TelegramError as e:
+                attempt = failed_attempts.pop(message_id, 0) + 1
+                if retry.is_transient(e) and attempt < settings.SEND_MAX_ATTEMPTS:
+                    delay = retry.backoff(attempt)
+                    logging.warning(f"Could not send a message to user {chat_id} (attempt {attempt}): {e}, "
+                                    f"retrying in {delay:.1f} seconds")
+                    failed_attempts[message_id] = attempt
+                    await asyncio.sleep(delay)
+                    break
+                logging.error(f"Giving up sending a message to user {chat_id}: {e}")
+
+            failed_attempts.pop(message_id, None)
+            outbox.remove(message_id)
+
+
+async def _main(partition_index: int) -> None:
+    async with ExtBot(token=settings.BOT_TOKEN, defaults=Defaults(parse_mode=ParseMode.HTML)) as bot:
+        await run(partition_index, bot)
+
+
+def main() -> None:
+    """Entry point"""
+
+    if len(sys.argv) != 2 or not sys.argv[1].isdigit() or int(sys.argv[1]) >= settings.SENDER_WORKER_COUNT:
+        print(f"Usage: {sys.argv[0]} <worker index from 0 to SENDER_WORKER_COUNT - 1>")
+        sys.exit(1)
+
+    asyncio.run(_main(int(sys.argv[1])))
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,7 @@ import subprocess
 
 os.chdir(pathlib.Path(__file__).parent)
 
-subprocess.run(['pybabel', 'extract', '--input-dirs=.', '--output-file=locales/bot.pot', '--ignore-dirs=venv', '--no-wrap'])
+subprocess.run(['pybabel', 'extract', '--input-dirs=.', '--output-file=locales/bot.pot', '--ignore-dirs=venv',
+                '--no-wrap', '--keyword=template:2'])
 
 subprocess.run(['pybabel', 'update', '--input-file=locales/bot.pot', '--output-dir=locales', '--domain=bot', '--no-wrap'])
@@ -2,14 +2,21 @@
 Administrator's interface
 """
 
+import html
+import io
 import logging
 
-from common import format, i18n, remote, settings, state
+from common import bulk, format, i18n, profiling, remote, retry, settings, state
+from users import public
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
-from telegram.ext import Application, CallbackQueryHandler, CommandHandler, ContextTypes
+from telegram.ext import Application, CallbackQueryHandler, CommandHandler, ContextTypes, filters, MessageHandler
 
-_COMMAND_ADMIN, _COMMAND_RELOAD_CONFIGURATION, _COMMAND_START_FETCHING, _COMMAND_STOP_FETCHING = (
-    "admin", "admin-reload-configuration", "admin-start-fetching", "admin-stop-fetching")
+(_COMMAND_ADMIN, _COMMAND_ANNOUNCE, _COMMAND_EXPORT_CSV, _COMMAND_EXPORT_JSON, _COMMAND_PROFILE_FETCH_CYCLES,
+ _COMMAND_PROFILE_HANDLERS, _COMMAND_RELOAD_CONFIGURATION, _COMMAND_RELOAD_SETTINGS, _COMMAND_RESEND_DEAD_LETTERS,
+ _COMMAND_START_FETCHING, _COMMAND_STOP_ANNOUNCEMENT, _COMMAND_STOP_FETCHING) = (
+    "admin", "announce", "admin-export-csv", "admin-export-json", "admin-profile-fetch-cycles",
+    "admin-profile-handlers", "admin-reload-configuration", "admin-reload-settings", "admin-resend-dead-letters",
+    "admin-start-fetching", "admin-stop-announcement", "admin-stop-fetching")
 
 
 def _keyboard() -> InlineKeyboardMarkup:
@@ -19,6 +26,8 @@ def _keyboard() -> InlineKeyboardMarkup:
 
     button_reload_configuration = InlineKeyboardButton(trans.gettext("BUTTON_ADMIN_RELOAD_CONFIGURATION"),
                                                        callback_data=_COMMAND_RELOAD_CONFIGURATION)
+    button_reload_settings = InlineKeyboardButton(trans.gettext("BUTTON_ADMIN_RELOAD_SETTINGS"),
+                                                  callback_data=_COMMAND_RELOAD_SETTINGS)
     if remote.is_fetching():
         button_toggle_fetching = InlineKeyboardButton(trans.gettext("BUTTON_ADMIN_STOP_FETCHING"),
                                                       callback_data=_COMMAND_STOP_FETCHING)
@@ -26,7 +35,25 @@ def _keyboard() -> InlineKeyboardMarkup:
         button_toggle_fetching = InlineKeyboardButton(trans.gettext("BUTTON_ADMIN_START_FETCHING"),
                                                       callback_data=_COMMAND_START_FETCHING)
 
-    return InlineKeyboardMarkup(((button_reload_configuration,), (button_toggle_fetching,)), )
+    button_profile_fetch_cycles = InlineKeyboardButton(
+        trans.gettext("BUTTON_ADMIN_PROFILE_FETCH_CYCLES {count}").format(count=settings.PROFILING_FETCH_CYCLES),
+        callback_data=_COMMAND_PROFILE_FETCH_CYCLES)
+    button_profile_handlers = InlineKeyboardButton(
+        trans.gettext("BUTTON_ADMIN_PROFILE_HANDLERS {seconds}").format(seconds=settings.PROFILING_HANDLER_SECONDS),
+        callback_data=_COMMAND_PROFILE_HANDLERS)
+
+    rows = [(button_reload_configuration, button_reload_settings), (button_toggle_fetching,),
+            (button_profile_fetch_cycles, button_profile_handlers)]
+    if retry.dead_letter_count():
+        rows.append((InlineKeyboardButton(trans.gettext("BUTTON_ADMIN_RESEND_DEAD_LETTERS"),
+                                          callback_data=_COMMAND_RESEND_DEAD_LETTERS),))
+    rows.append((InlineKeyboardButton(trans.gettext("BUTTON_ADMIN_EXPORT_CSV"), callback_data=_COMMAND_EXPORT_CSV),
+                 InlineKeyboardButton(trans.gettext("BUTTON_ADMIN_EXPORT_JSON"), callback_data=_COMMAND_EXPORT_JSON)))
+    if bulk.is_announcing():
+        rows.append((InlineKeyboardButton(trans.gettext("BUTTON_ADMIN_STOP_ANNOUNCEMENT"),
+                                          callback_data=_COMMAND_STOP_ANNOUNCEMENT),))
+
+    return InlineKeyboardMarkup(rows)
 
 
 def _general_status(result_message: str = None) -> str:
@@ -51,6 +78,18 @@ def _general_status(result_message: str = None) -> str:
         message.append("<strong>{event_name}</strong>".format(event_name=event.name(trans)))
         message.append(format_stats())
         message.append(format.event_status(trans))
+        if state.control_count():
+            message.append(format.event_analytics(trans))
+
+    pause_remaining_seconds = remote.pause_remaining_seconds()
+    if pause_remaining_seconds is not None:
+        message.append(trans.gettext("PIECE_ADMIN_FETCHING_PAUSED {seconds}").format(
+            seconds=round(pause_remaining_seconds)))
+    if retry.dead_letter_count():
+        message.append(trans.ngettext("PIECE_ADMIN_DEAD_LETTERS_S {count}", "PIECE_ADMIN_DEAD_LETTERS_P {count}",
+                                      retry.dead_letter_count()).format(count=retry.dead_letter_count()))
+
+    message.append(trans.gettext("PIECE_ADMIN_BULK_HINT"))
 
     if result_message:
         message.append("<em>{message}</em>".format(message=result_message))
@@ -70,10 +109,104 @@ async def _handle_command_admin(update: Update, context: ContextTypes.DEFAULT_TY
     await context.bot.send_message(chat_id=user.id, text=_general_status(), reply_markup=_keyboard())
 
 
+async def _handle_command_announce(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Start sending the text that follows the command to all subscribers"""
+
+    user = update.effective_message.from_user
+
+    if user.id != settings.DEVELOPER_CHAT_ID:
+        logging.info("User {username} tried to send an announcement".format(username=user.username))
+        return
+
+    trans = i18n.default()
+    parts = update.effective_message.text_html.split(maxsplit=1)
+
+    if len(parts) < 2:
+        await context.bot.send_message(chat_id=user.id, text=trans.gettext("MESSAGE_ADMIN_ANNOUNCEMENT_EMPTY"))
+        return
+    if bulk.is_announcing():
+        await context.bot.send_message(chat_id=user.id,
+                                       text=trans.gettext("MESSAGE_ADMIN_ANNOUNCEMENT_ALREADY_RUNNING"),
+                                       reply_markup=_keyboard())
+        return
+
+    progress_message = await context.bot.send_message(
+        chat_id=user.id, text=trans.gettext("MESSAGE_ADMIN_ANNOUNCEMENT_PROGRESS {sent} {total} {failed}").format(
+            failed=0, sent=0, total=sum(1 for _ in state.subscriptions())))
+    bulk.start_announcement(context.job_queue, parts[1], user.id, progress_message.message_id)
+
+
+class _AdminChatFilter(filters.MessageFilter):
+    """Passes messages in the chat with the administrator, as it is in the current settings"""
+
+    def filter(self, message) -> bool:
+        return message.chat.id == settings.DEVELOPER_CHAT_ID
+
+
+async def _handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Import subscriptions from the uploaded file"""
+
+    message = update.effective_message
+    user = message.from_user
+
+    trans = i18n.default()
+
+    content = await (await message.document.get_file()).download_as_bytearray()
+    try:
+        rows = bulk.parse_subscriptions(message.document.file_name or "", bytes(content))
+    except ValueError as e:
+        await context.bot.send_message(chat_id=user.id, text=trans.gettext(
+            "MESSAGE_ADMIN_SUBSCRIPTIONS_IMPORT_ERROR {error}").format(error=html.escape(str(e), quote=False)))
+        return
+
+    added_count = state.import_subscriptions(rows)
+    await context.bot.send_message(chat_id=user.id, text=_general_status(trans.gettext(
+        "MESSAGE_ADMIN_SUBSCRIPTIONS_IMPORTED {added} {total}").format(added=added_count, total=len(rows))),
+                                   reply_markup=_keyboard())
+
+
+async def reload_settings(application: Application) -> str:
+    """Reload `settings.yaml` and apply the changes, return the message about the result for the administrator
+
+    Updates that are being handled and a fetch cycle that is running go on with the settings they started with.
+    """
+
+    try:
+        changed = settings.reload()
+    except ValueError as e:
+        logging.error(f"Settings were not reloaded: {e}")
+        return i18n.default().gettext("MESSAGE_ADMIN_SETTINGS_RELOAD_ERROR {error}").format(
+            error=html.escape(str(e), quote=False))
+
+    logging.info(f"Reloaded settings, changed: {', '.join(changed) or 'none'}")
+
+    # Catalogs are read again, so that new translations and supported languages are used
+    i18n.reset()
+    format.reset()
+    trans = i18n.default()
+
+    if "FETCHING_INTERVAL_MINUTES" in changed:
+        remote.reschedule_fetching(application)
+    # Does nothing unless the commands or the description of the bot changed
+    await public.post_init(application)
+
+    if not changed:
+        return trans.gettext("MESSAGE_ADMIN_SETTINGS_UNCHANGED")
+
+    result_message = trans.gettext("MESSAGE_ADMIN_SETTINGS_RELOADED {changed}").format(changed=", ".join(changed))
+    restart_required = [name for name in changed if name in settings.RESTART_REQUIRED]
+    if restart_required:
+        result_message += "\n" + trans.gettext("PIECE_ADMIN_SETTINGS_RESTART_REQUIRED {settings}").format(
+            settings=", ".join(restart_required))
+    return result_message
+
+
 def _is_admin_query(data) -> bool:
     """Return whether `data` is one of administrator's sub-commands triggered by keyboard buttons"""
 
-    return data in (_COMMAND_RELOAD_CONFIGURATION, _COMMAND_START_FETCHING, _COMMAND_STOP_FETCHING)
+    return data in (_COMMAND_EXPORT_CSV, _COMMAND_EXPORT_JSON, _COMMAND_PROFILE_FETCH_CYCLES, _COMMAND_PROFILE_HANDLERS,
+                    _COMMAND_RELOAD_CONFIGURATION, _COMMAND_RELOAD_SETTINGS, _COMMAND_RESEND_DEAD_LETTERS,
+                    _COMMAND_START_FETCHING, _COMMAND_STOP_ANNOUNCEMENT, _COMMAND_STOP_FETCHING)
 
 
 async def _handle_query_admin(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -99,14 +232,45 @@ async def _handle_query_admin(update: Update, context: ContextTypes.DEFAULT_TYPE
         else:
             await query.edit_message_text(trans.gettext("MESSAGE_ADMIN_CONFIGURATION_RELOAD_ERROR"),
                                           reply_markup=_keyboard())
+    elif query.data == _COMMAND_RELOAD_SETTINGS:
+        result_message = await reload_settings(context.application)
+        # The language of the administrator's interface may have changed
+        await query.edit_message_text(_general_status(result_message), reply_markup=_keyboard())
     elif query.data == _COMMAND_START_FETCHING:
         remote.start_fetching(context.application)
         await query.edit_message_text(_general_status(trans.gettext("MESSAGE_ADMIN_FETCHING_STARTED")),
                                       reply_markup=_keyboard())
     elif query.data == _COMMAND_STOP_FETCHING:
-        remote.stop_fetching()
+        remote.stop_fetching(context.application)
         await query.edit_message_text(_general_status(trans.gettext("MESSAGE_ADMIN_FETCHING_STOPPED")),
                                       reply_markup=_keyboard())
+    elif query.data in (_COMMAND_PROFILE_FETCH_CYCLES, _COMMAND_PROFILE_HANDLERS):
+        if profiling.is_profiling():
+            result_message = trans.gettext("MESSAGE_ADMIN_PROFILING_ALREADY_RUNNING")
+        elif query.data == _COMMAND_PROFILE_FETCH_CYCLES and not remote.is_fetching():
+            result_message = trans.gettext("MESSAGE_ADMIN_PROFILING_NOT_FETCHING")
+        else:
+            if query.data == _COMMAND_PROFILE_FETCH_CYCLES:
+                profiling.start_profiling_fetch_cycles(context.application, settings.PROFILING_FETCH_CYCLES)
+            else:
+                profiling.start_profiling_handlers(context.application, settings.PROFILING_HANDLER_SECONDS)
+            result_message = trans.gettext("MESSAGE_ADMIN_PROFILING_STARTED")
+        await query.edit_message_text(_general_status(result_message), reply_markup=_keyboard())
+    elif query.data == _COMMAND_RESEND_DEAD_LETTERS:
+        count = retry.resend_dead_letters(context.job_queue)
+        await query.edit_message_text(_general_status(trans.ngettext(
+            "MESSAGE_ADMIN_DEAD_LETTERS_RESENT_S {count}", "MESSAGE_ADMIN_DEAD_LETTERS_RESENT_P {count}", count).format(
+            count=count)), reply_markup=_keyboard())
+    elif query.data in (_COMMAND_EXPORT_CSV, _COMMAND_EXPORT_JSON):
+        if query.data == _COMMAND_EXPORT_CSV:
+            document, filename = bulk.export_subscriptions_csv(), "subscriptions.csv"
+        else:
+            document, filename = bulk.export_subscriptions_json(), "subscriptions.json"
+        await context.bot.send_document(chat_id=user.id, document=io.BytesIO(document), filename=filename)
+    elif query.data == _COMMAND_STOP_ANNOUNCEMENT:
+        bulk.stop_announcement()
+        await query.edit_message_text(_general_status(trans.gettext("MESSAGE_ADMIN_ANNOUNCEMENT_STOPPED")),
+                                      reply_markup=_keyboard())
     else:
         raise RuntimeError("Unknown sub-command: {c}".format(c=query.data))
 
@@ -115,4 +279,7 @@ def init(application: Application) -> None:
     """Do what is necessary for the administrator's interface at the initial step (before starting the polling)"""
 
     application.add_handler(CommandHandler(_COMMAND_ADMIN, _handle_command_admin))
+    application.add_handler(CommandHandler(_COMMAND_ANNOUNCE, _handle_command_announce))
+    # Documents from other users are left to the handlers of the public interface
+    application.add_handler(MessageHandler(filters.Document.ALL & _AdminChatFilter(), _handle_document))
     application.add_handler(CallbackQueryHandler(_handle_query_admin, pattern=_is_admin_query))
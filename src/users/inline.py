@@ -0,0 +1,129 @@
+"""
+Inline interface (queries like "@bot 1234" or "@bot name" typed in any chat)
+
+Inline queries arrive on every keystroke, so the answers are cached by normalised query and language.  An entry expires
+after `INLINE_QUERY_CACHE_SECONDS`, is dropped as soon as the status of any participant in it changes, and the least
+recently used entries are evicted when the cache is full.  Telegram is asked to cache the answers on its side for the
+same time.
+"""
+
+import collections
+import html
+import logging
+import re
+import time
+
+from telegram import InlineQueryResultArticle, InputTextMessageContent, Update
+from telegram.ext import Application, ContextTypes, InlineQueryHandler
+
+from common import format, i18n, search, settings, state
+
+# Maximum number of participants in an answer
+_MAX_RESULT_COUNT = 10
+
+# Maximum number of cached answers
+_CACHE_SIZE = 10000
+
+_TAG = re.compile(r"<[^>]+>")
+
+# Cached answers by normalised query and language: expiration time, frame plate numbers, and results
+_cache = collections.OrderedDict()
+
+# Keys of cached answers by frame plate numbers of participants in them
+_keys_by_participant = collections.defaultdict(set)
+
+# Numbers of answers taken from the cache and rendered
+_hit_count, _miss_count = 0, 0
+
+
+def _forget(key: tuple) -> None:
+    _, frame_plate_numbers, _ = _cache.pop(key)
+    for frame_plate_number in frame_plate_numbers:
+        keys = _keys_by_participant[frame_plate_number]
+        keys.discard(key)
+        if not keys:
+            del _keys_by_participant[frame_plate_number]
+
+
+def _render(trans, frame_plate_numbers: list) -> list:
+    results = []
+    for frame_plate_number in frame_plate_numbers:
+        participant = state.Participant(frame_plate_number)
+        status = format.participant_status(trans, participant)
+        results.append(InlineQueryResultArticle(id=frame_plate_number, title=participant.label,
+                                                description=html.unescape(_TAG.sub("", status)),
+                                                input_message_content=InputTextMessageContent(status)))
+
+    return results
+
+
+def answer(text: str, trans) -> list:
+    """Return inline query results for the query, from the cache if possible"""
+
+    global _hit_count, _miss_count
+
+    key = (search.normalise_query(text), trans.info()["language"])
+    now = time.monotonic()
+
+    if key in _cache:
+        expiration_time, _, results = _cache[key]
+        if expiration_time > now:
+            _cache.move_to_end(key)
+            _hit_count += 1
+            return results
+        _forget(key)
+
+    _miss_count += 1
+    frame_plate_numbers = search.find(text, _MAX_RESULT_COUNT)
+    results = _render(trans, frame_plate_numbers)
+
+    _cache[key] = (now + settings.INLINE_QUERY_CACHE_SECONDS, frame_plate_numbers, results)
+    for frame_plate_number in frame_plate_numbers:
+        _keys_by_participant[frame_plate_number].add(key)
+    if len(_cache) > _CACHE_SIZE:
+        _forget(next(iter(_cache)))
+
+    return results
+
+
+def cache_stats() -> tuple:
+    """Return the number of cached answers, and the numbers of answers taken from the cache and rendered"""
+
+    return len(_cache), _hit_count, _miss_count
+
+
+def clear_cache() -> None:
+    _cache.clear()
+    _keys_by_participant.clear()
+
+
+def on_participant_status_changed(frame_plate_number: str, control_id: str, checkin_time: str) -> None:
+    """Drop cached answers that show the participant"""
+
+    for key in list(_keys_by_participant.get(frame_plate_number, ())):
+        _forget(key)
+
+
+def on_participants_changed(added: dict, removed: list) -> None:
+    """Drop all cached answers, because participants that are found by the queries changed"""
+
+    logging.info(f"Dropping {len(_cache)} cached inline answers because participants changed")
+    clear_cache()
+
+
+async def handle_inline_query(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Answer with statuses of participants that match the query"""
+
+    query = update.inline_query
+    results = answer(query.query, i18n.trans(query.from_user)) if query.query.strip() else []
+
+    await query.answer(results, cache_time=settings.INLINE_QUERY_CACHE_SECONDS)
+
+
+def init(application: Application) -> None:
+    """Do what is necessary for the inline interface at the initial step (before starting the polling)"""
+
+    application.add_handler(InlineQueryHandler(handle_inline_query))
+
+    state.add_on_participant_status_changed(on_participant_status_changed)
+    state.add_on_participants_changed(on_participants_changed)
@@ -1,18 +1,38 @@
 """
 Public interface (functions available to every user)
 """
-import gettext
+import hashlib
+import json
 import logging
+import re
 
-from telegram import BotCommand, Update
-from telegram.ext import Application, CommandHandler, ContextTypes, ConversationHandler, filters, MessageHandler
+from telegram import BotCommand, InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.ext import Application, CallbackQueryHandler, CommandHandler, ContextTypes, ConversationHandler, \
+    filters, MessageHandler
 
-from common import format, i18n, settings, state
+from common import format, i18n, livecards, search, settings, state
 
 # Commands, sequences, and responses
-COMMAND_ADD, COMMAND_HELP, COMMAND_REMOVE, COMMAND_START, COMMAND_STATUS = "add", "help", "remove", "start", "status"
+COMMAND_ADD, COMMAND_HELP, COMMAND_NOTIFICATIONS, COMMAND_REMOVE, COMMAND_START, COMMAND_STATUS = (
+    "add", "help", "notifications", "remove", "start", "status")
 TYPING_FRAME_PLATE_NUMBER = 1
 
+# Maximum number of participants offered when the user typed a part of the name
+_MAX_CANDIDATE_COUNT = 5
+
+# Data of the buttons that add one of the offered participants
+_QUERY_ADD_PATTERN = re.compile(rf"^{COMMAND_ADD} (\d+)$")
+
+# Data of the buttons that change notification preferences: what to be notified about, a control to toggle, or quiet
+# hours
+_QUERY_NOTIFY_PATTERN = re.compile(rf"^{COMMAND_NOTIFICATIONS} (?:({state.NOTIFY_ALL}|{state.NOTIFY_FINISH}|"
+                                   rf"{state.NOTIFY_ABANDON})|control (\d+)|quiet (off|(\d+)-(\d+)))$")
+
+# Quiet hours offered to the user, as pairs of the first hour and the hour after the last one
+_QUIET_HOURS_CHOICES = ((22, 7), (0, 7))
+
+_SELECTED = "✅ "
+
 
 async def handle_command_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Welcome the user and show them the selection of options"""
@@ -86,44 +106,165 @@ async def handle_command_status(update: Update, context: ContextTypes.DEFAULT_TY
 
     state.maybe_update_subscription_language(user)
 
-    message = []
-    event = state.Event()
-    if event.valid:
-        message.append("<strong>{event_name}</strong>".format(event_name=event.name(trans)))
-        message.append(format.event_status(trans))
-        message.append("")
+    await context.bot.send_message(chat_id=user.id, text=format.subscription_status(trans, tg_id))
+
+
+def _notification_preferences(trans, subscription: state.Subscription) -> str:
+    """Format which status changes the subscriber is notified about"""
+
+    if subscription.notify == state.NOTIFY_FINISH:
+        message = [trans.gettext("MESSAGE_NOTIFICATIONS_FINISH")]
+    elif subscription.notify == state.NOTIFY_ABANDON:
+        message = [trans.gettext("MESSAGE_NOTIFICATIONS_ABANDON")]
+    elif subscription.notify == state.NOTIFY_CONTROLS:
+        message = [trans.gettext("MESSAGE_NOTIFICATIONS_CONTROLS {controls}").format(controls=", ".join(
+            format.control_label(trans, state.Control(control_id)) for control_id in subscription.controls))]
+    else:
+        message = [trans.gettext("MESSAGE_NOTIFICATIONS_ALL")]
+
+    if subscription.quiet_hours:
+        start, end = subscription.quiet_hours
+        message.append(trans.gettext("PIECE_NOTIFICATIONS_QUIET_HOURS {start} {end}").format(start=start, end=end))
+
+    return "\n".join(message)
+
+
+def _notification_keyboard(trans, subscription: state.Subscription) -> InlineKeyboardMarkup:
+    """Create the keyboard that changes notification preferences, the current choices are marked"""
+
+    def button(text: str, data: str, selected: bool) -> InlineKeyboardButton:
+        return InlineKeyboardButton(f"{_SELECTED}{text}" if selected else text,
+                                    callback_data=f"{COMMAND_NOTIFICATIONS} {data}")
+
+    rows = [(button(trans.gettext("BUTTON_NOTIFY_ALL"), state.NOTIFY_ALL, subscription.notify == state.NOTIFY_ALL),
+             button(trans.gettext("BUTTON_NOTIFY_FINISH"), state.NOTIFY_FINISH,
+                    subscription.notify == state.NOTIFY_FINISH),
+             button(trans.gettext("BUTTON_NOTIFY_ABANDON"), state.NOTIFY_ABANDON,
+                    subscription.notify == state.NOTIFY_ABANDON))]
+
+    controls = {control_id: state.Control(control_id) for control_id in state.control_ids()}
+    for control_id in sorted(controls, key=lambda c: (controls[c].finish, controls[c].distance)):
+        rows.append((button(format.control_label(trans, controls[control_id]), f"control {control_id}",
+                            subscription.notify == state.NOTIFY_CONTROLS and control_id in subscription.controls),))
+
+    rows.append(tuple([button(trans.gettext("BUTTON_NOTIFY_NO_QUIET_HOURS"), "quiet off",
+                              subscription.quiet_hours is None)] +
+                      [button(trans.gettext("BUTTON_NOTIFY_QUIET_HOURS {start} {end}").format(start=start, end=end),
+                              f"quiet {start}-{end}", subscription.quiet_hours == (start, end))
+                       for start, end in _QUIET_HOURS_CHOICES]))
+
+    return InlineKeyboardMarkup(rows)
+
+
+async def handle_command_notifications(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Show the user's notification preferences with the buttons that change them"""
+
+    user = update.effective_user
+    trans = i18n.trans(user)
+    tg_id = str(user.id)
+
+    state.maybe_update_subscription_language(user)
 
     if not state.has_subscriber(tg_id):
-        message.append(trans.gettext("MESSAGE_STATUS_SUBSCRIPTION_EMPTY"))
+        await context.bot.send_message(chat_id=user.id, text=trans.gettext("MESSAGE_STATUS_SUBSCRIPTION_EMPTY"))
+        return
+
+    subscription = state.Subscription(tg_id)
+    await context.bot.send_message(chat_id=user.id, text=_notification_preferences(trans, subscription),
+                                   reply_markup=_notification_keyboard(trans, subscription))
+
+
+async def handle_query_notify(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Change the user's notification preferences according to the pressed button"""
+
+    query = update.callback_query
+    await query.answer()
+
+    trans = i18n.trans(query.from_user)
+    tg_id = str(query.from_user.id)
+
+    if not state.has_subscriber(tg_id):
+        await query.edit_message_text(trans.gettext("MESSAGE_STATUS_SUBSCRIPTION_EMPTY"))
+        return
+
+    subscription = state.Subscription(tg_id)
+    notify, controls, quiet_hours = subscription.notify, subscription.controls, subscription.quiet_hours
+
+    kind, control_id, quiet, start, end = _QUERY_NOTIFY_PATTERN.match(query.data).groups()
+    if kind:
+        notify = kind
+    elif control_id:
+        if notify != state.NOTIFY_CONTROLS:
+            controls = []
+        controls = [c for c in controls if c != control_id] if control_id in controls else controls + [control_id]
+        notify = state.NOTIFY_CONTROLS if controls else state.NOTIFY_ALL
     else:
-        message.append(trans.gettext("MESSAGE_STATUS_SUBSCRIPTION_LIST_HEADER"))
-        for frame_plate_number in state.Subscription(tg_id).numbers:
-            message.append(format.participant_status(trans, state.Participant(frame_plate_number)))
+        quiet_hours = None if quiet == "off" else (int(start) % 24, int(end) % 24)
+
+    if (notify, controls, quiet_hours) == (subscription.notify, subscription.controls, subscription.quiet_hours):
+        return
+
+    state.set_subscription_preferences(tg_id, notify, controls, quiet_hours)
+    subscription = state.Subscription(tg_id)
+    await query.edit_message_text(_notification_preferences(trans, subscription),
+                                  reply_markup=_notification_keyboard(trans, subscription))
+
+
+async def _add_subscription(user, frame_plate_number: str, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Add the participant to the user's list and tell the user about that"""
+
+    trans = i18n.trans(user)
+
+    if state.has_subscription(str(user.id), frame_plate_number):
+        await context.bot.send_message(chat_id=user.id, text=trans.gettext("MESSAGE_ALREADY_SUBSCRIBED"))
+        return
+
+    if len(state.Subscription(str(user.id)).numbers) >= settings.MAX_SUBSCRIPTION_COUNT:
+        await context.bot.send_message(chat_id=user.id, text=trans.gettext("MESSAGE_MAX_SUBSCRIPTION_COUNT_REACHED"))
+        return
+
+    state.add_subscription(user, frame_plate_number)
+    livecards.mark_outdated([str(user.id)])
+    participant = state.Participant(frame_plate_number)
+    message = [trans.gettext("MESSAGE_SUBSCRIPTION_ADDED {participant_label}").format(
+        participant_label=participant.label)]
+    if state.is_broadcast_participant(frame_plate_number):
+        message.append(format.moved_to_broadcast_channel(trans, participant))
     await context.bot.send_message(chat_id=user.id, text="\n".join(message))
 
 
 async def received_frame_plate_number(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    """Handle the received frame plate number and end one of conversations where it was requested"""
+    """Handle the received frame plate number and end one of conversations where it was requested
 
-    user = update.effective_user
-    frame_plate_number = update.message.text
+    When adding a participant, a part of the name is accepted as well, and matching participants are offered as
+    buttons.
+    """
 
-    if not state.has_participant(frame_plate_number):
-        await context.bot.send_message(chat_id=user.id, text=i18n.trans(user).gettext("MESSAGE_NO_SUCH_PARTICIPANT"))
-    elif context.user_data["action"] == COMMAND_ADD:
-        if state.has_subscription(str(user.id), frame_plate_number):
-            await context.bot.send_message(chat_id=user.id, text=i18n.trans(user).gettext("MESSAGE_ALREADY_SUBSCRIBED"))
+    user = update.effective_user
+    trans = i18n.trans(user)
+    frame_plate_number = search.normalise_frame_plate_number(update.message.text)
+
+    if context.user_data["action"] == COMMAND_ADD:
+        candidates = search.find(update.message.text, _MAX_CANDIDATE_COUNT)
+        if not candidates:
+            await context.bot.send_message(chat_id=user.id, text=trans.gettext("MESSAGE_NO_SUCH_PARTICIPANT"))
+        elif candidates == [frame_plate_number]:
+            await _add_subscription(user, frame_plate_number, context)
         else:
-            state.add_subscription(user, update.message.text)
-            await context.bot.send_message(chat_id=user.id, text=i18n.trans(user).gettext(
-                "MESSAGE_SUBSCRIPTION_ADDED {participant_label}").format(
-                participant_label=state.Participant(frame_plate_number).label))
+            keyboard = InlineKeyboardMarkup([[InlineKeyboardButton(state.Participant(n).label,
+                                                                   callback_data=f"{COMMAND_ADD} {n}")]
+                                             for n in candidates])
+            await context.bot.send_message(chat_id=user.id, text=trans.gettext("MESSAGE_CHOOSE_PARTICIPANT"),
+                                           reply_markup=keyboard)
     elif context.user_data["action"] == COMMAND_REMOVE:
-        if not state.has_subscription(str(user.id), frame_plate_number):
-            await context.bot.send_message(chat_id=user.id, text=i18n.trans(user).gettext("MESSAGE_NOT_SUBSCRIBED"))
+        if not state.has_participant(frame_plate_number):
+            await context.bot.send_message(chat_id=user.id, text=trans.gettext("MESSAGE_NO_SUCH_PARTICIPANT"))
+        elif not state.has_subscription(str(user.id), frame_plate_number):
+            await context.bot.send_message(chat_id=user.id, text=trans.gettext("MESSAGE_NOT_SUBSCRIBED"))
         else:
-            state.remove_subscription(str(user.id), update.message.text)
-            await context.bot.send_message(chat_id=user.id, text=i18n.trans(user).gettext(
+            state.remove_subscription(str(user.id), frame_plate_number)
+            livecards.mark_outdated([str(user.id)])
+            await context.bot.send_message(chat_id=user.id, text=trans.gettext(
                 "MESSAGE_SUBSCRIPTION_REMOVED {participant_label}").format(
                 participant_label=state.Participant(frame_plate_number).label))
     else:
@@ -133,6 +274,21 @@ async def received_frame_plate_number(update: Update, context: ContextTypes.DEFA
     return ConversationHandler.END
 
 
+async def handle_query_add(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Add the participant that the user chose among the offered ones"""
+
+    query = update.callback_query
+    await query.answer()
+
+    frame_plate_number = _QUERY_ADD_PATTERN.match(query.data).group(1)
+    if not state.has_participant(frame_plate_number):
+        await context.bot.send_message(chat_id=query.from_user.id,
+                                       text=i18n.trans(query.from_user).gettext("MESSAGE_NO_SUCH_PARTICIPANT"))
+        return
+
+    await _add_subscription(query.from_user, frame_plate_number, context)
+
+
 async def abort_conversation(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Clean up the intermediate state of the conversation if it went off the rails"""
 
@@ -175,30 +331,51 @@ def init(application: Application) -> None:
                                                                    received_frame_plate_number)]},
                                                 fallbacks=[MessageHandler(filters.ALL, abort_conversation)]))
     application.add_handler(CommandHandler(COMMAND_STATUS, handle_command_status))
+    application.add_handler(CommandHandler(COMMAND_NOTIFICATIONS, handle_command_notifications))
+    application.add_handler(CallbackQueryHandler(handle_query_add, pattern=_QUERY_ADD_PATTERN))
+    application.add_handler(CallbackQueryHandler(handle_query_notify, pattern=_QUERY_NOTIFY_PATTERN))
     application.add_handler(MessageHandler(filters.TEXT, handle_unrecognised_input))
 
     state.set_on_participants_removed(on_participants_removed)
 
 
 async def post_init(application: Application) -> None:
-    """Do what is necessary for the subscriber's interface at the post-initial step (after starting the polling)"""
+    """Do what is necessary for the subscriber's interface at the post-initial step (after starting the polling)
 
-    async def set_bot_strings(translator: gettext.GNUTranslations, language_code: str):
-        bot = application.bot
+    Registering the commands and the description of the bot takes two requests per language, so that is skipped if the
+    strings did not change since the last time they were registered.
+    """
 
-        await bot.set_my_commands(
-            [BotCommand(command=COMMAND_ADD, description=translator.gettext("COMMAND_DESCRIPTION_ADD")),
-             BotCommand(command=COMMAND_REMOVE, description=translator.gettext("COMMAND_DESCRIPTION_REMOVE")),
-             BotCommand(command=COMMAND_STATUS, description=translator.gettext("COMMAND_DESCRIPTION_STATUS")),
-             BotCommand(command=COMMAND_HELP, description=translator.gettext("COMMAND_DESCRIPTION_HELP"))],
-            language_code=language_code)
-        # TODO: Find a way to have instance-specific strings in configs?
-        # await bot.set_my_name(trans.gettext("BOT_NAME"), language_code=language_code)
-        await bot.set_my_description(trans.gettext("BOT_DESCRIPTION"), language_code=language_code)
+    bot = application.bot
 
+    bot_strings = []
     for lang in settings.SUPPORTED_LANGUAGES:
         trans = i18n.for_lang(lang)
-        await set_bot_strings(trans, lang)
+        commands = [BotCommand(command=COMMAND_ADD, description=trans.gettext("COMMAND_DESCRIPTION_ADD")),
+                    BotCommand(command=COMMAND_REMOVE, description=trans.gettext("COMMAND_DESCRIPTION_REMOVE")),
+                    BotCommand(command=COMMAND_STATUS, description=trans.gettext("COMMAND_DESCRIPTION_STATUS")),
+                    BotCommand(command=COMMAND_NOTIFICATIONS,
+                               description=trans.gettext("COMMAND_DESCRIPTION_NOTIFICATIONS")),
+                    BotCommand(command=COMMAND_HELP, description=trans.gettext("COMMAND_DESCRIPTION_HELP"))]
+        # TODO: Find a way to have instance-specific strings in configs?
+        # await bot.set_my_name(trans.gettext("BOT_NAME"), language_code=lang)
+        description = trans.gettext("BOT_DESCRIPTION")
 
+        bot_strings.append((lang, commands, description))
         if lang == settings.DEFAULT_LANGUAGE:
-            await set_bot_strings(trans, None)
+            bot_strings.append((None, commands, description))
+
+    bot_strings_hash = hashlib.sha256(json.dumps(
+        [bot.id, [(language_code, [c.to_dict() for c in commands], description)
+                  for language_code, commands, description in bot_strings]],
+        ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    if bot_strings_hash == state.bot_strings_hash():
+        logging.info("Bot commands and description did not change since they were registered, skipping registration")
+        return
+
+    for language_code, commands, description in bot_strings:
+        await bot.set_my_commands(commands, language_code=language_code)
+        await bot.set_my_description(description, language_code=language_code)
+
+    state.set_bot_strings_hash(bot_strings_hash)
@@ -0,0 +1,179 @@
+"""
+Shared fixtures of the tests
+
+The tests import the bot code from `src`, with the required settings given here instead of `settings.yaml`, so the bot
+does not need to be configured to run them.  Every file the bot writes is kept in a temporary directory of the test.
+"""
+
+import importlib.util
+import pathlib
+import sys
+import types
+
+import pytest
+from telegram.ext import Application
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent / "src"))
+
+# Executed the same way `settings.reload()` does it, with the settings that would be read from the file
+_settings_spec = importlib.util.find_spec("common.settings")
+_settings_module = importlib.util.module_from_spec(_settings_spec)
+_settings_module._reloaded_user_settings = {"BOT_TOKEN": "123:TEST", "DEVELOPER_CHAT_ID": 1,
+                                            "REMOTE_ENDPOINT_URL": "http://localhost/api",
+                                            "REMOTE_ENDPOINT_AUTH_TOKEN": "test"}
+sys.modules["common.settings"] = _settings_module
+_settings_spec.loader.exec_module(_settings_module)
+del _settings_module._reloaded_user_settings
+
+from common import channel, dedup, directory, history, outbox, recording, retry, settings  # noqa: E402
+from common import snapshots, state  # noqa: E402
+import bot  # noqa: E402
+import replay  # noqa: E402
+
+
+def _forget_loaded_data() -> None:
+    """Drop everything the modules keep in memory, as if the process had exited"""
+
+    state._state = {}
+    state._followers = state._unfiltered_followers = state._filtered_followers = None
+    state._changed_since_snapshot = True
+
+    if history._file is not None:
+        history._file.close()
+    history._file = None
+    history._loaded = False
+    for column in (history._plates, history._controls, history._times):
+        del column[:]
+    history._by_participant.clear()
+    history._by_control.clear()
+
+    directory._close()
+
+    dedup.clear()
+    dedup._seeded = False
+
+    if outbox._connection is not None:
+        outbox._connection.close()
+    outbox._connection = None
+
+    recording.close()
+
+    retry._retry_queues.clear()
+    retry._pending_retry_count = 0
+    retry._dead_letters.clear()
+    channel._forbidden = False
+
+
+@pytest.fixture(autouse=True)
+def storage(tmp_path, monkeypatch) -> pathlib.Path:
+    """Keep all files of the bot in the temporary directory of the test, and start with nothing loaded"""
+
+    monkeypatch.setattr(state, "_STATE_FILENAME", tmp_path / "state.json")
+    monkeypatch.setattr(state, "_SNAPSHOT_FILENAME", tmp_path / "state.pickle")
+    monkeypatch.setattr(snapshots, "_SNAPSHOT_DIRECTORY", tmp_path / "snapshots")
+    monkeypatch.setattr(history, "_HISTORY_FILENAME", tmp_path / "history.bin")
+    monkeypatch.setattr(directory, "_DIRECTORY_FILENAME", tmp_path / "directory.bin")
+    monkeypatch.setattr(outbox, "_OUTBOX_FILENAME", tmp_path / "outbox.sqlite3")
+    monkeypatch.setattr(recording, "_RECORDING_FILENAME", tmp_path / "recording.jsonl.gz")
+    monkeypatch.setattr(state, "_on_participant_status_changed", [])
+    monkeypatch.setattr(state, "_on_participants_changed", [])
+    monkeypatch.setattr(state, "_on_participants_removed", None)
+
+    _forget_loaded_data()
+    yield tmp_path
+    _forget_loaded_data()
+
+
+@pytest.fixture
+def restart():
+    """Return a function that makes the modules load everything from the files again, like a restart of the bot"""
+
+    return _forget_loaded_data
+
+
+@pytest.fixture
+def event() -> None:
+    """Configure an event with 4 controls, the last one being the finish, and 20 participants"""
+
+    state._maybe_load()
+    state.set_event({"name": {"en": "Test 600", "ru": "Тест 600"}, "start": "2025-07-04T02:00:00+00:00",
+                     "finish": "2025-07-05T18:00:00+00:00", "participant_list_url": ""})
+    state.set_controls({str(i): {"name": {"en": f"C{i}", "ru": f"К{i}"}, "distance": (i - 1) * 200,
+                                 "finish": i == 4} for i in range(1, 5)})
+    state.set_participants({str(i): f"Rider {i}" for i in range(1, 21)})
+
+
+def message_update(update_id: int, user_id: int, text: str = None, document: dict = None) -> dict:
+    """Return the data of an update with a message from the user in the private chat with the bot"""
+
+    message = {"message_id": update_id, "date": 1751594400, "chat": {"id": user_id, "type": "private"},
+               "from": {"id": user_id, "is_bot": False, "first_name": "Rider", "language_code": "en"}}
+    if text is not None:
+        message["text"] = text
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text)}]
+    if document is not None:
+        message["document"] = document
+    return {"update_id": update_id, "message": message}
+
+
+def create_application(request: replay._RecordingRequest) -> Application:
+    """Return the application of the bot, with requests to the Bot API answered by `request`"""
+
+    return bot.create_application(Application.builder().request(request).get_updates_request(request))
+
+
+class FakeBot:
+    """Stands in for the Telegram bot, keeps the messages it is asked to send instead of sending them
+
+    `errors` maps chat IDs to lists of exceptions that the next attempts to send a message to the chat raise, or None
+    for attempts that succeed.
+    """
+
+    def __init__(self):
+        self.sent = []
+        self.errors = {}
+
+    async def send_message(self, chat_id, text: str, disable_notification: bool = False, **kwargs):
+        errors = self.errors.get(chat_id)
+        if errors and (error := errors.pop(0)):
+            raise error
+        self.sent.append((chat_id, text, disable_notification))
+        return types.SimpleNamespace(message_id=len(self.sent))
+
+    def texts(self, chat_id) -> list:
+        return [text for sent_chat_id, text, _ in self.sent if sent_chat_id == chat_id]
+
+
+class FakeJobQueue:
+    """Stands in for the job queue, keeps the jobs it is asked to run once so that the test runs them"""
+
+    def __init__(self):
+        self.jobs = []
+
+    def run_once(self, callback, when, data=None, **kwargs):
+        job = (callback, when, data)
+        self.jobs.append(job)
+
+        def schedule_removal() -> None:
+            if job in self.jobs:
+                self.jobs.remove(job)
+
+        return types.SimpleNamespace(schedule_removal=schedule_removal)
+
+    async def run_jobs(self, bot: FakeBot) -> list:
+        """Run the jobs queued so far and the jobs they queue, return the delays they were queued with"""
+
+        delays = []
+        while self.jobs:
+            callback, when, data = self.jobs.pop(0)
+            delays.append(when)
+            await callback(types.SimpleNamespace(bot=bot, job_queue=self, job=types.SimpleNamespace(data=data)))
+        return delays
+
+
+@pytest.fixture
+def context() -> types.SimpleNamespace:
+    """Return a context of a job, with a fake bot and a fake job queue"""
+
+    return types.SimpleNamespace(bot=FakeBot(), job_queue=FakeJobQueue(), job=None)
@@ -0,0 +1,38 @@
+import asyncio
+
+from telegram import Update
+
+import replay
+from common import settings
+from conftest import create_application, message_update
+from users import admin
+
+_DOCUMENT = {"file_id": "file", "file_unique_id": "unique", "file_name": "subscriptions.csv"}
+
+
+def test_documents_of_other_users_reach_the_public_interface(event):
+    request = replay._RecordingRequest()
+    application = create_application(request)
+
+    async def handle() -> None:
+        async with application:
+            await application.process_update(Update.de_json(message_update(1, 5, "/add"), application.bot))
+            await application.process_update(Update.de_json(message_update(2, 5, document=_DOCUMENT), application.bot))
+
+    asyncio.run(handle())
+
+    # The prompt for the frame plate number, and the message that the conversation was aborted
+    assert request.counts["sendMessage"] == 2
+    assert "getFile" not in request.counts
+
+
+def test_documents_are_imported_from_the_current_administrator(monkeypatch):
+    application = create_application(replay._RecordingRequest())
+    handler = next(h for h in application.handlers[0] if h.callback is admin._handle_document)
+    update = Update.de_json(message_update(1, 5, document=_DOCUMENT), application.bot)
+
+    assert not handler.check_update(update)
+
+    # As after reloading the settings
+    monkeypatch.setattr(settings, "DEVELOPER_CHAT_ID", 5)
+    assert handler.check_update(update)
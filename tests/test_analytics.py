@@ -0,0 +1,23 @@
+import datetime
+
+import pytest
+
+from common import analytics, state
+
+
+@pytest.mark.parametrize("checkin_time", ["2025-07-04T02:00:00+00:00", "2025-07-04T01:00:00+00:00"],
+                         ids=["at the start", "before the start"])
+def test_no_eta_from_check_ins_that_are_not_after_the_start(monkeypatch, event, checkin_time):
+    monkeypatch.setattr(analytics, "_built", False)
+    state.maybe_set_participant_last_known_status("7", "2", checkin_time)
+
+    assert analytics.eta("7") is None
+
+
+def test_eta_from_the_average_speed(monkeypatch, event):
+    monkeypatch.setattr(analytics, "_built", False)
+    state.maybe_set_participant_last_known_status("7", "2", "2025-07-04T10:00:00+00:00")
+
+    # 200 km in 8 hours, the next control is 200 km further
+    expected = datetime.datetime.fromisoformat("2025-07-04T18:00:00+00:00").timestamp()
+    assert analytics.eta("7") == ("3", pytest.approx(expected))
@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+from telegram import User
+
+import replay
+from common import dedup, remote, settings, state
+
+_RESPONSE = {"success": True, "next_since": "cursor", "updates": [
+    {"frame_plate_number": "7", "control": 2, "checkin_time": "2025-07-04T10:00:00+00:00"}]}
+
+
+@pytest.fixture
+def follower(monkeypatch, event) -> str:
+    """Subscribe a follower to participant 7, and make fetch cycles receive `_RESPONSE`"""
+
+    monkeypatch.setattr(settings, "SENDER_WORKER_COUNT", 0)
+    monkeypatch.setattr(remote, "_post", lambda request: replay._RecordedResponse(_RESPONSE))
+    state.add_subscription(User(11, "Follower", False, language_code="en"), "7")
+    return "11"
+
+
+def _fetch(context) -> bool:
+    return asyncio.run(remote._fetch_data_and_notify_subscribers(context))
+
+
+def test_repeated_updates_are_dropped(follower, context, restart):
+    assert _fetch(context)
+    assert len(context.bot.texts(follower)) == 1
+
+    assert _fetch(context)
+    assert len(context.bot.texts(follower)) == 1
+
+    # Processed updates are remembered from the check-in history after a restart
+    restart()
+    assert _fetch(context)
+    assert len(context.bot.texts(follower)) == 1
+
+
+@pytest.mark.parametrize("restarted", [False, True], ids=["same process", "after a restart"])
+def test_updates_of_interrupted_cycles_are_reported_again(follower, context, restart, restarted):
+    async def fail(**kwargs):
+        raise RuntimeError("Stopped while sending")
+
+    sent = context.bot.send_message
+    context.bot.send_message = fail
+    with pytest.raises(RuntimeError):
+        _fetch(context)
+    assert state.Participant("7").last_known_control_id == "2"
+    if restarted:
+        restart()
+
+    # The status did not change, but the follower was not told about it
+    context.bot.send_message = sent
+    assert _fetch(context)
+    assert len(context.bot.texts(follower)) == 1
+
+    assert _fetch(context)
+    assert len(context.bot.texts(follower)) == 1
+
+
+def test_check_in_times_are_compared_as_moments():
+    dedup.mark_applied("7", "2", "2025-07-04T12:00:00+02:00")
+
+    assert dedup.is_processed("7", "2", "2025-07-04T10:00:00+00:00")
+    assert not dedup.is_processed("7", "2", "2025-07-04T10:00:01+00:00")
+    assert not dedup.is_processed("8", "2", "2025-07-04T10:00:00+00:00")
@@ -0,0 +1,66 @@
+import asyncio
+import datetime
+import time
+import types
+
+from telegram import User
+from telegram.error import Forbidden
+
+from common import format, i18n, overdue, remote, settings, state
+
+
+def _miss_next_control(monkeypatch, frame_plate_numbers: list) -> None:
+    """Check the participants in at the first control, and let the time pass until the next one closed"""
+
+    now = time.time()
+    close = datetime.datetime.fromtimestamp(now + 3600, datetime.timezone.utc).isoformat()
+    state.set_controls({str(i): {"name": {"en": f"C{i}", "ru": f"К{i}"}, "distance": (i - 1) * 200, "finish": i == 4,
+                                 "close": close} for i in range(1, 5)})
+    for frame_plate_number in frame_plate_numbers:
+        state.maybe_set_participant_last_known_status(frame_plate_number, "1", "2025-07-04T03:00:00+00:00")
+    monkeypatch.setattr(overdue, "_built", False)
+    overdue._maybe_build()
+    monkeypatch.setattr(time, "time", lambda: now + 7200)
+    monkeypatch.setattr(remote, "_periodic_fetching_job", object())
+
+
+def test_deadlines_are_not_checked_while_fetching_is_stopped_or_paused(monkeypatch, event, context):
+    _miss_next_control(monkeypatch, ["7"])
+
+    monkeypatch.setattr(remote, "_periodic_fetching_job", None)
+    asyncio.run(overdue._check(context))
+    assert not context.bot.sent
+
+    monkeypatch.setattr(remote, "_periodic_fetching_job", object())
+    monkeypatch.setattr(remote, "_paused_until", time.monotonic() + 60)
+    asyncio.run(overdue._check(context))
+    assert not context.bot.sent
+
+    # The pause has ended, but fetching has not resumed yet
+    monkeypatch.setattr(remote, "_paused_until", time.monotonic() - 1)
+    asyncio.run(overdue._check(context))
+    assert not context.bot.sent
+
+    monkeypatch.setattr(remote, "_paused_until", None)
+    asyncio.run(overdue._check(context))
+    assert len(context.bot.texts(settings.DEVELOPER_CHAT_ID)) == 1
+    assert "Rider 7" in context.bot.texts(settings.DEVELOPER_CHAT_ID)[0]
+
+
+def test_only_followers_of_participants_in_failed_posts_are_warned(monkeypatch, event, context):
+    monkeypatch.setattr(settings, "BROADCAST_CHANNEL_ID", -100)
+    monkeypatch.setattr(settings, "BROADCAST_FOLLOWER_THRESHOLD", 1)
+    for tg_id, frame_plate_number in ((11, "7"), (21, "8")):
+        state.add_subscription(User(tg_id, "Follower", False, language_code="en"), frame_plate_number)
+    _miss_next_control(monkeypatch, ["7", "8"])
+    # A single participant per post
+    entry_length = len(overdue._entry(i18n.default(), "7", "2"))
+    monkeypatch.setattr(format, "MessageLimit", types.SimpleNamespace(MAX_TEXT_LENGTH=entry_length + 100))
+    context.bot.errors[settings.BROADCAST_CHANNEL_ID] = [None, Forbidden("Not a member of the channel")]
+
+    asyncio.run(overdue._check(context))
+
+    assert len(context.bot.texts(settings.BROADCAST_CHANNEL_ID)) == 1
+    assert "Rider 7" in context.bot.texts(settings.BROADCAST_CHANNEL_ID)[0]
+    assert not context.bot.texts("11")
+    assert len(context.bot.texts("21")) == 1
@@ -0,0 +1,57 @@
+import asyncio
+import contextlib
+
+import pytest
+
+from common import pipeline
+
+
+async def _count(produced: list):
+    n = 0
+    while True:
+        produced.append(n)
+        yield n
+        n += 1
+
+
+async def _double(items, applied: list):
+    async for item in items:
+        applied.append(item)
+        yield item * 2
+
+
+def test_stages_stop_when_the_consumer_raises():
+    produced, applied = [], []
+
+    async def consume() -> None:
+        with pytest.raises(RuntimeError):
+            async with contextlib.aclosing(pipeline.connect(_count(produced), [lambda items: _double(items, applied)],
+                                                            2)) as items:
+                async for item in items:
+                    if item == 4:
+                        raise RuntimeError("The consumer failed")
+
+        assert asyncio.all_tasks() == {asyncio.current_task()}
+        produced_count, applied_count = len(produced), len(applied)
+        await asyncio.sleep(0.01)
+        assert (len(produced), len(applied)) == (produced_count, applied_count)
+
+    asyncio.run(consume())
+
+
+def test_errors_of_stages_reach_the_consumer():
+    async def fail(items):
+        async for item in items:
+            if item == 3:
+                raise ValueError("The stage failed")
+            yield item
+
+    async def consume() -> list:
+        consumed = []
+        with pytest.raises(ValueError):
+            async with contextlib.aclosing(pipeline.connect(_count([]), [fail], 2)) as items:
+                async for item in items:
+                    consumed.append(item)
+        return consumed
+
+    assert asyncio.run(consume()) == [0, 1, 2]
@@ -0,0 +1,48 @@
+import asyncio
+
+from telegram import Update
+
+import replay
+from common import recording, settings, state
+from conftest import create_application, message_update
+
+
+def test_telegram_updates_are_recorded(monkeypatch):
+    monkeypatch.setattr(settings, "RECORD_TRAFFIC", True)
+    application = create_application(replay._RecordingRequest())
+
+    async def handle() -> None:
+        async with application:
+            await application.process_update(Update.de_json(message_update(1, 5, "/start"), application.bot))
+
+    asyncio.run(handle())
+    recording.close()
+
+    records = list(recording.read(recording._RECORDING_FILENAME))
+    assert [(kind, data["update_id"]) for _, kind, data in records] == [(recording.TELEGRAM_UPDATE, 1)]
+
+
+def test_recorded_traffic_is_replayed(monkeypatch, event):
+    monkeypatch.setattr(settings, "RECORD_TRAFFIC", True)
+    monkeypatch.setattr(settings, "SENDER_WORKER_COUNT", 0)
+    recording.record(recording.TELEGRAM_UPDATE, message_update(1, 5, "/add"))
+    recording.record(recording.TELEGRAM_UPDATE, message_update(2, 5, "7"))
+    recording.record(recording.TRACKING_UPDATES, {"success": True, "next_since": "x", "updates": [
+        {"frame_plate_number": "7", "control": 2, "checkin_time": "2025-07-04T10:00:00+00:00"}]})
+    recording.close()
+    monkeypatch.setattr(settings, "RECORD_TRAFFIC", False)
+    state.set_is_fetching(True)
+
+    request = replay._RecordingRequest()
+    application = create_application(request)
+
+    async def run() -> None:
+        async with application:
+            await replay._replay(application, request, recording._RECORDING_FILENAME, 0)
+
+    asyncio.run(run())
+
+    assert state.Subscription("5").numbers == ["7"]
+    assert state.Participant("7").last_known_control_id == "2"
+    # The replies to both messages, and the notification about the check-in
+    assert request.counts["sendMessage"] == 3
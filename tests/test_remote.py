@@ -0,0 +1,76 @@
+import asyncio
+import types
+
+from telegram import User
+from telegram.error import Forbidden
+
+from common import format, livecards, pipeline, remote, settings, state
+
+
+def _subscribe(tg_id: int, frame_plate_number: str, notify: str = state.NOTIFY_ALL) -> None:
+    state.add_subscription(User(tg_id, "Follower", False, language_code="en"), frame_plate_number)
+    state.set_subscription_preferences(str(tg_id), notify, [], None)
+
+
+def _check_in(frame_plate_number: str, control_id: str, checkin_time: str) -> frozenset:
+    state.maybe_set_participant_last_known_status(frame_plate_number, control_id, checkin_time)
+    return state.status_change_keys(control_id, checkin_time)
+
+
+async def _collect(chunks) -> list:
+    return [chunk async for chunk in chunks]
+
+
+async def _iterate(*items):
+    for item in items:
+        yield item
+
+
+def test_live_cards_of_all_followers_are_outdated(monkeypatch, event):
+    monkeypatch.setattr(settings, "LIVE_CARDS", True)
+    monkeypatch.setattr(settings, "BROADCAST_CHANNEL_ID", -100)
+    monkeypatch.setattr(settings, "BROADCAST_FOLLOWER_THRESHOLD", 3)
+    monkeypatch.setattr(livecards, "_outdated", {})
+    for tg_id in (11, 12, 13):
+        _subscribe(tg_id, "7")
+    state.set_broadcast_announced(["7"])
+    _subscribe(21, "8")
+    _subscribe(22, "8", state.NOTIFY_FINISH)
+
+    changes = {n: _check_in(n, "2", "2025-07-04T10:00:00+00:00") for n in ("7", "8")}
+    asyncio.run(_collect(remote._fan_out_stage(_iterate(changes), pipeline.StageTimer())))
+
+    assert set(livecards._outdated) == {"11", "12", "13", "21", "22"}
+
+
+def test_only_participants_of_failed_posts_are_sent_personally(monkeypatch, event, context):
+    monkeypatch.setattr(settings, "BROADCAST_CHANNEL_ID", -100)
+    monkeypatch.setattr(settings, "BROADCAST_FOLLOWER_THRESHOLD", 2)
+    monkeypatch.setattr(settings, "SENDER_WORKER_COUNT", 0)
+    for tg_id, frame_plate_number in ((11, "7"), (12, "7"), (21, "8"), (22, "8")):
+        _subscribe(tg_id, frame_plate_number)
+    keys = {n: _check_in(n, "2", "2025-07-04T10:00:00+00:00") for n in ("7", "8")}
+    broadcast = {state.Participant(n): keys[n] for n in ("7", "8")}
+    posts = [([p], f"Post about {p.frame_plate_number}") for p in broadcast]
+    context.bot.errors[settings.BROADCAST_CHANNEL_ID] = [None, Forbidden("Not a member of the channel")]
+
+    asyncio.run(remote._send(_iterate((broadcast, posts, [])), context, pipeline.StageTimer()))
+
+    assert context.bot.texts(settings.BROADCAST_CHANNEL_ID) == ["Post about 7"]
+    assert state.is_broadcast_announced("7")
+    assert not state.is_broadcast_announced("8")
+    assert {tg_id for tg_id, _, _ in context.bot.sent} == {settings.BROADCAST_CHANNEL_ID, settings.DEVELOPER_CHAT_ID,
+                                                           "21", "22"}
+
+
+def test_broadcast_posts_list_each_participant_once(monkeypatch, event):
+    monkeypatch.setattr(format, "MessageLimit", types.SimpleNamespace(MAX_TEXT_LENGTH=300))
+    participants = [state.Participant(str(n)) for n in range(1, 21)]
+
+    posts = remote._broadcast_posts(participants)
+
+    assert len(posts) > 1
+    assert [p for post_participants, _ in posts for p in post_participants] == participants
+    for post_participants, text in posts:
+        assert all(p.name in text for p in post_participants)
+        assert len(text) <= 300
@@ -0,0 +1,123 @@
+import asyncio
+import types
+
+import pytest
+from telegram.error import BadRequest, NetworkError, RetryAfter
+
+import replay
+from common import remote, retry, settings
+
+
+def _send(context, chat_id, text: str) -> None:
+    asyncio.run(retry.send_message(context.bot, context.job_queue, chat_id, text))
+
+
+def test_later_messages_to_a_chat_wait_for_the_failed_one(context):
+    context.bot.errors[11] = [NetworkError("Timed out")]
+
+    _send(context, 11, "First")
+    _send(context, 11, "Second")
+    _send(context, 12, "Other chat")
+    assert context.bot.texts(11) == []
+    assert context.bot.texts(12) == ["Other chat"]
+
+    asyncio.run(context.job_queue.run_jobs(context.bot))
+
+    assert context.bot.texts(11) == ["First", "Second"]
+    assert retry._retry_queues == {}
+    assert retry._pending_retry_count == 0
+
+
+def test_flood_control_delay_is_respected(context):
+    context.bot.errors[11] = [RetryAfter(30)]
+
+    _send(context, 11, "Text")
+
+    assert asyncio.run(context.job_queue.run_jobs(context.bot)) == [30]
+    assert context.bot.texts(11) == ["Text"]
+
+
+def test_messages_are_dead_lettered_after_the_last_attempt(context):
+    context.bot.errors[11] = [NetworkError("Timed out")] * settings.SEND_MAX_ATTEMPTS
+
+    _send(context, 11, "Text")
+    delays = asyncio.run(context.job_queue.run_jobs(context.bot))
+
+    assert len(delays) == settings.SEND_MAX_ATTEMPTS - 1
+    assert all(0 <= delay <= settings.RETRY_MAX_SECONDS for delay in delays)
+    assert context.bot.texts(11) == []
+    assert retry.dead_letter_count() == 1
+
+    assert retry.resend_dead_letters(context.job_queue) == 1
+    asyncio.run(context.job_queue.run_jobs(context.bot))
+    assert context.bot.texts(11) == ["Text"]
+    assert retry.dead_letter_count() == 0
+
+
+def test_permanent_errors_are_not_retried(context):
+    context.bot.errors[11] = [BadRequest("Message is too long")]
+
+    _send(context, 11, "Text")
+
+    assert context.job_queue.jobs == []
+    assert retry.dead_letter_count() == 1
+
+
+@pytest.fixture
+def endpoint(monkeypatch, event) -> types.SimpleNamespace:
+    """Make fetch cycles post to a fake remote endpoint, which responds with `response` or raises `error`"""
+
+    monkeypatch.setattr(settings, "SENDER_WORKER_COUNT", 0)
+    for name, value in (("_consecutive_failure_count", 0), ("_paused_until", None), ("_retry_job", None),
+                        ("_is_cycle_running", False)):
+        monkeypatch.setattr(remote, name, value)
+
+    endpoint = types.SimpleNamespace(requests=0, error=None,
+                                     response=types.SimpleNamespace(status_code=500, reason="Internal Server Error"))
+
+    def post(request: dict):
+        endpoint.requests += 1
+        if endpoint.error:
+            raise endpoint.error
+        return endpoint.response
+
+    monkeypatch.setattr(remote, "_post", post)
+    return endpoint
+
+
+def _fetch(context) -> None:
+    asyncio.run(remote.periodic_fetch_data_and_notify_subscribers(context))
+
+
+def test_fetching_pauses_after_failures_and_resumes(monkeypatch, endpoint, context):
+    for _ in range(settings.FETCH_FAILURES_BEFORE_PAUSE - 1):
+        _fetch(context)
+        assert remote.pause_remaining_seconds() is None
+    # Only the latest retry is scheduled
+    assert len(context.job_queue.jobs) == 1
+
+    _fetch(context)
+    assert remote.pause_remaining_seconds() is not None
+    assert len(context.bot.texts(settings.DEVELOPER_CHAT_ID)) == 1
+    assert len(context.job_queue.jobs) == 1
+
+    # No requests while paused
+    _fetch(context)
+    assert endpoint.requests == settings.FETCH_FAILURES_BEFORE_PAUSE
+
+    monkeypatch.setattr(remote, "_paused_until", 0.0)
+    endpoint.response = replay._RecordedResponse({"success": True, "next_since": "cursor", "updates": []})
+    _fetch(context)
+
+    assert endpoint.requests == settings.FETCH_FAILURES_BEFORE_PAUSE + 1
+    assert remote.pause_remaining_seconds() is None
+    assert len(context.bot.texts(settings.DEVELOPER_CHAT_ID)) == 2
+
+
+def test_errors_are_raised_once_fetching_pauses(endpoint, context):
+    endpoint.error = ConnectionError("Connection refused")
+    for _ in range(settings.FETCH_FAILURES_BEFORE_PAUSE - 1):
+        _fetch(context)
+
+    with pytest.raises(ConnectionError):
+        _fetch(context)
@@ -0,0 +1,17 @@
+from common import search, state
+
+
+def test_names_with_typos_are_found_among_many_similar_ones(monkeypatch):
+    monkeypatch.setattr(search, "_built", False)
+    monkeypatch.setattr(search, "_index", search.collections.defaultdict(list))
+    monkeypatch.setattr(search, "_name_trigrams", {})
+    monkeypatch.setattr(search, "_ranks", {})
+    state._maybe_load()
+    # Many names that start with the same letters as the one looked for, so that its first trigrams are very common
+    names = {str(n): f"Ivan Ivanov{n:04}" for n in range(1, 2001)}
+    names["2001"] = "Ivan Petrovsky"
+    state.set_participants(names)
+
+    assert search.find("ivan petrvosky", 5)[0] == "2001"
+    assert search.find("#02001", 5) == ["2001"]
+    assert len(search.find("ivanvo", 5)) == 5
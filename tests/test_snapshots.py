@@ -0,0 +1,60 @@
+import pytest
+
+from common import directory, history, settings, snapshots, state
+
+
+@pytest.mark.parametrize("participant_directory", [False, True], ids=["state", "directory"])
+def test_restore_rolls_back_statuses_and_history(monkeypatch, restart, participant_directory):
+    monkeypatch.setattr(settings, "PARTICIPANT_DIRECTORY", participant_directory)
+    state._maybe_load()
+    state.set_controls({str(i): {"name": {"en": f"C{i}", "ru": f"К{i}"}, "distance": (i - 1) * 200,
+                                 "finish": i == 4} for i in range(1, 5)})
+    state.set_participants({str(i): f"Rider {i}" for i in range(1, 21)})
+    assert directory.exists() == participant_directory
+    state.maybe_set_participant_last_known_status("7", "2", "2025-07-04T10:00:00+00:00")
+    version = state.save_versioned_snapshot()
+
+    state.maybe_set_participant_last_known_status("7", "3", "2025-07-04T17:00:00+00:00")
+    state.maybe_set_participant_last_known_status("8", "2", "2025-07-04T11:00:00+00:00")
+    assert history.count() == 3
+    restart()
+
+    state.restore_versioned_snapshot(version)
+    restart()
+    state._maybe_load()
+
+    assert state.Participant("7").last_known_control_id == "2"
+    assert state.Participant("8").last_known_control_id is None
+    assert history.count() == 1
+    assert directory.exists() == participant_directory
+
+    # The state before the restore was saved as a snapshot, so the restore can be undone
+    newest = snapshots.versions()[0]
+    assert newest != version
+    restart()
+    state.restore_versioned_snapshot(newest)
+    restart()
+    state._maybe_load()
+
+    assert state.Participant("7").last_known_control_id == "3"
+    assert state.Participant("8").last_known_control_id == "2"
+
+
+def test_snapshots_are_only_saved_after_changes(event):
+    assert state.save_versioned_snapshot() is not None
+    assert state.save_versioned_snapshot() is None
+
+    state.maybe_set_participant_last_known_status("7", "2", "2025-07-04T10:00:00+00:00")
+    assert state.save_versioned_snapshot() is not None
+    assert len(snapshots.versions()) == 2
+
+
+def test_damaged_state_file_falls_back_to_the_newest_snapshot(event, restart, storage):
+    state.maybe_set_participant_last_known_status("7", "2", "2025-07-04T10:00:00+00:00")
+    state.save_versioned_snapshot()
+    restart()
+    (storage / "state.json").write_text("{", encoding="utf-8")
+
+    state._maybe_load()
+
+    assert state.Participant("7").last_known_control_id == "2"
@@ -0,0 +1,60 @@
+import pytest
+
+from common import directory, settings, state
+
+
+def _participant_names() -> dict:
+    return {p.frame_plate_number: p.name for p in state.participants()}
+
+
+@pytest.mark.parametrize("snapshot", [False, True], ids=["json", "pickle"])
+def test_participants_move_to_the_directory(monkeypatch, event, restart, snapshot):
+    monkeypatch.setattr(settings, "PARTICIPANT_DIRECTORY", False)
+    if snapshot:
+        state.save_snapshot()
+    restart()
+
+    monkeypatch.setattr(settings, "PARTICIPANT_DIRECTORY", True)
+
+    assert state.participant_count() == 20
+    assert directory.exists()
+    assert not state._state[state._PARTICIPANTS]
+    assert _participant_names()["7"] == "Rider 7"
+
+
+@pytest.mark.parametrize("snapshot", [False, True], ids=["json", "pickle"])
+def test_participants_move_back_to_the_state(monkeypatch, restart, snapshot):
+    monkeypatch.setattr(settings, "PARTICIPANT_DIRECTORY", True)
+    state._maybe_load()
+    state.set_participants({str(i): f"Rider {i}" for i in range(1, 21)})
+    assert directory.exists()
+    if snapshot:
+        state.save_snapshot()
+    restart()
+
+    monkeypatch.setattr(settings, "PARTICIPANT_DIRECTORY", False)
+
+    assert state.participant_count() == 20
+    assert not directory.exists()
+    assert _participant_names()["7"] == "Rider 7"
+
+    # The participants are kept in the state file from now on
+    restart()
+    assert state.participant_count() == 20
+
+
+def test_current_snapshot_is_loaded_instead_of_the_json_file(event, restart):
+    state.save_snapshot()
+    # Written behind the back of the state, so only the snapshot has the change
+    state._state[state._PARTICIPANTS]["7"][state._NAME] = "Renamed"
+    state.save_snapshot()
+    restart()
+    state._maybe_load()
+
+    assert state.Participant("7").name == "Renamed"
+
+    state.set_participants({**{str(i): f"Rider {i}" for i in range(1, 21)}, "7": "Saved"})
+    restart()
+    state._maybe_load()
+
+    assert state.Participant("7").name == "Saved"